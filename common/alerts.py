@@ -0,0 +1,222 @@
+"""
+Alert coalescing for breakdown emails.
+
+- Repeat alerts for the same asset within ``dedupe_window`` are suppressed
+  and counted on the original alert (a queued one shows "reported N times").
+- Critical alerts (e.g. forklift Brake/Engine) are sent immediately.
+- Non-critical alerts are queued and sent as one digest per recipient every
+  ``digest_interval``, with thumbnails instead of full-size photos.
+- Each recipient gets at most ``max_per_hour`` messages; critical alerts over
+  the limit fall back to the digest instead of being dropped.
+
+One aggregator per server process (``get_alert_aggregator``); a daemon thread
+flushes due digests.
+"""
+import html
+import io
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+
+import streamlit as st
+from PIL import Image
+
+from common import mailer
+from common.sheets import secrets_section
+
+THUMBNAIL_SIZE = (320, 320)
+
+SENT = "sent"
+QUEUED = "queued"
+SUPPRESSED = "suppressed"
+FAILED = "failed"
+
+
+@dataclass
+class Alert:
+    asset: str
+    subject: str
+    body: str
+    recipient: str
+    critical: bool = False
+    subtype: str = "plain"
+    attachments: list = field(default_factory=list)   # [(path, filename)]
+    created: float = field(default_factory=time.time)
+    repeats: int = 0
+    thumbnails: list = field(default_factory=list)    # [(jpeg bytes, filename)]
+
+
+def make_thumbnail(path: str):
+    """Downscaled JPEG bytes for a photo/signature, or None if unreadable."""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with Image.open(path) as img:
+            img = img.convert("RGB")
+            img.thumbnail(THUMBNAIL_SIZE)
+            buf = io.BytesIO()
+            img.save(buf, format="JPEG", quality=70)
+            return buf.getvalue()
+    except Exception:
+        return None
+
+
+def _thumbnails(alert: Alert) -> list:
+    out = []
+    for i, (path, _) in enumerate(alert.attachments):
+        thumb = make_thumbnail(path)
+        if thumb:
+            out.append((thumb, f"thumb_{i}.jpg"))
+    return out
+
+
+def _read_attachments(alert: Alert) -> list:
+    out = []
+    for path, fname in alert.attachments:
+        if path and os.path.exists(path):
+            with open(path, "rb") as f:
+                out.append((f.read(), fname))
+    return out
+
+
+class AlertAggregator:
+    def __init__(self, send=mailer.send_messages, dedupe_window=900.0, digest_interval=1800.0,
+                 max_per_hour=20, clock=time.time):
+        self.send = send
+        self.dedupe_window = dedupe_window
+        self.digest_interval = digest_interval
+        self.max_per_hour = max_per_hour
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._last_alert = {}                   # (asset, critical) -> (timestamp, Alert)
+        self._pending = defaultdict(list)       # recipient -> [Alert]
+        self._sent_at = defaultdict(deque)      # recipient -> timestamps of sent messages
+        self._last_digest = clock()
+        self.stats = defaultdict(int)
+
+    # ---- public API ----
+    def submit(self, alert: Alert) -> str:
+        """Route one alert; returns SENT, QUEUED, SUPPRESSED or FAILED."""
+        now = self.clock()
+        with self._lock:
+            key = (alert.asset, alert.critical)
+            prev = self._last_alert.get(key)
+            if prev and now - prev[0] < self.dedupe_window:
+                prev[1].repeats += 1
+                self.stats[SUPPRESSED] += 1
+                return SUPPRESSED
+            self._last_alert[key] = (now, alert)
+            send_now = alert.critical and self._allow(alert.recipient, now)
+
+        if not send_now:
+            self._queue(alert, QUEUED)
+            self.flush()
+            return QUEUED
+        try:
+            msg = mailer.build_message(
+                mailer.sender_address(), alert.recipient, alert.subject, alert.body,
+                alert.subtype, _read_attachments(alert),
+            )
+            self.send([msg])
+        except Exception:
+            # Keep the alert: it goes out with the next digest attempt.
+            self._queue(alert, FAILED)
+            return FAILED
+        with self._lock:
+            self._record_send(alert.recipient, self.clock())
+            self.stats[SENT] += 1
+        return SENT
+
+    def flush(self, force: bool = False) -> int:
+        """Send due digests (one message per recipient, one SMTP session). Returns messages sent."""
+        now = self.clock()
+        with self._lock:
+            if not self._pending or (not force and now - self._last_digest < self.digest_interval):
+                return 0
+            batches = {}
+            for rcpt, alerts in list(self._pending.items()):
+                if alerts and self._allow(rcpt, now):
+                    batches[rcpt] = alerts
+                    del self._pending[rcpt]
+            self._last_digest = now
+        if not batches:
+            return 0
+        try:
+            self.send([self._digest_message(rcpt, alerts) for rcpt, alerts in batches.items()])
+        except Exception:
+            with self._lock:
+                for rcpt, alerts in batches.items():
+                    self._pending[rcpt][:0] = alerts
+                self.stats[FAILED] += 1
+            return 0
+        with self._lock:
+            for rcpt in batches:
+                self._record_send(rcpt, now)
+            self.stats["digests"] += len(batches)
+        return len(batches)
+
+    # ---- internals ----
+    def _queue(self, alert: Alert, stat: str) -> None:
+        """Hold an alert for the next digest; its thumbnails are made outside the lock (image decoding)."""
+        alert.thumbnails = _thumbnails(alert)
+        with self._lock:
+            self._pending[alert.recipient].append(alert)
+            self.stats[stat] += 1
+
+    def _allow(self, recipient: str, now: float) -> bool:
+        """Sliding one-hour rate limit per recipient; only sends that succeeded count (``_record_send``)."""
+        sent = self._sent_at[recipient]
+        while sent and now - sent[0] >= 3600:
+            sent.popleft()
+        return len(sent) < self.max_per_hour
+
+    def _record_send(self, recipient: str, now: float) -> None:
+        self._sent_at[recipient].append(now)
+
+    def _digest_message(self, recipient: str, alerts: list):
+        rows, images = [], []
+        for n, a in enumerate(alerts):
+            thumbs = ""
+            for j, (data, fname) in enumerate(a.thumbnails):
+                cid = f"a{n}_{j}"
+                images.append((data, fname, cid))
+                thumbs += f'<img src="cid:{cid}" style="max-width:160px;margin:2px">'
+            repeats = f" (reported {a.repeats + 1} times)" if a.repeats else ""
+            body = a.body if a.subtype == "html" else f"<pre>{html.escape(a.body)}</pre>"
+            rows.append(
+                f"<tr><td>{time.strftime('%Y-%m-%d %H:%M', time.localtime(a.created))}</td>"
+                f"<td><b>{html.escape(a.asset)}</b>{repeats}<br>{html.escape(a.subject)}</td>"
+                f"<td>{body}</td><td>{thumbs}</td></tr>"
+            )
+        message = (
+            "<html><body>"
+            f"<p>{len(alerts)} breakdown alert(s) since the last digest:</p>"
+            '<table border="1" cellpadding="4" cellspacing="0">'
+            "<tr><th>Time</th><th>Asset</th><th>Details</th><th>Photos</th></tr>"
+            + "".join(rows) + "</table></body></html>"
+        )
+        subject = f"Breakdown digest: {len(alerts)} alert(s)"
+        return mailer.build_message(mailer.sender_address(), recipient, subject, message, "html", images)
+
+
+def _flush_loop(aggregator: AlertAggregator, every: float) -> None:
+    while True:
+        time.sleep(every)
+        try:
+            aggregator.flush()
+        except Exception:
+            pass
+
+
+@st.cache_resource
+def get_alert_aggregator() -> AlertAggregator:
+    cfg = secrets_section("alerts")
+    aggregator = AlertAggregator(
+        dedupe_window=float(cfg.get("dedupe_window_minutes", 15)) * 60,
+        digest_interval=float(cfg.get("digest_interval_minutes", 30)) * 60,
+        max_per_hour=int(cfg.get("max_per_recipient_per_hour", 20)),
+    )
+    threading.Thread(target=_flush_loop, args=(aggregator, 30.0), daemon=True).start()
+    return aggregator
@@ -0,0 +1,174 @@
+"""
+Change feed for appended sheet rows.
+
+Submit paths publish what they append (``publish(topic, columns, rows)``);
+report pages get a frame built from one full download and then apply only
+the rows published since (``live_frame``). ``auto_refresh`` polls
+the feed on an interval and reruns the page only when something changed.
+
+Backends: in-process memory (default) or a SQLite file shared by every
+Streamlit process on the host:
+
+    [change_feed]
+    backend = "sqlite"
+    path = "/tmp/equipment_inspection/change_feed.db"
+    refresh_seconds = 30
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import pandas as pd
+import streamlit as st
+
+from common.shared_cache import connect, invalidate
+from common.sheets import secrets_section
+from common.snapshots import get_snapshot_store
+
+CONFIG = secrets_section("change_feed")
+REFRESH_SECONDS = float(CONFIG.get("refresh_seconds", 30))
+RETENTION_SECONDS = float(CONFIG.get("retention_hours", 24)) * 3600
+
+
+class MemoryFeed:
+    """Bounded in-process log of (seq, topic, columns, rows)."""
+
+    def __init__(self, maxlen: int = 10000):
+        self._log = deque(maxlen=maxlen)
+        self._seq = 0
+        self._latest = {}
+        self._lock = threading.Lock()
+
+    def publish(self, topic: str, columns: list, rows: list) -> int:
+        with self._lock:
+            self._seq += 1
+            self._log.append((self._seq, topic, list(columns), [list(r) for r in rows]))
+            self._latest[topic] = self._seq
+            return self._seq
+
+    def latest(self, topic: str) -> int:
+        return self._latest.get(topic, 0)
+
+    def since(self, topic: str, seq: int):
+        """Returns (latest_seq, changes, complete); complete=False if entries after seq were evicted."""
+        with self._lock:
+            complete = not self._log or self._log[0][0] <= seq + 1 or seq >= self._seq
+            changes = [{"columns": c, "rows": r} for s, t, c, r in self._log if s > seq and t == topic]
+            return self._seq, changes, complete
+
+
+class SqliteFeed:
+    """Same interface as MemoryFeed, shared across processes through a SQLite file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS changes ("
+                "seq INTEGER PRIMARY KEY AUTOINCREMENT, topic TEXT NOT NULL, ts REAL NOT NULL, payload TEXT NOT NULL)"
+            )
+            con.execute("CREATE INDEX IF NOT EXISTS changes_topic_seq ON changes(topic, seq)")
+            con.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)")
+
+    def _connect(self):
+        return connect(self.path)
+
+    def publish(self, topic: str, columns: list, rows: list) -> int:
+        payload = json.dumps({"columns": list(columns), "rows": [list(r) for r in rows]}, default=str)
+        now = time.time()
+        with self._connect() as con:
+            cur = con.execute("INSERT INTO changes(topic, ts, payload) VALUES (?, ?, ?)", (topic, now, payload))
+            pruned = con.execute(
+                "SELECT MAX(seq) FROM changes WHERE ts < ?", (now - RETENTION_SECONDS,)
+            ).fetchone()[0]
+            if pruned:
+                con.execute("DELETE FROM changes WHERE seq <= ?", (pruned,))
+                con.execute("INSERT OR REPLACE INTO meta(key, value) VALUES ('pruned_seq', ?)", (pruned,))
+            return cur.lastrowid
+
+    def latest(self, topic: str) -> int:
+        with self._connect() as con:
+            return con.execute("SELECT COALESCE(MAX(seq), 0) FROM changes WHERE topic = ?", (topic,)).fetchone()[0]
+
+    def since(self, topic: str, seq: int):
+        with self._connect() as con:
+            pruned = con.execute("SELECT value FROM meta WHERE key = 'pruned_seq'").fetchone()
+            rows = con.execute(
+                "SELECT seq, payload FROM changes WHERE topic = ? AND seq > ? ORDER BY seq", (topic, seq)
+            ).fetchall()
+        latest = rows[-1][0] if rows else seq
+        complete = not pruned or pruned[0] <= seq
+        return latest, [json.loads(p) for _, p in rows], complete
+
+
+@st.cache_resource
+def get_change_feed():
+    if CONFIG.get("backend", "memory") == "sqlite":
+        return SqliteFeed(CONFIG.get("path", "/tmp/equipment_inspection/change_feed.db"))
+    return MemoryFeed()
+
+
+def publish_rows(topic: str, columns: list, rows: list, shard: str = None) -> None:
+    """Publish rows appended to worksheet ``topic`` (of spreadsheet ``shard``); never fails the submit."""
+    invalidate(topic, shard)
+    try:
+        get_change_feed().publish(topic, columns, rows)
+    except Exception:
+        pass
+
+
+# =========================
+# Subscriber side
+# =========================
+def live_frame(key: str, topic: str, fetch_values, prepare, refetch: bool = False) -> pd.DataFrame:
+    """
+    DataFrame for a worksheet, shared read-only by every session on the same data.
+
+    First call: ``fetch_values()`` (list of rows, header first) -> ``prepare``.
+    Later calls: only rows published to ``topic`` since then are prepared and
+    appended, matched to the header by column name. ``prepare`` must be
+    row-wise (typing/cleaning). With ``refetch``, new rows on ``topic`` make
+    the next call download again instead: for a worksheet computed from the
+    topic by sheet formulas (its rows can't be derived from the published ones;
+    the publish already invalidated its cache entry).
+
+    The frame is a read-only snapshot (``common.snapshots``) built once per
+    data version and shared by every session of the process: filter or slice
+    it, don't assign into it.
+    """
+    feed = get_change_feed()
+    store = get_snapshot_store()
+    frames = st.session_state.setdefault("_live_frames", {})
+    entry = frames.get(key)
+
+    if entry is not None:
+        snap = entry["snapshot"]
+        seq, changes, complete = feed.since(topic, snap.seq)
+        if complete and not (refetch and changes):
+            if changes:
+                snap = store.advance(snap, seq, changes, prepare)
+                entry["snapshot"] = snap
+            return snap.df
+
+    # First load, the feed no longer covers our cursor, or a derived sheet changed: full download.
+    seq = feed.latest(topic)
+    snap = store.base(key, fetch_values(), seq, prepare)
+    frames[key] = {"topic": topic, "snapshot": snap}
+    return snap.df
+
+
+def reset_live_frames() -> None:
+    st.session_state.pop("_live_frames", None)
+
+
+@st.fragment(run_every=REFRESH_SECONDS)
+def auto_refresh() -> None:
+    """Rerun the page when any subscribed topic has new rows (deltas are applied on rerun)."""
+    frames = st.session_state.get("_live_frames", {})
+    feed = get_change_feed()
+    if any(feed.latest(e["topic"]) > e["snapshot"].seq for e in frames.values()):
+        st.rerun()
@@ -0,0 +1,181 @@
+"""
+Checklist engine: inspection item sets per equipment type.
+
+Item sets are declared in ``checklists.csv`` (or the file set in
+``[checklists] path``) with columns: type, item, critical, comment_required.
+
+- ``critical``: yes/no. A critical item reported Broken Down raises an
+  immediate alert (forklift: STOP).
+- ``comment_required``: ``broken`` (default, a comment is needed when the item
+  is Broken Down), ``always`` or ``never``.
+
+Each type is compiled once per process (widget keys, flag arrays, the wide
+sheet columns) and rebuilt only when the file changes. Submissions are
+validated with array operations over all items at once, so checklists with
+hundreds of items stay cheap to check.
+"""
+import csv
+import os
+import re
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+import streamlit as st
+
+from common.sheets import secrets_section
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "checklists.csv")
+DEFAULT_TYPE = "default"
+
+_SLUG_RE = re.compile(r"[^0-9a-z]+")
+
+
+def _flag(value) -> bool:
+    return str(value).strip().lower() in ("1", "y", "yes", "true", "x")
+
+
+@dataclass
+class ChecklistResult:
+    """Per-item masks for one submission (arrays aligned with ``Checklist.items``)."""
+    items: tuple
+    checked: np.ndarray
+    broken: np.ndarray
+    unanswered: np.ndarray
+    missing_comment: np.ndarray
+    critical_broken: np.ndarray
+
+    @property
+    def ok(self) -> bool:
+        return not (self.unanswered.any() or self.missing_comment.any())
+
+    def names(self, mask: np.ndarray) -> list:
+        return [self.items[i] for i in np.flatnonzero(mask)]
+
+
+class Checklist:
+    """Compiled item set of one equipment type."""
+
+    def __init__(self, equipment_type: str, rows: list):
+        self.type = equipment_type
+        self.items = tuple(r["item"] for r in rows)
+        self.critical = np.array([_flag(r.get("critical")) for r in rows], dtype=bool)
+        policy = [str(r.get("comment_required") or "broken").strip().lower() for r in rows]
+        self.comment_always = np.array([p == "always" for p in policy], dtype=bool)
+        self.comment_on_broken = np.array([p in ("broken", "always") for p in policy], dtype=bool)
+
+        slug = _SLUG_RE.sub("_", equipment_type.lower()).strip("_") or DEFAULT_TYPE
+        self.checked_keys = tuple(f"{slug}.checked_{i}" for i in range(len(rows)))
+        self.broken_keys = tuple(f"{slug}.broken_{i}" for i in range(len(rows)))
+        self.comment_keys = tuple(f"{slug}.comment_{i}" for i in range(len(rows)))
+        # Wide sheet layout: "<item>", "<item> Comments" per item, in declaration order.
+        self.columns = tuple(c for item in self.items for c in (item, f"{item} Comments"))
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def evaluate(self, state) -> ChecklistResult:
+        n = len(self.items)
+        checked = np.fromiter((bool(state.get(k, False)) for k in self.checked_keys), dtype=bool, count=n)
+        broken = np.fromiter((bool(state.get(k, False)) for k in self.broken_keys), dtype=bool, count=n)
+        has_comment = np.fromiter(
+            (bool(str(state.get(k, "") or "").strip()) for k in self.comment_keys), dtype=bool, count=n
+        )
+        return ChecklistResult(
+            items=self.items,
+            checked=checked,
+            broken=broken,
+            unanswered=~(checked | broken),
+            missing_comment=~has_comment & (self.comment_always | (broken & self.comment_on_broken)),
+            critical_broken=broken & self.critical,
+        )
+
+    def row(self, state, result: ChecklistResult = None) -> dict:
+        """Wide row values keyed by ``self.columns``: "X", "B" or "X B" plus the comment."""
+        result = result or self.evaluate(state)
+        marks = np.char.strip(np.char.add(np.where(result.checked, "X ", ""), np.where(result.broken, "B", "")))
+        out = {}
+        for item, mark, key in zip(self.items, marks.tolist(), self.comment_keys):
+            out[item] = mark
+            out[f"{item} Comments"] = str(state.get(key, "") or "")
+        return out
+
+    def reset(self, state) -> None:
+        for key in self.checked_keys + self.broken_keys + self.comment_keys:
+            state.pop(key, None)
+
+
+def _read_csv(path: str) -> dict:
+    by_type = {}
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for r in csv.DictReader(f):
+            r = {str(k).strip().lower(): (v or "").strip() for k, v in r.items() if k}
+            if r.get("type") and r.get("item"):
+                by_type.setdefault(r["type"].lower(), []).append(r)
+    return by_type
+
+
+class ChecklistRegistry:
+    """Compiled checklists, rebuilt when the source file's (mtime, size) changes."""
+
+    def __init__(self, path: str = DEFAULT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._checklists = {}
+        self._signature = None
+
+    def get(self, equipment_type: str) -> Checklist:
+        with self._lock:
+            self._refresh()
+            key = str(equipment_type or "").strip().lower()
+            return (
+                self._checklists.get(key)
+                or self._checklists.get(DEFAULT_TYPE)
+                or Checklist(key or DEFAULT_TYPE, [])
+            )
+
+    def types(self) -> list:
+        with self._lock:
+            self._refresh()
+            return sorted(self._checklists)
+
+    def _refresh(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return
+        sig = (stat.st_mtime_ns, stat.st_size)
+        if sig != self._signature:
+            self._checklists = {t: Checklist(t, rows) for t, rows in _read_csv(self.path).items()}
+            self._signature = sig
+
+
+@st.cache_resource
+def _registry() -> ChecklistRegistry:
+    return ChecklistRegistry(secrets_section("checklists").get("path", DEFAULT_PATH))
+
+
+def get_checklist(equipment_type: str) -> Checklist:
+    """Item set for an equipment type (falls back to the ``default`` set)."""
+    return _registry().get(equipment_type)
+
+
+# =========================
+# UI
+# =========================
+@st.fragment
+def _item_section(name: str, critical: bool, comment_always: bool, keys: tuple):
+    checked_key, broken_key, comment_key = keys
+    st.subheader(f"{name} ⚠️" if critical else name)
+    st.checkbox("Checked", key=checked_key)
+    st.checkbox("Broken Down", key=broken_key)
+    st.text_area("Comments (required)" if comment_always else "Comments", max_chars=120, height=60, key=comment_key)
+    if st.session_state.get(broken_key, False) and not st.session_state.get(comment_key, "").strip():
+        st.warning(f"Please provide comments for {name} breakdown.")
+
+
+def render_checklist(checklist: Checklist) -> None:
+    """One fragment per item: ticking a box reruns only that item's section."""
+    for i, name in enumerate(checklist.items):
+        keys = (checklist.checked_keys[i], checklist.broken_keys[i], checklist.comment_keys[i])
+        _item_section(name, bool(checklist.critical[i]), bool(checklist.comment_always[i]), keys)
@@ -0,0 +1,144 @@
+"""
+Chunked exports for report views.
+
+Each ``stream_*`` function is a generator of byte chunks. Rows are converted
+``chunk_rows`` at a time, so the text copy of the frame never exists at once;
+XLSX and Parquet are assembled in a temporary file on disk and read back from
+it in blocks. ``export_file`` is what the download buttons use:
+``st.download_button`` needs the finished file as bytes, so a download holds
+the whole file in memory (plus the frame it came from) until it is served.
+"""
+import os
+import tempfile
+
+import pandas as pd
+
+HAS_OPENPYXL = True
+try:
+    from openpyxl import Workbook
+except Exception:
+    HAS_OPENPYXL = False
+
+HAS_PYARROW = True
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except Exception:
+    HAS_PYARROW = False
+
+CHUNK_ROWS = 5000
+READ_BYTES = 1 << 16
+
+FORMATS = {
+    "CSV": ("csv", "text/csv"),
+    "XLSX": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+
+
+def available_formats() -> list:
+    return ["CSV"] + (["XLSX"] if HAS_OPENPYXL else []) + (["Parquet"] if HAS_PYARROW else [])
+
+
+def iter_chunks(df: pd.DataFrame, chunk_rows: int = CHUNK_ROWS):
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+def _as_text(chunk: pd.DataFrame) -> pd.DataFrame:
+    """Stable per-chunk typing: datetimes formatted, everything else as strings."""
+    out = {}
+    for col in chunk.columns:
+        s = chunk[col]
+        if pd.api.types.is_datetime64_any_dtype(s):
+            s = s.dt.strftime("%Y-%m-%d %H:%M:%S")
+        out[str(col)] = s.astype("string").fillna("")
+    return pd.DataFrame(out, index=chunk.index)
+
+
+def _stream_file(path: str):
+    try:
+        with open(path, "rb") as f:
+            while True:
+                block = f.read(READ_BYTES)
+                if not block:
+                    break
+                yield block
+    finally:
+        os.remove(path)
+
+
+def _tempfile(suffix: str) -> str:
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    os.close(fd)
+    return path
+
+
+def stream_csv(df: pd.DataFrame, chunk_rows: int = CHUNK_ROWS):
+    yield df.head(0).to_csv(index=False).encode("utf-8-sig")
+    for chunk in iter_chunks(df, chunk_rows):
+        yield _as_text(chunk).to_csv(index=False, header=False).encode("utf-8")
+
+
+def stream_xlsx(df: pd.DataFrame, chunk_rows: int = CHUNK_ROWS, sheet_title: str = "Report"):
+    if not HAS_OPENPYXL:
+        raise RuntimeError("XLSX export requires openpyxl.")
+    path = _tempfile(".xlsx")
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=sheet_title[:31])
+    ws.append([str(c) for c in df.columns])
+    for chunk in iter_chunks(df, chunk_rows):
+        for row in _as_text(chunk).itertuples(index=False, name=None):
+            ws.append(list(row))
+    wb.save(path)
+    yield from _stream_file(path)
+
+
+def _arrow_schema(df: pd.DataFrame):
+    """Keep datetime/numeric/bool columns typed; everything else is a string."""
+    fields = []
+    for col in df.columns:
+        s = df[col]
+        if pd.api.types.is_datetime64_any_dtype(s):
+            t = pa.timestamp("us")
+        elif pd.api.types.is_bool_dtype(s):
+            t = pa.bool_()
+        elif pd.api.types.is_integer_dtype(s):
+            t = pa.int64()
+        elif pd.api.types.is_float_dtype(s):
+            t = pa.float64()
+        else:
+            t = pa.string()
+        fields.append((str(col), t))
+    return pa.schema(fields)
+
+
+def _for_arrow(chunk: pd.DataFrame, schema) -> pd.DataFrame:
+    out = {}
+    for field, col in zip(schema, chunk.columns):
+        s = chunk[col]
+        out[field.name] = s.astype("string") if field.type == pa.string() else s
+    return pd.DataFrame(out, index=chunk.index)
+
+
+def stream_parquet(df: pd.DataFrame, chunk_rows: int = CHUNK_ROWS):
+    if not HAS_PYARROW:
+        raise RuntimeError("Parquet export requires pyarrow.")
+    path = _tempfile(".parquet")
+    schema = _arrow_schema(df)
+    with pq.ParquetWriter(path, schema) as writer:
+        for chunk in iter_chunks(df, chunk_rows):
+            writer.write_table(pa.Table.from_pandas(_for_arrow(chunk, schema), schema=schema, preserve_index=False))
+    yield from _stream_file(path)
+
+
+STREAMS = {"CSV": stream_csv, "XLSX": stream_xlsx, "Parquet": stream_parquet}
+
+
+def export_file(df: pd.DataFrame, fmt: str) -> bytes:
+    """The whole export as bytes, for st.download_button's deferred ``data``.
+
+    The download button does not stream: the complete file is built in memory
+    on click and kept there until Streamlit has served it.
+    """
+    return b"".join(STREAMS[fmt](df))
@@ -0,0 +1,498 @@
+"""
+Bulk import of historical inspection records (paper / Excel logs).
+
+``HistoryImporter`` streams a CSV or XLSX file in blocks of ``chunk_rows``
+source rows. Each block goes through:
+
+1. normalize: headers matched to the Sheet1 / Forklift schema ignoring case,
+   accents and separators (plus a few aliases); cells trimmed; dates written
+   the way the forms write them; assets, and users where known, resolved
+   through master data (names, aliases and codes map to the id); checklist
+   marks mapped to "X" / "B" / "X B";
+2. validate: required fields, parseable dates not in the future, allowed
+   Transaction / Status values, numeric Operation hours, known assets. Rejected
+   rows go to the rejects CSV with the reason;
+3. dedupe: a SHA-1 of the identifying columns (date-time, asset, user,
+   transaction/status or hours), compared with the rows already in the
+   destination worksheets and in Web_App (each read once) and with the rows
+   imported so far;
+4. append: rows are routed to their spreadsheet shard and appended with one
+   ``append_rows`` per destination. Requests are paced under
+   ``requests_per_minute`` and retried with backoff on quota / 5xx errors and
+   timeouts. A failed append may still have been committed by Google, so it
+   is retried only after reading the worksheet back shows the rows missing;
+5. checkpoint: the number of source rows done is saved after every block, so
+   a rerun resumes after the last completed block. Rows of a block that was
+   appended but not checkpointed are caught by the dedupe.
+
+The shared worksheet cache is invalidated per destination. Open report
+sessions pick up the imported rows on their next full reload.
+"""
+import csv
+import hashlib
+import json
+import os
+import random
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+import gspread
+import pandas as pd
+import requests
+
+from common.checklists import get_checklist
+from common.hours_index import get_hours_index
+from common.master_data import get_master_data, normalize_text
+from common.shards import open_shard, read_shards, shard_for, shard_worksheet, site_of
+from common.shared_cache import invalidate
+from common.sheet_reads import forget_header
+from common.sheets import WORKBOOK
+
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+DATE_FORMAT = "%Y-%m-%d"
+
+
+# =========================
+# Schemas
+# =========================
+@dataclass(frozen=True)
+class Schema:
+    worksheet: str
+    kind: str                      # master-data kind of the asset column
+    asset_column: str
+    user_column: str
+    date_column: str               # date-only column the forms also fill
+    columns: tuple                 # base columns, in the forms' order
+    required: tuple
+    key_columns: tuple             # what makes two rows the same record
+    choices: dict = field(default_factory=dict)
+    numeric: tuple = ()
+    aliases: dict = field(default_factory=dict)
+
+
+SCHEMAS = {
+    "tools": Schema(
+        worksheet="Sheet1",
+        kind="equipment",
+        asset_column="Equipment_Selected",
+        user_column="User",
+        date_column="Date",
+        columns=("DateTime", "Date", "User", "Equipment", "Equipment_Selected", "Transaction", "Status", "Comments"),
+        required=("DateTime", "User", "Equipment_Selected", "Transaction", "Status"),
+        key_columns=("DateTime", "Equipment_Selected", "User", "Transaction", "Status"),
+        choices={
+            "Transaction": {"check in": "Check In", "checkin": "Check In", "in": "Check In",
+                            "check out": "Check Out", "checkout": "Check Out", "out": "Check Out"},
+            "Status": {"checked": "Checked", "ok": "Checked",
+                       "broken down": "Broken Down", "broken": "Broken Down"},
+        },
+        aliases={"asset": "Equipment_Selected", "tool": "Equipment_Selected", "employee": "User",
+                 "timestamp": "DateTime", "remarks": "Comments"},
+    ),
+    "forklift": Schema(
+        worksheet="Forklift",
+        kind="forklift",
+        asset_column="Forklift",
+        user_column="Employee Name",
+        date_column="FormDate",
+        columns=("DateTime", "FormDate", "Employee Name", "Forklift", "Operation", "Hours Check"),
+        required=("DateTime", "Employee Name", "Forklift", "Operation"),
+        key_columns=("DateTime", "Forklift", "Employee Name", "Operation"),
+        numeric=("Operation",),
+        aliases={"date": "FormDate", "employee": "Employee Name", "user": "Employee Name",
+                 "hours": "Operation", "operation hours": "Operation", "timestamp": "DateTime"},
+    ),
+}
+
+MARKS = {"x": "X", "ok": "X", "yes": "X", "checked": "X", "✓": "X", "✔": "X",
+         "b": "B", "broken": "B", "broken down": "B", "x b": "X B", "": ""}
+
+
+def checklist_columns(schema: Schema) -> set:
+    """Wide checklist columns of every equipment type of this kind in master data."""
+    md = get_master_data()
+    types = {(md.get(schema.kind, i).type or "") for i in md.ids(schema.kind)} or {""}
+    return {c for t in types for c in get_checklist(t).columns}
+
+
+def column_map(schema: Schema, header: list, extra: set) -> dict:
+    """Source column position -> schema column (unknown columns are left out)."""
+    known = {normalize_text(c): c for c in (*schema.columns, *sorted(extra))}
+    known.update(schema.aliases)
+    out = {}
+    for i, name in enumerate(header):
+        target = known.get(normalize_text(name))
+        if target and target not in out.values():
+            out[i] = target
+    return out
+
+
+def parse_dates(values: pd.Series, dayfirst: bool = False) -> pd.Series:
+    """Dates in any common format; ISO (year-first) values are never read day-first."""
+    iso = values.astype(str).str.match(r"\s*\d{4}-\d{1,2}-\d{1,2}")
+    out = pd.to_datetime(values.where(iso), errors="coerce", format="mixed")
+    if (~iso).any():
+        out = out.fillna(pd.to_datetime(values.where(~iso), errors="coerce", dayfirst=dayfirst, format="mixed"))
+    return out
+
+
+def content_keys(schema: Schema, df: pd.DataFrame) -> list:
+    """SHA-1 per row of the key columns, canonicalized the same way for sheet and source rows."""
+    parts = []
+    for col in schema.key_columns:
+        s = df[col].astype(str).str.strip() if col in df.columns else pd.Series("", index=df.index)
+        if col == "DateTime":
+            s = parse_dates(s).dt.strftime(DATETIME_FORMAT).fillna(s)
+        elif col in schema.numeric:
+            num = pd.to_numeric(s, errors="coerce").round(6)
+            s = num.map(lambda x: f"{x:.6f}".rstrip("0").rstrip("."), na_action="ignore").fillna(s)
+        else:
+            s = s.str.casefold()
+        parts.append(s)
+    joined = parts[0].str.cat(parts[1:], sep="\x1f") if len(parts) > 1 else parts[0]
+    return [hashlib.sha1(v.encode("utf-8")).digest() for v in joined]
+
+
+# =========================
+# Sources
+# =========================
+def iter_source(path: str, sheet: str = None):
+    """Header, then the data rows of a CSV or XLSX file, as lists of cells (streamed)."""
+    if os.path.splitext(path)[1].lower() in (".xlsx", ".xlsm"):
+        from openpyxl import load_workbook
+        wb = load_workbook(path, read_only=True, data_only=True)
+        try:
+            ws = wb[sheet] if sheet else wb.worksheets[0]
+            for row in ws.iter_rows(values_only=True):
+                yield ["" if v is None else v for v in row]
+        finally:
+            wb.close()
+        return
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        sample = f.read(64 * 1024)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        yield from csv.reader(f, dialect)
+
+
+def source_signature(path: str) -> dict:
+    stat = os.stat(path)
+    return {"source": os.path.abspath(path), "size": stat.st_size, "mtime": int(stat.st_mtime)}
+
+
+# =========================
+# Quota pacing
+# =========================
+class Pacer:
+    """Spaces API requests to stay under ``per_minute``."""
+
+    def __init__(self, per_minute: float):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self._next = 0.0
+        self.requests = 0
+
+    def wait(self, requests: int = 1) -> None:
+        now = time.monotonic()
+        if now < self._next:
+            time.sleep(self._next - now)
+        self._next = max(now, self._next) + self.interval * requests
+        self.requests += requests
+
+
+RETRIES = 5
+BACKOFF_SECONDS = 2.0
+
+
+def retryable(e: Exception) -> bool:
+    """Rate limit (429), server error (5xx) or a dropped / timed-out connection."""
+    if isinstance(e, gspread.exceptions.APIError):
+        code = getattr(e, "code", None) or 0
+        return code == 429 or code >= 500
+    return isinstance(e, (requests.exceptions.Timeout, requests.exceptions.ConnectionError))
+
+
+def backoff(attempt: int, base_seconds: float = BACKOFF_SECONDS) -> None:
+    time.sleep(base_seconds * 2 ** attempt + random.uniform(0, 1))
+
+
+def with_retries(fn, retries: int = RETRIES, base_seconds: float = BACKOFF_SECONDS):
+    """``fn()``, retried with exponential backoff on ``retryable`` errors. Only for idempotent requests."""
+    for attempt in range(retries + 1):
+        try:
+            return fn()
+        except Exception as e:
+            if attempt == retries or not retryable(e):
+                raise
+            backoff(attempt, base_seconds)
+
+
+# =========================
+# Importer
+# =========================
+class HistoryImporter:
+    def __init__(self, kind: str, path: str, sheet: str = None, chunk_rows: int = 2000,
+                 requests_per_minute: float = 50, dayfirst: bool = False, checkpoint: str = None,
+                 restart: bool = False, dry_run: bool = False, rejects: str = None,
+                 allow_unknown_assets: bool = False, log=print):
+        self.schema = SCHEMAS[kind]
+        self.kind = kind
+        self.path = path
+        self.sheet = sheet
+        self.chunk_rows = chunk_rows
+        self.pacer = Pacer(requests_per_minute)
+        self.dayfirst = dayfirst
+        self.checkpoint = checkpoint or os.path.join(
+            "/tmp/equipment_inspection/imports", f"{os.path.basename(path)}.{kind}.json"
+        )
+        self.restart = restart
+        self.dry_run = dry_run
+        self.rejects = rejects or f"{path}.{kind}.rejects.csv"
+        self.allow_unknown_assets = allow_unknown_assets
+        self.log = log
+        self.md = get_master_data()
+        self.extra = checklist_columns(self.schema)
+        self._seen = set()              # content keys of the rows in the destinations + imported
+        self._loaded = set()            # spreadsheets whose rows are in _seen
+        self._sheets = {}               # shard -> worksheet
+        self.stats = {"source_rows": 0, "imported": 0, "duplicates": 0, "rejected": 0, "appends_recovered": 0,
+                      "destinations": {}}
+
+    # ---- checkpoint ----
+    def _load_checkpoint(self) -> int:
+        if self.restart or not os.path.exists(self.checkpoint):
+            return 0
+        with open(self.checkpoint, encoding="utf-8") as f:
+            saved = json.load(f)
+        if {k: saved.get(k) for k in ("source", "size", "mtime")} != source_signature(self.path):
+            raise RuntimeError(f"{self.checkpoint} was written for another version of the file; use --restart")
+        self.stats.update(saved.get("stats", {}))
+        return int(saved.get("rows_done", 0))
+
+    def _save_checkpoint(self, rows_done: int, done: bool = False) -> None:
+        if self.dry_run:
+            return
+        os.makedirs(os.path.dirname(self.checkpoint) or ".", exist_ok=True)
+        tmp = f"{self.checkpoint}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({**source_signature(self.path), "kind": self.kind, "rows_done": rows_done,
+                       "done": done, "stats": self.stats}, f, indent=2)
+        os.replace(tmp, self.checkpoint)
+
+    # ---- normalize & validate ----
+    def _resolve(self, kind: str, value: str):
+        asset = self.md.get(kind, value) or self.md.resolve_code(value, kind)
+        return asset.id if asset is not None else None
+
+    def _normalize(self, block: pd.DataFrame):
+        """(rows ready to append, [(source row, reason)]) for a block of mapped source rows."""
+        s = self.schema
+        for col in (*s.columns, *s.key_columns):
+            if col not in block.columns:
+                block[col] = ""
+        text = block.drop(columns=["_row"]).apply(
+            lambda c: c.map(lambda v: v.strftime(DATETIME_FORMAT) if isinstance(v, datetime) else str(v).strip())
+        )
+        stamp = parse_dates(text["DateTime"].where(text["DateTime"] != "", text[s.date_column]), self.dayfirst)
+        latest = datetime.now() + timedelta(days=1)
+
+        good, rejected = [], []
+        for i, row in enumerate(text.to_dict("records")):
+            src = int(block["_row"].iat[i])
+            when = stamp.iat[i]
+            if pd.isna(when):
+                rejected.append((src, "missing or unparseable date"))
+                continue
+            if when > latest:
+                rejected.append((src, f"date in the future ({when:%Y-%m-%d})"))
+                continue
+            row["DateTime"] = when.strftime(DATETIME_FORMAT)
+            row[s.date_column] = when.strftime(DATE_FORMAT)
+
+            asset = self._resolve(s.kind, row[s.asset_column]) if row[s.asset_column] else None
+            if asset is None and not (self.allow_unknown_assets and row[s.asset_column]):
+                rejected.append((src, f"unknown {s.kind} {row[s.asset_column]!r}"))
+                continue
+            row[s.asset_column] = asset or row[s.asset_column]
+            if s.kind == "equipment":
+                row["Equipment"] = self._resolve("equipment", row["Equipment"]) or row["Equipment"] or row[s.asset_column]
+            row[s.user_column] = self._resolve("employee", row[s.user_column]) or row[s.user_column]
+
+            reason = None
+            for col, allowed in s.choices.items():
+                value = allowed.get(normalize_text(row[col]))
+                if value is None:
+                    reason = f"{col} {row[col]!r} is not one of {sorted(set(allowed.values()))}"
+                    break
+                row[col] = value
+            for col in s.numeric:
+                try:
+                    row[col] = float(row[col].replace(",", "."))
+                except ValueError:
+                    reason = reason or f"{col} {row[col]!r} is not a number"
+            reason = reason or next((f"{col} is empty" for col in s.required if row[col] in ("", None)), None)
+            for col in self.extra:
+                if col in row and not col.endswith(" Comments"):
+                    mark = MARKS.get(normalize_text(row[col]))
+                    if mark is None:
+                        reason = reason or f"{col} mark {row[col]!r} is not X / B / X B"
+                    row[col] = mark
+            if reason:
+                rejected.append((src, reason))
+                continue
+            good.append(row)
+        return good, rejected
+
+    # ---- destinations ----
+    def _destination(self, row: dict) -> str:
+        when = datetime.strptime(row["DateTime"], DATETIME_FORMAT)
+        return shard_for(site_of(self.schema.kind, row[self.schema.asset_column]), when)
+
+    def _worksheet(self, shard: str, create: bool = True):
+        """Worksheet of a spreadsheet (created if missing, unless ``create`` is off or in a dry run; else None)."""
+        if self._sheets.get(shard) is None:
+            self.pacer.wait()
+            if create and not self.dry_run:
+                self._sheets[shard] = with_retries(lambda: shard_worksheet(shard, self.schema.worksheet))
+            else:
+                try:
+                    self._sheets[shard] = with_retries(lambda: open_shard(shard).worksheet(self.schema.worksheet))
+                except (gspread.SpreadsheetNotFound, gspread.WorksheetNotFound):
+                    return None
+        return self._sheets[shard]
+
+    def _load_keys(self, shard: str) -> None:
+        """Add the rows already in ``shard`` (and in Web_App, which reports read too) to the seen keys."""
+        for name in {shard} | ({WORKBOOK} & set(read_shards())):
+            if name in self._loaded:
+                continue
+            self._loaded.add(name)
+            ws = self._worksheet(name, create=False)
+            values = []
+            if ws is not None:
+                self.pacer.wait()
+                values = with_retries(ws.get_all_values)
+            if len(values) > 1:
+                df = pd.DataFrame(values[1:], columns=[str(c).strip() for c in values[0]])
+                self._seen.update(content_keys(self.schema, df))
+
+    def _append(self, shard: str, rows: list) -> None:
+        ws = self._worksheet(shard)
+        df = pd.DataFrame(rows)
+        # Forms' column order first (it becomes the header of a new worksheet), then the checklist columns
+        df = df[[c for c in self.schema.columns if c in df.columns] + [c for c in df.columns if c not in self.schema.columns]]
+        # As append_aligned, but only the idempotent requests are simply retried
+        self.pacer.wait()
+        header = [str(c).strip() for c in with_retries(lambda: ws.row_values(1))]
+        columns = header + [c for c in df.columns if c not in header]
+        values = df.reindex(columns=columns).fillna("").values.tolist()
+        if not header:
+            values = [columns] + values
+        elif columns != header:
+            self.pacer.wait()
+            with_retries(lambda: ws.update([columns], "A1"))
+        self._append_rows(ws, values, content_keys(self.schema, df))
+        if columns != header:
+            forget_header(ws)
+        invalidate(self.schema.worksheet, shard)
+        if self.kind == "forklift":
+            index = get_hours_index()
+            newest = df.assign(at=pd.to_datetime(df["DateTime"])).sort_values("at").groupby("Forklift").tail(1)
+            for r in newest.itertuples(index=False):
+                index.record(r.Forklift, r.Operation, time.mktime(r.at.timetuple()))
+
+    def _append_rows(self, ws, values: list, keys: list) -> None:
+        """``append_rows``; after a retryable failure, retried only if reading back shows the rows missing."""
+        for attempt in range(RETRIES + 1):
+            try:
+                self.pacer.wait()
+                ws.append_rows(values)
+                return
+            except Exception as e:
+                if attempt == RETRIES or not retryable(e):
+                    raise
+            backoff(attempt)
+            self.pacer.wait()
+            existing = with_retries(ws.get_all_values)
+            if len(existing) > 1:
+                df = pd.DataFrame(existing[1:], columns=[str(c).strip() for c in existing[0]])
+                if set(keys) <= set(content_keys(self.schema, df)):
+                    self.stats["appends_recovered"] += 1
+                    return                                  # the failed request was committed after all
+
+    # ---- run ----
+    def _process(self, block: list, header_map: dict) -> None:
+        """Import one block of (source row number, cells)."""
+        records = [{**{col: (cells[i] if i < len(cells) else "") for i, col in header_map.items()}, "_row": n}
+                   for n, cells in block]
+        good, rejected = self._normalize(pd.DataFrame(records))
+        self.stats["source_rows"] += len(block)
+        self.stats["rejected"] += len(rejected)
+        self._write_rejects(rejected, dict(block))
+
+        by_shard = {}
+        if good:
+            keys = content_keys(self.schema, pd.DataFrame(good))
+            for row, key in zip(good, keys):
+                shard = self._destination(row)
+                self._load_keys(shard)
+                if key in self._seen:
+                    self.stats["duplicates"] += 1
+                    continue
+                self._seen.add(key)
+                by_shard.setdefault(shard, []).append(row)
+        for shard, rows in by_shard.items():
+            if not self.dry_run:
+                self._append(shard, rows)
+            name = f"{shard}!{self.schema.worksheet}"
+            self.stats["destinations"][name] = self.stats["destinations"].get(name, 0) + len(rows)
+            self.stats["imported"] += len(rows)
+
+    def _write_rejects(self, rejected: list, cells: dict) -> None:
+        if not rejected:
+            return
+        new = not os.path.exists(self.rejects)
+        with open(self.rejects, "a", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            if new:
+                w.writerow(["source_row", "reason", *self._header])
+            for src, reason in rejected:
+                w.writerow([src, reason, *cells[src]])
+
+    def run(self) -> dict:
+        t0 = time.monotonic()
+        rows_done = self._load_checkpoint()
+        rows = iter_source(self.path, self.sheet)
+        self._header = [str(h).strip() for h in next(rows, [])]
+        header_map = column_map(self.schema, self._header, self.extra)
+        missing = [c for c in self.schema.required if c not in header_map.values()
+                   and not (c == "DateTime" and self.schema.date_column in header_map.values())]
+        if missing:
+            raise ValueError(f"{self.path}: no column for {missing} (columns: {self._header})")
+        self.stats["ignored_columns"] = [h for i, h in enumerate(self._header) if i not in header_map and h]
+        if rows_done:
+            self.log(f"resuming after {rows_done:,} source rows")
+        elif os.path.exists(self.rejects):
+            os.remove(self.rejects)                         # starting over: rejects of earlier runs are stale
+
+        done, block = 0, []
+        for cells in rows:
+            done += 1
+            if done <= rows_done or not any(str(c).strip() for c in cells):
+                continue
+            block.append((done + 1, list(cells)))          # source row number: the header is row 1
+            if len(block) >= self.chunk_rows:
+                self._process(block, header_map)
+                self._save_checkpoint(done)
+                self.log(f"{done:,} rows: {self.stats['imported']:,} imported, "
+                         f"{self.stats['duplicates']:,} duplicates, {self.stats['rejected']:,} rejected")
+                block = []
+        if block:
+            self._process(block, header_map)
+        self._save_checkpoint(done, done=True)
+        self.stats["requests"] = self.pacer.requests
+        self.stats["elapsed_s"] = round(time.monotonic() - t0, 1)
+        return self.stats
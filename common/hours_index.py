@@ -0,0 +1,157 @@
+"""
+Last operation-hours reading per forklift, for the submit-time sanity check.
+
+Readings live in a dict (O(1) lookup) backed by a SQLite file, so they survive
+restarts and are shared by every Streamlit process on the host: a reader
+reloads only when SQLite reports that another connection committed
+(``PRAGMA data_version``). The Forklift form records every appended reading;
+the Forklift worksheet is read once, only to seed an empty index.
+
+A new reading is flagged when it is lower than the last one, or higher than the
+clock allows (``max_hours_per_day`` per elapsed day, plus ``tolerance``):
+
+    [hours_check]
+    path = "/tmp/equipment_inspection/hours_index.db"
+    max_hours_per_day = 24
+    tolerance = 1
+"""
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+
+import pandas as pd
+import streamlit as st
+
+from common.shared_cache import worksheet_values
+from common.sheets import secrets_section
+
+
+@dataclass(frozen=True)
+class Reading:
+    hours: float
+    at: float        # epoch seconds
+
+
+@dataclass(frozen=True)
+class HoursIssue:
+    kind: str        # "lower" | "jump"
+    last: Reading
+    message: str
+
+
+class HoursIndex:
+    def __init__(self, path: str, max_hours_per_day: float = 24.0, tolerance: float = 1.0):
+        self.path = path
+        self.max_hours_per_day = max_hours_per_day
+        self.tolerance = tolerance
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._con = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self._con.execute("PRAGMA journal_mode=WAL")
+        self._con.execute(
+            "CREATE TABLE IF NOT EXISTS readings (forklift TEXT PRIMARY KEY, hours REAL NOT NULL, at REAL NOT NULL)"
+        )
+        self._con.commit()
+        self._last = {}
+        self._version = None
+        self._reload()
+
+    def _reload(self) -> None:
+        version = self._con.execute("PRAGMA data_version").fetchone()[0]
+        if version != self._version:
+            self._last = {f: Reading(h, a) for f, h, a in self._con.execute("SELECT forklift, hours, at FROM readings")}
+            self._version = version
+
+    def __len__(self) -> int:
+        return len(self._last)
+
+    def last(self, forklift: str):
+        with self._lock:
+            self._reload()
+            return self._last.get(str(forklift).strip())
+
+    def record(self, forklift: str, hours: float, at: float = None) -> None:
+        """Store a reading if it is the newest for this forklift."""
+        at = time.time() if at is None else at
+        key = str(forklift).strip()
+        with self._lock:
+            self._con.execute(
+                "INSERT INTO readings(forklift, hours, at) VALUES (?, ?, ?) "
+                "ON CONFLICT(forklift) DO UPDATE SET hours = excluded.hours, at = excluded.at "
+                "WHERE excluded.at >= readings.at",
+                (key, float(hours), at),
+            )
+            self._con.commit()
+            prev = self._last.get(key)
+            if prev is None or at >= prev.at:
+                self._last[key] = Reading(float(hours), at)
+
+    def seed(self, readings) -> None:
+        """Bulk-load (forklift, hours, at) rows, keeping the newest per forklift."""
+        newest = {}
+        for forklift, hours, at in readings:
+            key = str(forklift).strip()
+            if key and (key not in newest or at >= newest[key][1]):
+                newest[key] = (float(hours), at)
+        with self._lock:
+            self._con.executemany(
+                "INSERT OR IGNORE INTO readings(forklift, hours, at) VALUES (?, ?, ?)",
+                [(k, h, a) for k, (h, a) in newest.items()],
+            )
+            self._con.commit()
+            self._version = None
+            self._reload()
+
+    def check(self, forklift: str, hours: float, now: float = None):
+        """HoursIssue if ``hours`` is implausible against the last reading, else None."""
+        last = self.last(forklift)
+        if last is None:
+            return None
+        now = time.time() if now is None else now
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(last.at))
+        if hours < last.hours:
+            return HoursIssue("lower", last, f"{hours:,.1f} h is lower than the last reading {last.hours:,.1f} h ({when}).")
+        days = max(now - last.at, 0.0) / 86400
+        allowed = days * self.max_hours_per_day + self.tolerance
+        if hours - last.hours > allowed:
+            return HoursIssue(
+                "jump", last,
+                f"{hours:,.1f} h is {hours - last.hours:,.1f} h above the last reading {last.hours:,.1f} h ({when}); "
+                f"at most {allowed:,.1f} h are possible since then.",
+            )
+        return None
+
+
+def readings_from_values(values: list) -> list:
+    """(forklift, hours, at) from Forklift worksheet values (header first)."""
+    if len(values) < 2:
+        return []
+    df = pd.DataFrame(values[1:], columns=[str(c).strip() for c in values[0]])
+    if "Forklift" not in df.columns or "Operation" not in df.columns:
+        return []
+    time_col = "DateTime" if "DateTime" in df.columns else "FormDate"
+    hours = pd.to_numeric(df["Operation"], errors="coerce")
+    at = pd.to_datetime(df.get(time_col), errors="coerce")
+    ok = hours.notna() & at.notna()
+    # Sheet timestamps are local wall-clock time (datetime.now() at submit).
+    epoch = [time.mktime(t.timetuple()) for t in at[ok]]
+    return list(zip(df.loc[ok, "Forklift"], hours[ok], epoch))
+
+
+@st.cache_resource
+def get_hours_index() -> HoursIndex:
+    cfg = secrets_section("hours_check")
+    index = HoursIndex(
+        cfg.get("path", "/tmp/equipment_inspection/hours_index.db"),
+        max_hours_per_day=float(cfg.get("max_hours_per_day", 24)),
+        tolerance=float(cfg.get("tolerance", 1)),
+    )
+    if not len(index):
+        # First start on this host: seed from the sheet once.
+        try:
+            index.seed(readings_from_values(worksheet_values("Forklift")))
+        except Exception:
+            pass
+    return index
@@ -0,0 +1,56 @@
+import smtplib
+from email.mime.image import MIMEImage
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+import streamlit as st
+
+
+def build_message(from_address, to, subject, body, subtype="plain", attachments=()):
+    """attachments: iterable of (bytes, filename[, content_id]); a content_id makes the image inline."""
+    msg = MIMEMultipart("related" if any(len(a) > 2 for a in attachments) else "mixed")
+    msg["From"] = from_address
+    msg["To"] = to if isinstance(to, str) else ", ".join(to)
+    msg["Subject"] = subject
+    msg.attach(MIMEText(body, subtype))
+    for data, fname, *cid in attachments:
+        img = MIMEImage(data)
+        if cid:
+            img.add_header("Content-ID", f"<{cid[0]}>")
+            img.add_header("Content-Disposition", "inline", filename=fname)
+        else:
+            img.add_header("Content-Disposition", "attachment", filename=fname)
+        msg.attach(img)
+    return msg
+
+
+def send_messages(messages) -> None:
+    """Send several messages over ONE SMTP session (STARTTLS 587, fallback SSL 465)."""
+    cfg = st.secrets["email"]
+    sender = cfg["user"]
+    password = cfg["app_password"]
+    host = cfg.get("smtp_host", "smtp.gmail.com")
+    port_tls = int(cfg.get("smtp_port", 587))
+
+    try:
+        server = smtplib.SMTP(host, port_tls, timeout=20)
+        server.ehlo(); server.starttls(); server.ehlo()
+        server.login(sender, password)
+    except Exception:
+        server = smtplib.SMTP_SSL(host, 465, timeout=20)
+        server.login(sender, password)
+
+    try:
+        for msg in messages:
+            rcpts = [a.strip() for a in msg["To"].split(",") if a.strip()]
+            server.sendmail(sender, rcpts, msg.as_string())
+    finally:
+        server.quit()
+
+
+def sender_address() -> str:
+    return st.secrets["email"]["user"]
+
+
+def alert_recipient() -> str:
+    return st.secrets["email"].get("to_alert", st.secrets["email"]["user"])
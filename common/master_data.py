@@ -0,0 +1,327 @@
+"""
+Master data registry: equipment, forklifts and employees.
+
+Loaded once per process from the ``MasterData`` worksheet (if configured) or the
+local ``master_data.csv`` and rebuilt only when the source changes. Each kind
+gets a prefix + trigram index for type-ahead search and a normalized code map
+for resolving scanned QR payloads to assets.
+
+Source columns: kind, id, name, type, aliases (aliases separated by ``|``) and,
+optionally, site (which spreadsheet shard the asset's logs go to).
+"""
+import csv
+import hashlib
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from urllib.parse import parse_qs, urlparse
+
+import streamlit as st
+
+from common.sheets import open_workbook, secrets_section
+
+KINDS = ("equipment", "forklift", "employee")
+MASTER_COLUMNS = ["kind", "id", "name", "type", "aliases", "site"]
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "master_data.csv")
+
+MAX_PREFIX = 4        # prefixes up to this length are looked up directly
+MAX_OPTIONS = 200     # cap on options sent to a selectbox
+FUZZY_MIN_SCORE = 0.3
+FUZZY_MAX_SCAN = 500   # posting entries read to find fuzzy candidates (rarest trigrams first)
+FUZZY_MAX_RESULTS = 20
+
+
+# =========================
+# Normalization
+# =========================
+_SEP_RE = re.compile(r"[\s_\-./:]+")
+_CODE_RE = re.compile(r"[^0-9a-z]+")
+
+
+def normalize_text(value: str) -> str:
+    """Casefold, strip accents and collapse separators to single spaces."""
+    s = unicodedata.normalize("NFKD", str(value))
+    s = "".join(ch for ch in s if not unicodedata.combining(ch)).casefold()
+    return _SEP_RE.sub(" ", s).strip()
+
+
+def normalize_code(value: str) -> str:
+    """Canonical key for scanned codes: 'ME-123 456', 'me123456' -> 'me123456'.
+
+    URL payloads resolve to their ``id``/``asset`` query parameter or last path segment.
+    """
+    s = str(value or "").strip()
+    if "://" in s:
+        url = urlparse(s)
+        qs = parse_qs(url.query)
+        for k in ("id", "asset", "code"):
+            if qs.get(k):
+                s = qs[k][0]
+                break
+        else:
+            parts = [p for p in url.path.split("/") if p]
+            s = parts[-1] if parts else ""
+    s = unicodedata.normalize("NFKD", s)
+    s = "".join(ch for ch in s if not unicodedata.combining(ch)).casefold()
+    return _CODE_RE.sub("", s)
+
+
+def _trigrams(s: str) -> set:
+    padded = f"  {s} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+# =========================
+# Search index
+# =========================
+class SearchIndex:
+    """Prefix + trigram index over a list of labels.
+
+    Short queries hit the prefix table directly; longer ones intersect trigram
+    postings and verify by substring. Only a query without any such hit falls
+    back to fuzzy (Dice) matches, from a bounded candidate set.
+    ``values[i]`` is returned for a hit on ``labels[i]`` (default: the label);
+    several labels may share a value, which is returned once.
+    """
+
+    def __init__(self, labels, values=None):
+        self.labels = list(labels)
+        self.values = list(values) if values is not None else self.labels
+        self._norm = [normalize_text(x) for x in self.labels]
+        self._prefix = defaultdict(list)
+        self._grams = defaultdict(set)
+        self._gram_count = []
+        for i, norm in enumerate(self._norm):
+            seen = set()
+            for tok in [norm] + norm.split(" "):
+                for k in range(1, min(len(tok), MAX_PREFIX) + 1):
+                    p = tok[:k]
+                    if p not in seen:
+                        seen.add(p)
+                        self._prefix[p].append(i)
+            grams = _trigrams(norm)
+            self._gram_count.append(len(grams))
+            for g in grams:
+                self._grams[g].add(i)
+
+    def search(self, query: str, limit: int = MAX_OPTIONS) -> list:
+        q = normalize_text(query)
+        if not q:
+            return self._unique(range(len(self.labels)), limit)
+
+        if len(q) <= MAX_PREFIX and " " not in q:
+            return self._unique(self._prefix.get(q, []), limit)
+
+        grams = _trigrams(q)
+        # A substring hit only needs the query's inner trigrams (the padded ones mark label ends)
+        inner = sorted((self._grams.get(q[i:i + 3], set()) for i in range(len(q) - 2)), key=len)
+        cand = set(inner[0]).intersection(*inner[1:]) if inner else range(len(self._norm))
+        exact = sorted(i for i in cand if q in self._norm[i])
+        if exact:
+            return self._unique(exact, limit)
+        return self._unique(self._fuzzy(grams, limit=min(limit, FUZZY_MAX_RESULTS)), limit)
+
+    def _unique(self, positions, limit: int) -> list:
+        out, seen = [], set()
+        for i in positions:
+            v = self.values[i]
+            if v not in seen:
+                seen.add(v)
+                out.append(v)
+                if len(out) == limit:
+                    break
+        return out
+
+    def _fuzzy(self, grams: set, limit: int) -> list:
+        """Best Dice matches. Candidates come from the rarest trigrams' postings (about
+        ``FUZZY_MAX_SCAN`` entries); the common trigrams are then checked per candidate."""
+        postings = sorted((self._grams.get(g, set()) for g in grams), key=len)
+        counts = Counter()
+        scanned, k = 0, 0
+        for k, posting in enumerate(postings):
+            if counts and scanned + len(posting) > FUZZY_MAX_SCAN:
+                break
+            counts.update(posting)
+            scanned += len(posting)
+        else:
+            k = len(postings)
+        rest = postings[k:]
+        scored = []
+        for i, n in counts.items():
+            n += sum(1 for posting in rest if i in posting)
+            score = 2.0 * n / (len(grams) + self._gram_count[i])
+            if score >= FUZZY_MIN_SCORE:
+                scored.append((-score, i))
+        scored.sort()
+        return [i for _, i in scored[:limit]]
+
+
+# =========================
+# Registry
+# =========================
+@dataclass(frozen=True)
+class Asset:
+    kind: str
+    id: str
+    name: str = ""
+    type: str = ""
+    aliases: tuple = field(default_factory=tuple)
+    site: str = ""
+
+
+class MasterData:
+    """Immutable snapshot of master data with per-kind indexes."""
+
+    def __init__(self, rows):
+        self._assets = {k: {} for k in KINDS}
+        for r in rows:
+            kind = str(r.get("kind", "")).strip().lower()
+            asset_id = str(r.get("id", "")).strip()
+            if kind not in self._assets or not asset_id or asset_id in self._assets[kind]:
+                continue
+            aliases = tuple(a.strip() for a in str(r.get("aliases", "") or "").split("|") if a.strip())
+            self._assets[kind][asset_id] = Asset(
+                kind=kind,
+                id=asset_id,
+                name=str(r.get("name", "") or "").strip() or asset_id,
+                type=str(r.get("type", "") or "").strip(),
+                aliases=aliases,
+                site=str(r.get("site", "") or "").strip(),
+            )
+        self._index = {k: self._search_index(v) for k, v in self._assets.items()}
+        self._codes = {k: {} for k in KINDS}
+        for kind, assets in self._assets.items():
+            for a in assets.values():
+                for code in (a.id, a.name) + a.aliases:
+                    key = normalize_code(code)
+                    if key:
+                        self._codes[kind].setdefault(key, a)
+
+    @staticmethod
+    def _search_index(assets: dict) -> SearchIndex:
+        """Ids, names and aliases, each mapped back to the asset id (ids first, so they rank first)."""
+        entries = [(a.id, a.id) for a in assets.values()]
+        entries += [(a.name, a.id) for a in assets.values() if a.name != a.id]
+        entries += [(alias, a.id) for a in assets.values() for alias in a.aliases]
+        return SearchIndex([label for label, _ in entries], [asset_id for _, asset_id in entries])
+
+    def ids(self, kind: str) -> list:
+        return list(self._assets[kind])
+
+    def get(self, kind: str, asset_id: str):
+        return self._assets[kind].get(str(asset_id).strip())
+
+    def search(self, kind: str, query: str, limit: int = MAX_OPTIONS) -> list:
+        return self._index[kind].search(query, limit=limit)
+
+    def resolve_code(self, code: str, kind: str = None):
+        """Map a scanned/typed code to an Asset (None if unknown)."""
+        key = normalize_code(code)
+        if not key:
+            return None
+        for k in ([kind] if kind else KINDS):
+            hit = self._codes[k].get(key)
+            if hit is not None:
+                return hit
+        return None
+
+
+# =========================
+# Loading & change detection
+# =========================
+def _read_csv(path: str) -> list:
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return list(csv.DictReader(f))
+
+
+def _rows_from_values(values: list) -> list:
+    if not values:
+        return []
+    header = [str(c).strip().lower() for c in values[0]]
+    return [dict(zip(header, row)) for row in values[1:]]
+
+
+class MasterDataLoader:
+    """Holds the current MasterData and rebuilds it only when the source changes.
+
+    Local file: (mtime, size) checked on every access (a stat call).
+    Worksheet: re-fetched at most every ``ttl`` seconds, rebuilt on content hash change.
+    """
+
+    def __init__(self, worksheet: str = None, path: str = DEFAULT_PATH, ttl: float = 300.0):
+        self.worksheet = worksheet
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._data = None
+        self._signature = None
+        self._checked_at = 0.0
+
+    def current(self) -> MasterData:
+        with self._lock:
+            if self.worksheet:
+                self._refresh_worksheet()
+            else:
+                self._refresh_file()
+            return self._data
+
+    def _refresh_file(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            if self._data is None:
+                self._data = MasterData([])
+            return
+        sig = (stat.st_mtime_ns, stat.st_size)
+        if sig != self._signature:
+            self._data = MasterData(_read_csv(self.path))
+            self._signature = sig
+
+    def _refresh_worksheet(self):
+        now = time.monotonic()
+        if self._data is not None and now - self._checked_at < self.ttl:
+            return
+        self._checked_at = now
+        try:
+            values = open_workbook().worksheet(self.worksheet).get_all_values()
+        except Exception:
+            # Keep serving the last good snapshot; fall back to the local file on first load.
+            if self._data is None:
+                self._refresh_file()
+            return
+        sig = hashlib.sha1(repr(values).encode("utf-8")).hexdigest()
+        if sig != self._signature:
+            self._data = MasterData(_rows_from_values(values))
+            self._signature = sig
+
+
+@st.cache_resource
+def _loader() -> MasterDataLoader:
+    cfg = secrets_section("master_data")
+    return MasterDataLoader(
+        worksheet=cfg.get("worksheet") or None,
+        path=cfg.get("path", DEFAULT_PATH),
+        ttl=float(cfg.get("ttl_seconds", 300)),
+    )
+
+
+def get_master_data() -> MasterData:
+    return _loader().current()
+
+
+# =========================
+# UI helper
+# =========================
+def asset_selectbox(label: str, kind: str, key: str, placeholder: str = "Please Select", container=st):
+    """Selectbox backed by the registry index, with a search box to narrow large lists."""
+    md = get_master_data()
+    query = container.text_input(f"Search {label}", key=f"{key}_search", placeholder="Type to filter…")
+    options = md.search(kind, query)
+    current = st.session_state.get(key)
+    if current and current != placeholder and current not in options:
+        options = [current] + options
+    return container.selectbox(label, [placeholder] + options, key=key)
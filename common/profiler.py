@@ -0,0 +1,215 @@
+"""
+On-demand profiling of single page reruns.
+
+Pages call ``profile_page(__file__)`` right after their imports. Normally
+that is a query-parameter lookup and nothing else. Opening a page with
+``?profile=<token>`` (the ``[profiler] token`` secret) turns capture on for
+that session; every full rerun of the page is then executed under cProfile
+and a stack sampler, and saved to ``dir`` as
+
+    <YYYYmmdd-HHMMSS-ffffff>_<page>.pstats           (python -m pstats, snakeviz)
+    <YYYYmmdd-HHMMSS-ffffff>_<page>.speedscope.json  (https://www.speedscope.app flamegraph)
+
+Only the newest ``keep`` captures are kept. The sidebar shows the last capture
+and a button to turn capture off again (so does ``?profile=off``).
+
+    [profiler]
+    token = "change-me"
+    dir = "/tmp/equipment_inspection/profiles"
+    keep = 20
+    interval_ms = 5
+
+Fragment reruns (checklist items, camera, signature) don't re-execute the
+page and are not captured.
+"""
+import glob
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+import streamlit as st
+
+from common.sheets import secrets_section
+
+SESSION_KEY = "_profiler"
+PARAM = "profile"
+
+_local = threading.local()
+
+
+def _config() -> dict:
+    cfg = secrets_section("profiler")
+    return {
+        "token": str(cfg.get("token", "")),
+        "dir": cfg.get("dir", "/tmp/equipment_inspection/profiles"),
+        "keep": int(cfg.get("keep", 20)),
+        "interval_ms": float(cfg.get("interval_ms", 5)),
+    }
+
+
+def _enabled() -> bool:
+    requested = st.query_params.get(PARAM)
+    if requested is None:
+        return bool(st.session_state.get(SESSION_KEY))
+    if requested == "off":
+        st.session_state.pop(SESSION_KEY, None)
+        return False
+    token = _config()["token"]
+    # No token configured: profiling can't be turned on from the URL.
+    st.session_state[SESSION_KEY] = bool(token) and requested == token
+    return st.session_state[SESSION_KEY]
+
+
+# =========================
+# Stack sampler (wall clock, for the flamegraph)
+# =========================
+class StackSampler:
+    """Samples one thread's Python stack every ``interval`` seconds, below ``root`` code."""
+
+    def __init__(self, thread_id: int, root, interval: float):
+        self.thread_id = thread_id
+        self.root = root
+        self.interval = interval
+        self.stacks = Counter()         # tuple of (name, file, line), root first -> seconds
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler-sampler", daemon=True)
+
+    def _stack(self):
+        frame = sys._current_frames().get(self.thread_id)
+        stack = []
+        while frame is not None and frame.f_code is not self.root:
+            code = frame.f_code
+            stack.append((getattr(code, "co_qualname", code.co_name), code.co_filename, code.co_firstlineno))
+            frame = frame.f_back
+        return tuple(reversed(stack))
+
+    def _run(self):
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            stack = self._stack()
+            now = time.perf_counter()
+            if stack:
+                self.stacks[stack] += now - last
+            last = now
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+def speedscope(stacks: Counter, name: str) -> dict:
+    frames, index = [], {}
+    samples, weights = [], []
+    for stack, seconds in stacks.items():
+        ids = []
+        for frame in stack:
+            if frame not in index:
+                index[frame] = len(frames)
+                frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+            ids.append(index[frame])
+        samples.append(ids)
+        weights.append(round(seconds * 1000, 3))
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled", "name": name, "unit": "milliseconds",
+            "startValue": 0, "endValue": round(sum(weights), 3),
+            "samples": samples, "weights": weights,
+        }],
+        "name": name,
+        "exporter": "common.profiler",
+    }
+
+
+# =========================
+# Capture files
+# =========================
+def _slug(script_path: str) -> str:
+    return re.sub(r"[^A-Za-z0-9]+", "-", os.path.splitext(os.path.basename(script_path))[0]).strip("-") or "page"
+
+
+def prune(directory: str, keep: int) -> None:
+    """Delete all but the newest ``keep`` captures (a capture = all files sharing a stem)."""
+    stems = sorted({os.path.basename(p).split(".", 1)[0] for p in glob.glob(os.path.join(directory, "*_*.*"))})
+    for stem in stems[:-keep] if keep > 0 else stems:
+        for path in glob.glob(os.path.join(directory, glob.escape(stem) + ".*")):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def _save(cfg: dict, script_path: str, profile, sampler: StackSampler, elapsed: float) -> str:
+    os.makedirs(cfg["dir"], exist_ok=True)
+    page = _slug(script_path)
+    stem = os.path.join(cfg["dir"], f"{datetime.now():%Y%m%d-%H%M%S-%f}_{page}")
+    if profile is not None:
+        profile.dump_stats(stem + ".pstats")
+    with open(stem + ".speedscope.json", "w", encoding="utf-8") as f:
+        json.dump(speedscope(sampler.stacks, f"{page} ({elapsed * 1000:,.0f} ms)"), f)
+    prune(cfg["dir"], cfg["keep"])
+    return stem
+
+
+def _controls(stem: str, elapsed: float) -> None:
+    with st.sidebar:
+        st.caption(f"⏱️ Rerun profiled: {elapsed * 1000:,.0f} ms → `{os.path.basename(stem)}`")
+        if st.button("Stop profiling", key="_profiler_stop"):
+            st.session_state.pop(SESSION_KEY, None)
+            st.query_params.pop(PARAM, None)
+            st.rerun()
+
+
+# =========================
+# Entry point
+# =========================
+def _run(code, script_path: str) -> None:
+    exec(code, {"__name__": "__main__", "__file__": script_path})
+
+
+def profile_page(script_path: str) -> None:
+    """Re-execute the calling page under the profiler when capture is on for this session, then stop."""
+    if getattr(_local, "active", False) or not _enabled():
+        return
+    import cProfile
+
+    cfg = _config()
+    with open(script_path, encoding="utf-8") as f:
+        code = compile(f.read(), script_path, "exec")
+
+    profile = cProfile.Profile()
+    sampler = StackSampler(threading.get_ident(), _run.__code__, cfg["interval_ms"] / 1000)
+    _local.active = True
+    finished = False
+    t0 = time.perf_counter()
+    sampler.start()
+    try:
+        profile.enable()
+    except ValueError:                  # another profiler is active in this thread/process
+        profile = None
+    try:
+        _run(code, script_path)
+        finished = True
+    finally:
+        if profile is not None:
+            profile.disable()
+        sampler.stop()
+        elapsed = time.perf_counter() - t0
+        _local.active = False
+        # Also saved when the page stops or reruns itself (st.stop / st.rerun raise through here).
+        try:
+            stem = _save(cfg, script_path, profile, sampler, elapsed)
+        except OSError as e:
+            stem = f"not saved: {e}"
+    if finished:
+        _controls(stem, elapsed)
+    st.stop()
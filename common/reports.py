@@ -0,0 +1,46 @@
+import pandas as pd
+
+from common.checklists import get_checklist
+
+# =========================
+# Report views shared by the Tables Report page and the exports
+# =========================
+def dashboard_columns() -> list:
+    """Columns the Dashboard reads from the "Dashboard" worksheet (metrics + forklift checklist items)."""
+    return ["Forklift", "Operation", "Date", "hours", "User"] + list(get_checklist("forklift").items)
+
+
+def tools_status_column(df_tools: pd.DataFrame):
+    """Sheet1 may carry a duplicated Status header (deduped to Status_2); prefer that one."""
+    if "Status_2" in df_tools.columns:
+        return "Status_2"
+    return "Status" if "Status" in df_tools.columns else None
+
+
+def tools_view(df_tools: pd.DataFrame, status_filter="All", transaction_filter="All", sort_order="Descending"):
+    """Tools "Last Transactions" view: status/transaction filters + Date sort."""
+    status_col = tools_status_column(df_tools)
+    txn_col = "Transaction" if "Transaction" in df_tools.columns else None
+    date_col = "Date" if "Date" in df_tools.columns else None
+
+    out = df_tools
+    if status_col and status_filter != "All":
+        out = out.loc[out[status_col] == status_filter]
+    if txn_col and transaction_filter != "All":
+        out = out.loc[out[txn_col] == transaction_filter]
+
+    # Windows come out of the time index already in date order: no re-sort (copy) needed then.
+    if date_col and not (sort_order == "Ascending" and out[date_col].is_monotonic_increasing):
+        out = out.sort_values(by=date_col, ascending=(sort_order == "Ascending"))
+    return out
+
+
+def filter_breakdowns(dfx: pd.DataFrame, sort_col=None, sort_order="asc"):
+    """Rows where ANY cell contains 'B' (breakdown marker), optionally sorted."""
+    if dfx.empty:
+        return dfx
+    mask = dfx.astype(str).apply(lambda s: s.str.contains("B", regex=False)).any(axis=1)
+    out = dfx.loc[mask]
+    if sort_col and sort_col in out.columns:
+        out = out.sort_values(by=sort_col, ascending=(sort_order == "asc"))
+    return out
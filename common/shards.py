@@ -0,0 +1,230 @@
+"""
+Inspection logs sharded across spreadsheets per site and year.
+
+A single workbook eventually hits Google's per-spreadsheet cell limit and
+gets slower to read as it grows. With a ``[shards]`` section, each submit is
+appended to the spreadsheet of its asset's site (master-data ``site`` column,
+else ``default_site``) and of its year, e.g. "Web_App North 2025". A shard
+that doesn't exist yet is created on its first write: as a copy of
+``template`` if set (so the Dashboard formulas come along), otherwise empty,
+with worksheets added as needed.
+
+Reports read the shards of the last ``read_years`` years, plus the original
+``Web_App`` workbook, which keeps the history from before sharding. Each
+shard is a separate shared-cache entry; they are fetched in parallel on a
+bounded thread pool and merged by column name. Read latency is the slowest
+shard's, not the sum of all of them. Existing shards are found from one Drive
+listing, cached for ``catalog_ttl_seconds``.
+
+    [shards]
+    name = "Web_App {site} {year}"
+    default_site = "Main"
+    template = ""              # spreadsheet key copied for new shards
+    share_with = []            # e-mails given edit access to new shards
+    read_years = 2             # 0 = every year
+    include_workbook = true
+    max_workers = 8
+    catalog_ttl_seconds = 600
+
+Without a ``[shards]`` section everything stays in the single Web_App workbook.
+"""
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import gspread
+import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+from common.master_data import get_master_data
+from common.sheets import WORKBOOK, open_workbook, secrets_section, shared_client
+
+_books = {}                   # shard name -> Spreadsheet
+_books_lock = threading.Lock()
+_create_lock = threading.Lock()
+_catalog = {"shards": None, "at": 0.0}
+_catalog_lock = threading.Lock()
+
+
+def _config() -> dict:
+    cfg = secrets_section("shards")
+    return {
+        "name": str(cfg.get("name", "")),
+        "default_site": str(cfg.get("default_site", "Main")),
+        "template": str(cfg.get("template", "")),
+        "share_with": list(cfg.get("share_with", [])),
+        "read_years": int(cfg.get("read_years", 2)),
+        "include_workbook": bool(cfg.get("include_workbook", True)),
+        "max_workers": int(cfg.get("max_workers", 8)),
+        "catalog_ttl_seconds": float(cfg.get("catalog_ttl_seconds", 600)),
+    }
+
+
+def sharded() -> bool:
+    return bool(_config()["name"])
+
+
+# =========================
+# Routing (write path)
+# =========================
+def shard_name(site: str, year: int) -> str:
+    return _config()["name"].format(site=site, year=year)
+
+
+def site_of(kind: str, asset_id: str) -> str:
+    """Site of an asset from master data (``default_site`` if it has none)."""
+    asset = get_master_data().get(kind, asset_id)
+    return (asset.site if asset is not None else "") or _config()["default_site"]
+
+
+def shard_for(site: str, when) -> str:
+    """Spreadsheet a record of ``site`` dated ``when`` belongs to (Web_App when not sharded)."""
+    if not sharded():
+        return WORKBOOK
+    return shard_name(site or _config()["default_site"], when.year)
+
+
+def _create(name: str):
+    cfg = _config()
+    client = shared_client()
+    book = client.copy(cfg["template"], title=name, copy_permissions=True) if cfg["template"] else client.create(name)
+    for email in cfg["share_with"]:
+        book.share(email, perm_type="user", role="writer", notify=False)
+    forget_catalog()
+    return book
+
+
+def open_shard(name: str, create: bool = False):
+    """Process-wide handle of a shard; with ``create``, a missing one is created first."""
+    if name == WORKBOOK:
+        return open_workbook()
+    with _books_lock:
+        book = _books.get(name)
+    if book is not None:
+        return book
+    try:
+        book = shared_client().open(name)
+    except gspread.SpreadsheetNotFound:
+        if not create:
+            raise
+        with _create_lock:              # one creation per process; re-check under the lock
+            try:
+                book = shared_client().open(name)
+            except gspread.SpreadsheetNotFound:
+                book = _create(name)
+    with _books_lock:
+        return _books.setdefault(name, book)
+
+
+def shard_worksheet(shard: str, worksheet: str):
+    """Worksheet of a shard to append to; the shard and the worksheet are created if missing."""
+    book = open_shard(shard, create=True)
+    try:
+        return book.worksheet(worksheet)
+    except gspread.WorksheetNotFound:
+        return book.add_worksheet(worksheet, rows=1000, cols=26)
+
+
+# =========================
+# Catalog (read path)
+# =========================
+def _name_pattern(name: str) -> re.Pattern:
+    parts = re.split(r"(\{site\}|\{year\})", name)
+    regex = "".join(
+        "(?P<site>.+?)" if p == "{site}" else r"(?P<year>\d{4})" if p == "{year}" else re.escape(p) for p in parts
+    )
+    return re.compile(f"^{regex}$")
+
+
+def catalog(refresh: bool = False) -> list:
+    """(name, site, year) of every existing shard, sorted by year and site."""
+    ttl = _config()["catalog_ttl_seconds"]
+    with _catalog_lock:
+        if not refresh and _catalog["shards"] is not None and time.monotonic() - _catalog["at"] < ttl:
+            return _catalog["shards"]
+    pattern = _name_pattern(_config()["name"])
+    shards = set()
+    for f in shared_client().list_spreadsheet_files():
+        m = pattern.match(f.get("name", ""))
+        if m:
+            shards.add((f["name"], m.groupdict().get("site", ""), int(m.group("year")) if "year" in m.groupdict() else 0))
+    shards = sorted(shards, key=lambda s: (s[2], s[1]))
+    with _catalog_lock:
+        _catalog.update(shards=shards, at=time.monotonic())
+    return shards
+
+
+def forget_catalog() -> None:
+    with _catalog_lock:
+        _catalog["shards"] = None
+
+
+def read_shards() -> list:
+    """Spreadsheets the reports read: Web_App (history before sharding) first, then the shards by year."""
+    if not sharded():
+        return [WORKBOOK]
+    cfg = _config()
+    first = date.today().year - cfg["read_years"] + 1 if cfg["read_years"] > 0 else 0
+    shards = [name for name, _, year in catalog() if year >= first]
+    return ([WORKBOOK] if cfg["include_workbook"] else []) + shards
+
+
+def history_shards(site: str, when) -> list:
+    """Where the recent records of a site are: its shard for ``when``, last year's and Web_App (oldest first)."""
+    current = shard_for(site, when)
+    if current == WORKBOOK:
+        return [WORKBOOK]
+    existing = {name for name, _, _ in catalog()}
+    previous = shard_name(site or _config()["default_site"], when.year - 1)
+    return (
+        ([WORKBOOK] if _config()["include_workbook"] else [])
+        + ([previous] if previous in existing else [])
+        + [current]
+    )
+
+
+# =========================
+# Fan-out & merge
+# =========================
+@st.cache_resource
+def _pool() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=max(1, _config()["max_workers"]), thread_name_prefix="shard-read")
+
+
+def fan_out(fn, items: list) -> list:
+    """``fn(item)`` for every item on the process-wide pool (bounded), results in ``items`` order."""
+    if len(items) <= 1:
+        return [fn(item) for item in items]
+    ctx = get_script_run_ctx(suppress_warning=True)
+
+    def run(item):
+        if ctx is not None:
+            add_script_run_ctx(ctx=ctx)     # st.cache_*/st.secrets used by fn see the calling session
+        return fn(item)
+
+    return list(_pool().map(run, items))
+
+
+def merge_values(parts: list) -> list:
+    """Worksheet values (header first) of several shards as one; columns matched by name, in first-seen order."""
+    parts = [p for p in parts if p]
+    if len(parts) <= 1:
+        return parts[0] if parts else []
+    header, seen = [], set()
+    for p in parts:
+        for name in (str(h).strip() for h in p[0]):
+            if name not in seen:
+                seen.add(name)
+                header.append(name)
+    merged = [header]
+    for p in parts:
+        names = [str(h).strip() for h in p[0]]
+        if names == header:
+            merged.extend(p[1:])
+            continue
+        pos = {name: i for i, name in enumerate(names)}     # duplicated headers: last occurrence
+        index = [pos.get(c) for c in header]
+        merged.extend([row[i] if i is not None and i < len(row) else "" for i in index] for row in p[1:])
+    return merged
@@ -0,0 +1,317 @@
+"""
+Host-wide worksheet cache shared by every Streamlit process (replica).
+
+Worksheet values live in one SQLite file, keyed by worksheet name with a data
+version that only changes when the content digest changes. Replicas read from
+it; one replica at a time holds a lease and refreshes every watched worksheet
+in the background, so Google Sheets is hit once per host instead of once per
+replica. A replica fetches directly only when an entry is missing, older than
+``max_age_seconds`` or invalidated after a submit. With spreadsheet shards
+(``common/shards.py``) every shard is an entry of its own; a worksheet read
+fans out to them in parallel and merges the values.
+
+    [shared_cache]
+    path = "/tmp/equipment_inspection/sheets_cache.db"
+    refresh_seconds = 60
+    max_age_seconds = 300
+    lease_seconds = 30
+"""
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+import gspread
+import streamlit as st
+
+from common.shards import fan_out, merge_values, open_shard, read_shards
+from common.sheet_reads import projected_values
+from common.sheets import WORKBOOK, open_workbook, secrets_section
+
+REPLICA_ID = f"{socket.gethostname()}:{os.getpid()}"
+STATS_INTERVAL_SECONDS = 5.0        # replica stats are written to the file at most this often
+
+# Worksheets computed from another one (formulas), invalidated together with it.
+DERIVED_WORKSHEETS = {"Forklift": ("Dashboard",)}
+
+
+def view_key(worksheet: str, columns=None, shard: str = None) -> str:
+    """Cache key of a worksheet, or of a column projection of it ("Dashboard[Forklift|Date]").
+
+    Shards other than Web_App prefix it: "Web_App North 2025!Dashboard[Forklift|Date]".
+    """
+    key = f"{worksheet}[{'|'.join(columns)}]" if columns else worksheet
+    return f"{shard}!{key}" if shard and shard != WORKBOOK else key
+
+
+@contextmanager
+def connect(path: str):
+    """SQLite connection for one transaction: committed (or rolled back) and closed on exit."""
+    con = sqlite3.connect(path, timeout=10)
+    try:
+        with con:
+            yield con
+    finally:
+        con.close()
+
+
+def fetch_view(key: str) -> list:
+    head, _, cols = key.partition("[")
+    shard, _, worksheet = head.rpartition("!")
+    try:
+        ws = (open_shard(shard) if shard else open_workbook()).worksheet(worksheet)
+    except gspread.WorksheetNotFound:
+        if not shard:
+            raise
+        return []                           # shard without this worksheet (yet)
+    return projected_values(ws, cols.rstrip("]").split("|")) if cols else ws.get_all_values()
+
+
+class SharedSheetCache:
+    def __init__(self, path: str, refresh_seconds: float = 60.0, max_age_seconds: float = 300.0,
+                 lease_seconds: float = 30.0, fetch=None):
+        self.path = path
+        self.refresh_seconds = refresh_seconds
+        self.max_age_seconds = max_age_seconds
+        self.lease_seconds = lease_seconds
+        self.fetch = fetch or fetch_view
+        self._memo = {}                     # worksheet -> (version, values) already decoded here
+        self._watched = set()               # worksheets this process registered in ``watched``
+        self._lock = threading.Lock()
+        self._stats_written = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.last_staleness = {}            # worksheet -> seconds since fetch when last served
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as con:
+            con.execute("PRAGMA journal_mode=WAL")      # persistent: set once for the file
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS entries (worksheet TEXT PRIMARY KEY, version INTEGER NOT NULL, "
+                "digest TEXT NOT NULL, fetched_at REAL NOT NULL, stale INTEGER NOT NULL DEFAULT 0, payload BLOB NOT NULL)"
+            )
+            con.execute("CREATE TABLE IF NOT EXISTS watched (worksheet TEXT PRIMARY KEY)")
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS lease (id INTEGER PRIMARY KEY CHECK (id = 1), owner TEXT, expires REAL)"
+            )
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS replica_stats (replica TEXT PRIMARY KEY, hits INTEGER, misses INTEGER, "
+                "staleness TEXT, updated_at REAL)"
+            )
+
+    def _connect(self):
+        return connect(self.path)
+
+    def _watch(self, worksheet: str) -> None:
+        """Register a worksheet for the background refresher (one write per worksheet and process)."""
+        with self._lock:
+            if worksheet in self._watched:
+                return
+        with self._connect() as con:
+            con.execute("INSERT OR IGNORE INTO watched(worksheet) VALUES (?)", (worksheet,))
+        with self._lock:
+            self._watched.add(worksheet)
+
+    # ---- read path ----
+    def get_values(self, worksheet: str) -> list:
+        now = time.time()
+        self._watch(worksheet)
+        with self._connect() as con:
+            row = con.execute(
+                "SELECT version, fetched_at, stale FROM entries WHERE worksheet = ?", (worksheet,)
+            ).fetchone()
+        if row is not None and not row[2] and now - row[1] <= self.max_age_seconds:
+            version, fetched_at, _ = row
+            values = self._decoded(worksheet, version)
+            if values is not None:
+                self._record(worksheet, hit=True, staleness=now - fetched_at)
+                return values
+        values = self.refresh(worksheet)
+        self._record(worksheet, hit=False, staleness=0.0)
+        return values
+
+    def _decoded(self, worksheet: str, version: int):
+        with self._lock:
+            memo = self._memo.get(worksheet)
+            if memo and memo[0] == version:
+                return memo[1]
+        with self._connect() as con:
+            row = con.execute(
+                "SELECT payload FROM entries WHERE worksheet = ? AND version = ?", (worksheet, version)
+            ).fetchone()
+        if row is None:
+            return None
+        values = json.loads(zlib.decompress(row[0]))
+        with self._lock:
+            self._memo[worksheet] = (version, values)
+        return values
+
+    # ---- write path ----
+    def refresh(self, worksheet: str) -> list:
+        """Fetch from Sheets and store; the version is bumped only if the content changed.
+
+        Unchanged content returns the list already served for this version (same object), so
+        sessions keep sharing one report snapshot across background refreshes.
+        """
+        values = self.fetch(worksheet)
+        raw = json.dumps(values, separators=(",", ":")).encode("utf-8")
+        digest = hashlib.sha1(raw).hexdigest()
+        now = time.time()
+        with self._connect() as con:
+            row = con.execute("SELECT version, digest FROM entries WHERE worksheet = ?", (worksheet,)).fetchone()
+            if row is not None and row[1] == digest:
+                version = row[0]
+                con.execute("UPDATE entries SET fetched_at = ?, stale = 0 WHERE worksheet = ?", (now, worksheet))
+            else:
+                version = (row[0] + 1) if row else 1
+                con.execute(
+                    "INSERT OR REPLACE INTO entries(worksheet, version, digest, fetched_at, stale, payload) "
+                    "VALUES (?, ?, ?, ?, 0, ?)",
+                    (worksheet, version, digest, now, zlib.compress(raw)),
+                )
+        with self._lock:
+            memo = self._memo.get(worksheet)
+            if memo is not None and memo[0] == version:
+                return memo[1]              # unchanged: keep the list report snapshots are keyed on
+            self._memo[worksheet] = (version, values)
+        return values
+
+    def invalidate(self, *worksheets: str) -> None:
+        """Mark entries (and their column views) stale, e.g. after an append, so the next read refetches."""
+        with self._connect() as con:
+            con.executemany(
+                "UPDATE entries SET stale = 1 WHERE worksheet = ? OR substr(worksheet, 1, length(?) + 1) = ? || '['",
+                [(w, w, w) for w in worksheets],
+            )
+
+    # ---- refresher election ----
+    def try_acquire_lease(self) -> bool:
+        now = time.time()
+        with self._connect() as con:
+            con.execute("INSERT OR IGNORE INTO lease(id, owner, expires) VALUES (1, NULL, 0)")
+            cur = con.execute(
+                "UPDATE lease SET owner = ?, expires = ? WHERE id = 1 AND (owner = ? OR expires < ?)",
+                (REPLICA_ID, now + self.lease_seconds, REPLICA_ID, now),
+            )
+            return cur.rowcount == 1
+
+    def refresh_watched(self) -> None:
+        with self._connect() as con:
+            watched = [r[0] for r in con.execute("SELECT worksheet FROM watched")]
+        for ws in watched:
+            try:
+                self.refresh(ws)
+            except Exception:
+                pass
+
+    def run_refresher(self) -> None:
+        """Background loop: whoever holds the lease keeps the watched worksheets current."""
+        next_refresh = 0.0
+        while True:
+            try:
+                if self.try_acquire_lease() and time.time() >= next_refresh:
+                    self.refresh_watched()
+                    next_refresh = time.time() + self.refresh_seconds
+            except Exception:
+                pass
+            time.sleep(min(self.lease_seconds / 3, self.refresh_seconds))
+
+    # ---- stats ----
+    def _record(self, worksheet: str, hit: bool, staleness: float) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            self.last_staleness[worksheet] = round(staleness, 1)
+            now = time.time()
+            if now - self._stats_written < STATS_INTERVAL_SECONDS:
+                return
+            self._stats_written = now
+            stats = (self.hits, self.misses, json.dumps(self.last_staleness))
+        try:
+            with self._connect() as con:
+                con.execute(
+                    "INSERT OR REPLACE INTO replica_stats(replica, hits, misses, staleness, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (REPLICA_ID, *stats, time.time()),
+                )
+        except sqlite3.Error:
+            pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "replica": REPLICA_ID,
+                "hits": self.hits,
+                "misses": self.misses,
+                "staleness_s": dict(self.last_staleness),
+            }
+
+    def all_replica_stats(self) -> list:
+        with self._connect() as con:
+            rows = con.execute(
+                "SELECT replica, hits, misses, staleness, updated_at FROM replica_stats ORDER BY replica"
+            ).fetchall()
+        return [
+            {"replica": r, "hits": h, "misses": m, "staleness_s": json.loads(s), "updated_at": u}
+            for r, h, m, s, u in rows
+        ]
+
+
+@st.cache_resource
+def get_shared_cache() -> SharedSheetCache:
+    cfg = secrets_section("shared_cache")
+    cache = SharedSheetCache(
+        path=cfg.get("path", "/tmp/equipment_inspection/sheets_cache.db"),
+        refresh_seconds=float(cfg.get("refresh_seconds", 60)),
+        max_age_seconds=float(cfg.get("max_age_seconds", 300)),
+        lease_seconds=float(cfg.get("lease_seconds", 30)),
+    )
+    threading.Thread(target=cache.run_refresher, daemon=True).start()
+    return cache
+
+
+_merged = {}                                # view key -> (shard values, merged values)
+_merged_lock = threading.Lock()
+
+
+def worksheet_values(worksheet: str, columns=None) -> list:
+    """Values of a worksheet (header first), or only ``columns`` of it, served from the host-wide cache.
+
+    With shards, the shards' values are fetched in parallel and merged. The merge is reused while
+    no shard changed, so sessions keep getting the same list for the same data.
+    """
+    cache = get_shared_cache()
+    shards = read_shards()
+    if shards == [WORKBOOK]:
+        return cache.get_values(view_key(worksheet, columns))
+    parts = fan_out(lambda shard: cache.get_values(view_key(worksheet, columns, shard)), shards)
+    key = view_key(worksheet, columns)
+    with _merged_lock:
+        prev = _merged.get(key)
+    if prev is not None and len(prev[0]) == len(parts) and all(a is b for a, b in zip(prev[0], parts)):
+        return prev[1]
+    merged = merge_values(parts)
+    with _merged_lock:
+        _merged[key] = (parts, merged)
+    return merged
+
+
+def invalidate(worksheet: str, shard: str = None) -> None:
+    """Drop a worksheet (and the sheets derived from it) of a shard from the host-wide cache."""
+    try:
+        names = (worksheet, *DERIVED_WORKSHEETS.get(worksheet, ()))
+        get_shared_cache().invalidate(*(view_key(w, shard=shard) for w in names))
+    except Exception:
+        pass
+
+
+def cache_caption() -> str:
+    s = get_shared_cache().stats()
+    age = max(s["staleness_s"].values(), default=0.0)
+    return f"Cache ({s['replica']}): {s['hits']} hits / {s['misses']} misses · data age ≤ {age:.0f}s"
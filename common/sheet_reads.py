@@ -0,0 +1,203 @@
+"""
+Column-projected, range-limited worksheet reads.
+
+``read_columns(ws, columns, ...)`` resolves the wanted columns against the
+worksheet header (cached per process) into the fewest A1 ranges (adjacent
+columns are merged), fetches them in one ``batch_get`` in column-major form
+and returns a typed DataFrame, instead of ``get_all_values()`` pulling every
+column (free-text comments, checklist columns) of every row.
+
+Row limits:
+- ``rows=(first, last)``: data rows, 1-based, inclusive (``last`` may be None);
+- ``since=(column, timestamp)``: rows from the first one dated >= timestamp.
+  The date column is fetched alone first; the rest starts at that row.
+
+Each read records payload bytes (approximate JSON size of the returned values), fetch and
+parse time under a label; ``read_caption(label)`` formats the last one (the Dashboard
+and the Tools safety valve show it).
+"""
+import threading
+import time
+from dataclasses import dataclass
+
+import pandas as pd
+
+HEADER_TTL_SECONDS = 600.0
+
+_headers = {}                 # (spreadsheet id, worksheet title) -> (header, fetched_at)
+_headers_lock = threading.Lock()
+
+
+@dataclass
+class ReadStats:
+    ranges: list
+    cells: int
+    bytes: int
+    fetch_ms: float
+    parse_ms: float
+
+
+LAST_READS = {}               # label -> ReadStats
+
+
+# =========================
+# Header & A1 resolution
+# =========================
+def header(ws, refresh: bool = False) -> list:
+    """Row 1 of a worksheet, cached per process for HEADER_TTL_SECONDS."""
+    key = _header_key(ws)
+    with _headers_lock:
+        cached = _headers.get(key)
+    if cached and not refresh and time.monotonic() - cached[1] < HEADER_TTL_SECONDS:
+        return cached[0]
+    values = [str(c).strip() for c in ws.row_values(1)]
+    with _headers_lock:
+        _headers[key] = (values, time.monotonic())
+    return values
+
+
+def _header_key(ws) -> tuple:
+    # Shards have worksheets of the same title with different headers
+    return getattr(ws, "spreadsheet_id", None), ws.title
+
+
+def forget_header(ws) -> None:
+    with _headers_lock:
+        _headers.pop(_header_key(ws), None)
+
+
+def column_letter(n: int) -> str:
+    """1 -> A, 27 -> AA."""
+    out = ""
+    while n:
+        n, rem = divmod(n - 1, 26)
+        out = chr(65 + rem) + out
+    return out
+
+
+def column_positions(hdr: list, columns: list) -> dict:
+    """Column name -> 0-based position; duplicated headers resolve to the last occurrence."""
+    pos = {name: i for i, name in enumerate(hdr)}
+    return {c: pos[c] for c in columns if c in pos}
+
+
+def a1_ranges(positions, first_row: int = 2, last_row: int = None) -> list:
+    """Fewest A1 ranges covering the given 0-based column positions (adjacent ones merged)."""
+    runs = []
+    for p in sorted(set(positions)):
+        if runs and p == runs[-1][1] + 1:
+            runs[-1][1] = p
+        else:
+            runs.append([p, p])
+    end = "" if last_row is None else str(last_row)
+    return [f"{column_letter(a + 1)}{first_row}:{column_letter(b + 1)}{end}" for a, b in runs]
+
+
+# =========================
+# Reads
+# =========================
+def _fetch_columns(ws, positions: dict, first_row: int, last_row):
+    """{column name: list of cell strings} for the given rows, plus the ranges used and payload size."""
+    order = sorted(set(positions.values()))
+    ranges = a1_ranges(order, first_row, last_row)
+    fetched = ws.batch_get(ranges, major_dimension="COLUMNS") if ranges else []
+    # JSON size of the values: the strings plus quotes and separator per cell
+    payload = sum(sum(map(len, col)) + 3 * len(col) for cols in fetched for col in cols)
+    by_pos = {}
+    for rng, cols in zip(ranges, fetched):
+        start = _range_start(rng)
+        for offset, col in enumerate(cols):
+            by_pos[start + offset] = list(col)
+    return {name: by_pos.get(p, []) for name, p in positions.items()}, ranges, payload
+
+
+def _range_start(a1: str) -> int:
+    letters = "".join(ch for ch in a1.split(":")[0] if ch.isalpha())
+    n = 0
+    for ch in letters:
+        n = n * 26 + ord(ch) - 64
+    return n - 1
+
+
+def _typed(df: pd.DataFrame, types: dict) -> pd.DataFrame:
+    for col in df.columns:
+        kind = types.get(col, "str")
+        if kind == "datetime":
+            df[col] = pd.to_datetime(df[col], errors="coerce")
+        elif kind == "date":
+            df[col] = pd.to_datetime(df[col], errors="coerce").dt.normalize()
+        elif kind in ("float", "number"):
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+        else:
+            df[col] = df[col].str.strip()
+    return df
+
+
+def read_columns(ws, columns: list, rows=None, since=None, types: dict = None, label: str = None) -> pd.DataFrame:
+    """
+    DataFrame of ``columns`` (missing ones come back empty) for the selected rows.
+    ``types``: column -> "datetime" | "date" | "float" | "str" (default; stripped).
+    """
+    types = types or {}
+    t0 = time.perf_counter()
+    hdr = header(ws)
+    positions = column_positions(hdr, columns)
+    if len(positions) < len(columns):
+        hdr = header(ws, refresh=True)             # maybe a column was added since
+        positions = column_positions(hdr, columns)
+
+    first_row, last_row = 2, None
+    if rows is not None:
+        first_row = max(int(rows[0]), 1) + 1
+        last_row = None if rows[1] is None else int(rows[1]) + 1
+
+    data, ranges, payload = {}, [], 0
+    if since is not None and since[0] in positions:
+        date_col, bound = since
+        got, r, b = _fetch_columns(ws, {date_col: positions[date_col]}, first_row, last_row)
+        stamps = pd.to_datetime(pd.Series(got[date_col], dtype="object"), errors="coerce")
+        hits = (stamps >= pd.Timestamp(bound)).to_numpy().nonzero()[0]
+        skip = int(hits[0]) if len(hits) else len(stamps)
+        data[date_col] = got[date_col][skip:]
+        ranges += r
+        payload += b
+        first_row += skip
+        positions = {c: p for c, p in positions.items() if c != date_col}
+        if not data[date_col]:
+            positions = {}
+    if positions:
+        got, r, b = _fetch_columns(ws, positions, first_row, last_row)
+        data.update(got)
+        ranges += r
+        payload += b
+    t1 = time.perf_counter()
+
+    n = max((len(v) for v in data.values()), default=0)
+    df = pd.DataFrame(
+        {c: pd.Series(data.get(c, []) + [""] * (n - len(data.get(c, []))), dtype="object") for c in columns}
+    )
+    df = _typed(df, types)
+    if since is not None and since[0] in df.columns:
+        df = df.loc[pd.to_datetime(df[since[0]], errors="coerce") >= pd.Timestamp(since[1])].reset_index(drop=True)
+    t2 = time.perf_counter()
+
+    stats = ReadStats(ranges, n * len(columns), payload, (t1 - t0) * 1000, (t2 - t1) * 1000)
+    df.attrs["read_stats"] = stats
+    if label:
+        LAST_READS[label] = stats
+    return df
+
+
+def projected_values(ws, columns: list) -> list:
+    """``get_all_values()``-shaped result (header first) for the ``columns`` the sheet has."""
+    hdr = header(ws)
+    df = read_columns(ws, [c for c in columns if c in hdr], label=ws.title)
+    return [list(df.columns)] + df.fillna("").astype(str).values.tolist()
+
+
+def read_caption(label: str) -> str:
+    s = LAST_READS.get(label)
+    if s is None:
+        return ""
+    return (f"Read {label}: {len(s.ranges)} range(s), {s.cells:,} cells, {s.bytes / 1024:,.1f} KiB, "
+            f"fetch {s.fetch_ms:,.0f} ms, parse {s.parse_ms:,.1f} ms")
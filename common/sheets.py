@@ -0,0 +1,65 @@
+import gspread
+import streamlit as st
+from oauth2client.service_account import ServiceAccountCredentials
+
+from common.sheet_reads import forget_header
+
+# =========================
+# Google Sheets via Secrets
+# =========================
+SCOPE = [
+    "https://spreadsheets.google.com/feeds",
+    "https://www.googleapis.com/auth/drive",
+]
+WORKBOOK = "Web_App"
+
+
+def get_gspread_client():
+    creds = ServiceAccountCredentials.from_json_keyfile_dict(
+        st.secrets["gcp_service_account"], scopes=SCOPE
+    )
+    return gspread.authorize(creds)
+
+
+@st.cache_resource
+def shared_client():
+    """One authorized client for the whole process."""
+    return get_gspread_client()
+
+
+@st.cache_resource
+def _workbook():
+    return shared_client().open(WORKBOOK)
+
+
+def open_workbook(client=None):
+    """The workbook; without ``client``, one authorized handle shared by the whole process."""
+    return client.open(WORKBOOK) if client is not None else _workbook()
+
+
+def secrets_section(name: str) -> dict:
+    """Return an optional st.secrets section as a plain dict ({} if missing)."""
+    try:
+        return dict(st.secrets.get(name, {}))
+    except Exception:
+        return {}
+
+
+def append_aligned(ws, df) -> list:
+    """
+    Append ``df`` rows under the worksheet's existing header (column order is
+    the sheet's, not the frame's). Columns the sheet doesn't have yet are added
+    at the end of the header. Returns the header used.
+    """
+    header = [str(c).strip() for c in ws.row_values(1)]
+    columns = header + [c for c in df.columns if c not in header]
+    rows = df.reindex(columns=columns).fillna("").values.tolist()
+    if not header:
+        ws.append_rows([columns] + rows)
+    else:
+        if columns != header:
+            ws.update([columns], "A1")
+        ws.append_rows(rows)
+    if columns != header:
+        forget_header(ws)         # projected reads re-resolve their columns
+    return columns
@@ -0,0 +1,164 @@
+"""
+Shared, read-only report frames.
+
+``live_frame`` hands every session the same prepared DataFrame for a given
+data version instead of building one per session:
+
+- base: keyed by the view and the values list the shared worksheet cache
+  serves for one data version (the same object for every session of the
+  process);
+- feed deltas: the frame at (base, feed seq) is built once and reused by
+  every session that catches up to that seq.
+
+Frames are read-only once built (string columns Arrow-backed): pages filter
+and slice them, and with copy-on-write a derived frame never writes through
+to the shared one; assigning a column on the shared frame itself is not
+allowed. Objects computed from a shared frame (time index, utilization
+sessions) are shared the same way with ``derived``. The store keeps the most
+recent ``max_entries`` entries; sessions hold their own reference, so
+eviction only ends sharing, never data.
+"""
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)      # always on from pandas 3
+
+try:
+    import pyarrow  # noqa: F401
+    ARROW_STRING = pd.StringDtype("pyarrow", na_value=np.nan)
+except (ImportError, TypeError):
+    ARROW_STRING = None
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    key: str
+    base: list = field(repr=False)     # values the frame was built from (identity = data version)
+    start_seq: int
+    seq: int
+    header: tuple
+    df: pd.DataFrame = field(repr=False)
+
+
+def freeze(df: pd.DataFrame) -> pd.DataFrame:
+    """Arrow-backed storage for object columns that hold only strings."""
+    if ARROW_STRING is None:
+        return df
+    for i, dtype in enumerate(df.dtypes):
+        if dtype == object and pd.api.types.infer_dtype(df.iloc[:, i], skipna=True) == "string":
+            df.isetitem(i, df.iloc[:, i].astype(ARROW_STRING))
+    return df
+
+
+def frame_from_values(values: list, prepare) -> tuple:
+    header = tuple(str(c).strip() for c in values[0]) if values else ()
+    return header, freeze(prepare(pd.DataFrame(values[1:], columns=list(header))))
+
+
+def _occurrences(names) -> list:
+    """Names made unique by occurrence ("Comments", "Comments" -> (Comments, 0), (Comments, 1))."""
+    seen = {}
+    out = []
+    for name in names:
+        name = str(name).strip()
+        out.append((name, seen.get(name, 0)))
+        seen[name] = seen.get(name, 0) + 1
+    return out
+
+
+def delta_frame(header: tuple, changes: list) -> pd.DataFrame:
+    """Rows published to the feed, laid out on ``header`` by column name.
+
+    A change's columns are the header of the sheet it was appended to, which
+    with shards need not be in the order of ``header`` (a name-union of all
+    shards). Repeated names are matched by occurrence; columns missing from a
+    change are blank.
+    """
+    target = _occurrences(header)
+    parts = []
+    for c in changes:
+        width = len(c["columns"])
+        rows = [(list(row) + [""] * width)[:width] for row in c["rows"]]
+        if not rows:
+            continue
+        labels = _occurrences(c["columns"])
+        if labels == target:
+            parts.append(pd.DataFrame(rows, columns=list(header)))
+            continue
+        part = pd.DataFrame(rows, columns=pd.MultiIndex.from_tuples(labels))
+        part = part.reindex(columns=pd.MultiIndex.from_tuples(target), fill_value="")
+        parts.append(part.set_axis(list(header), axis=1))
+    if not parts:
+        return pd.DataFrame(columns=list(header))
+    return parts[0] if len(parts) == 1 else pd.concat(parts, ignore_index=True)
+
+
+class SnapshotStore:
+    def __init__(self, max_entries: int = 32):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._snapshots = OrderedDict()   # (key, id(base)[, start_seq, seq]) -> Snapshot; derived entries
+        self.hits = 0
+        self.builds = 0
+
+    def _get_or_build(self, ident: tuple, build) -> Snapshot:
+        with self._lock:
+            snap = self._snapshots.get(ident)
+            if snap is not None:
+                self._snapshots.move_to_end(ident)
+                self.hits += 1
+                return snap
+        snap = build()                    # outside the lock; a concurrent duplicate build is only wasted work
+        with self._lock:
+            if ident in self._snapshots:
+                self.hits += 1
+                return self._snapshots[ident]
+            self._snapshots[ident] = snap
+            self.builds += 1
+            while len(self._snapshots) > self.max_entries:
+                self._snapshots.popitem(last=False)
+        return snap
+
+    def base(self, key: str, values: list, seq: int, prepare) -> Snapshot:
+        def build():
+            header, df = frame_from_values(values, prepare)
+            return Snapshot(key, values, seq, seq, header, df)
+        # The snapshot holds ``values``, so its id can't be reused while the entry exists. Sessions
+        # that fetch the same values later adopt the snapshot's seq and catch up from there.
+        return self._get_or_build((key, id(values)), build)
+
+    def advance(self, snap: Snapshot, seq: int, changes: list, prepare) -> Snapshot:
+        """``snap`` with the feed rows up to ``seq`` appended."""
+        def build():
+            header = snap.header or tuple(changes[0]["columns"])
+            delta = prepare(delta_frame(header, changes))
+            df = freeze(pd.concat([snap.df, delta], ignore_index=True)) if len(snap.df) else freeze(delta)
+            return Snapshot(snap.key, snap.base, snap.start_seq, seq, header, df)
+        return self._get_or_build((snap.key, id(snap.base), snap.start_seq, seq), build)
+
+    def derived(self, name: tuple, df: pd.DataFrame, build):
+        """Object computed from a shared frame (an index, a rollup): built once per frame for the process."""
+        # The entry holds ``df``, so its id can't be reused while the entry exists.
+        return self._get_or_build(("derived", name, id(df)), lambda: (df, build()))[1]
+
+    def stats(self) -> dict:
+        with self._lock:
+            frames = [s for s in self._snapshots.values() if isinstance(s, Snapshot)]
+            return {
+                "snapshots": len(frames),
+                "derived": len(self._snapshots) - len(frames),
+                "hits": self.hits,
+                "builds": self.builds,
+                "bytes": sum(int(s.df.memory_usage(deep=True).sum()) for s in frames),
+            }
+
+
+@st.cache_resource
+def get_snapshot_store() -> SnapshotStore:
+    return SnapshotStore()
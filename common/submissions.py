@@ -0,0 +1,106 @@
+"""
+Idempotent form submissions.
+
+A double tap on Submit, or a browser replaying the click after a reconnect,
+reruns the submit branch again with the same form, which appended the same
+inspection twice (and repeated its alert). Each form render now carries a
+submission key in ``st.session_state``. The key stays the same while the
+form's inputs are unchanged. A new key is issued when any input changes, or
+when the form is reset with "Submit Another Form".
+
+The write path records the key right after the row is appended. A submit whose
+key is already recorded is a replay: it is dropped before any Sheets read,
+append or email. Keys are kept per server process (a session always runs in
+the same process): at most ``max_keys`` of them, each for ``ttl_seconds``.
+
+    [submissions]
+    ttl_seconds = 3600
+    max_keys = 10000
+"""
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import streamlit as st
+
+from common.sheets import secrets_section
+
+SESSION_KEY = "_submission_keys"
+
+
+class SubmissionLedger:
+    """Recently committed submission keys, bounded and expiring (oldest first)."""
+
+    def __init__(self, ttl_seconds: float = 3600, max_keys: int = 10000):
+        self.ttl = ttl_seconds
+        self.max_keys = max_keys
+        self.replays = 0
+        self._keys = OrderedDict()      # key -> committed at (monotonic)
+        self._lock = threading.Lock()
+
+    def _expire(self, now: float) -> None:
+        while self._keys:
+            key, at = next(iter(self._keys.items()))
+            if now - at < self.ttl:
+                break
+            self._keys.popitem(last=False)
+
+    def committed(self, key: str) -> bool:
+        with self._lock:
+            self._expire(time.monotonic())
+            if key in self._keys:
+                self.replays += 1
+                return True
+            return False
+
+    def commit(self, key: str) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            self._keys[key] = now
+            self._keys.move_to_end(key)
+            while len(self._keys) > self.max_keys:
+                self._keys.popitem(last=False)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._keys)
+
+
+@st.cache_resource
+def get_submission_ledger() -> SubmissionLedger:
+    cfg = secrets_section("submissions")
+    return SubmissionLedger(
+        ttl_seconds=float(cfg.get("ttl_seconds", 3600)),
+        max_keys=int(cfg.get("max_keys", 10000)),
+    )
+
+
+# =========================
+# Session side
+# =========================
+def submission_key(form: str, *inputs) -> str:
+    """Key of the form as rendered: unchanged while ``inputs`` are, a new one when they change."""
+    digest = hashlib.sha1(repr(inputs).encode("utf-8")).hexdigest()
+    keys = st.session_state.setdefault(SESSION_KEY, {})
+    current = keys.get(form)
+    if current is None or current[1] != digest:
+        current = keys[form] = (uuid.uuid4().hex, digest)
+    return current[0]
+
+
+def new_submission(form: str) -> None:
+    """Start a new submission of ``form`` (e.g. "Submit Another Form"), even with the same inputs."""
+    st.session_state.get(SESSION_KEY, {}).pop(form, None)
+
+
+def already_submitted(key: str) -> bool:
+    """True for a replay: ``key`` was committed already. Check before any Sheets/SMTP work."""
+    return get_submission_ledger().committed(key)
+
+
+def mark_submitted(key: str) -> None:
+    """Record ``key`` as committed; call right after the row is appended."""
+    get_submission_ledger().commit(key)
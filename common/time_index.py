@@ -0,0 +1,171 @@
+"""
+Date-sorted row index for report frames.
+
+``TimeIndex`` keeps, per key (e.g. forklift) and for all rows together, the row
+positions sorted by timestamp next to the sorted timestamps themselves, so a
+date window is two binary searches (``np.searchsorted``) and one ``iloc``
+instead of a boolean scan plus a sort on every rerun. Rows appended by the
+change feed are merged into the sorted arrays; the index is rebuilt only when
+the frame is replaced. Frames from ``live_frame`` are shared by all sessions,
+and so is their index: it is built once per frame for the process.
+"""
+import copy
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from common.snapshots import get_snapshot_store
+
+ALL = None  # key for "all rows"
+
+# Window length (days) -> bucket used by time-series charts.
+BUCKETS = [(45, "D", "Day"), (270, "W", "Week")]
+DEFAULT_BUCKET = ("M", "Month")
+
+
+def _timestamps(values) -> np.ndarray:
+    """int64 nanoseconds (NaT -> min int64)."""
+    return pd.to_datetime(pd.Series(values), errors="coerce").to_numpy("datetime64[ns]").view("int64")
+
+
+class TimeIndex:
+    def __init__(self, df: pd.DataFrame, time_col: str, key_col: str = None):
+        self.time_col = time_col
+        self.key_col = key_col
+        self._build(df)
+
+    def _build(self, df: pd.DataFrame) -> None:
+        self.source = df
+        self.n = len(df)
+        ts = _timestamps(df[self.time_col]) if self.time_col in df.columns else np.full(self.n, np.iinfo("int64").min)
+        self._ts = ts
+        self._keys = df[self.key_col].astype(str).to_numpy() if self.key_col in df.columns else None
+        valid = np.flatnonzero(ts != np.iinfo("int64").min)
+        order = valid[np.argsort(ts[valid], kind="stable")]
+        self._groups = {ALL: (ts[order], order)}
+        if self._keys is not None:
+            keys = self._keys[order]
+            for key in np.unique(keys):
+                pos = order[keys == key]
+                self._groups[key] = (ts[pos], pos)
+
+    def sync(self, df: pd.DataFrame) -> "TimeIndex":
+        """Follow ``df``: merge appended rows, or rebuild if the frame was replaced."""
+        if df is self.source:
+            return self
+        prefix_same = (
+            len(df) >= self.n
+            and self.time_col in df.columns
+            and np.array_equal(_timestamps(df[self.time_col].iloc[:self.n]), self._ts)
+        )
+        if not prefix_same:
+            self._build(df)
+            return self
+        new = df.iloc[self.n:]
+        ts_new = _timestamps(new[self.time_col])
+        keys_new = new[self.key_col].astype(str).to_numpy() if self._keys is not None else None
+        for j in np.flatnonzero(ts_new != np.iinfo("int64").min):
+            pos, t = self.n + j, ts_new[j]
+            for key in (ALL,) if keys_new is None else (ALL, keys_new[j]):
+                sorted_ts, rows = self._groups.get(key, (np.empty(0, "int64"), np.empty(0, "int64")))
+                at = np.searchsorted(sorted_ts, t, side="right")
+                self._groups[key] = (np.insert(sorted_ts, at, t), np.insert(rows, at, pos))
+        self._ts = np.concatenate([self._ts, ts_new])
+        if self._keys is not None:
+            self._keys = np.concatenate([self._keys, keys_new])
+        self.source = df
+        self.n = len(df)
+        return self
+
+    def copy(self) -> "TimeIndex":
+        """Independent copy to ``sync`` (arrays are replaced, never written, so they are shared)."""
+        out = copy.copy(self)
+        out._groups = dict(self._groups)
+        return out
+
+    def keys(self) -> list:
+        return sorted(k for k in self._groups if k is not ALL)
+
+    def bounds(self, key=ALL):
+        """(first, last) timestamp of a key, or None if it has no dated rows."""
+        sorted_ts, _ = self._groups.get(key, (np.empty(0, "int64"), None))
+        if not len(sorted_ts):
+            return None
+        return pd.Timestamp(sorted_ts[0]), pd.Timestamp(sorted_ts[-1])
+
+    def positions(self, key=ALL, start=None, end=None) -> np.ndarray:
+        """Row positions with start <= timestamp < end, in time order (O(log n) + output)."""
+        sorted_ts, rows = self._groups.get(key, (np.empty(0, "int64"), np.empty(0, "int64")))
+        lo = 0 if start is None else np.searchsorted(sorted_ts, pd.Timestamp(start).value, side="left")
+        hi = len(sorted_ts) if end is None else np.searchsorted(sorted_ts, pd.Timestamp(end).value, side="left")
+        return rows[lo:hi]
+
+    def covers(self, start, end, key=ALL) -> bool:
+        """True if [start, end) holds every dated row of the key (or it has none)."""
+        b = self.bounds(key)
+        return b is None or (pd.Timestamp(start) <= b[0] and b[1] < pd.Timestamp(end))
+
+    def window(self, key=ALL, start=None, end=None) -> pd.DataFrame:
+        """Rows in the window; a slice (a view, no copy) when they are contiguous in the frame.
+
+        Rows with a blank or unparseable timestamp are in no window (see ``covers``).
+        """
+        pos = self.positions(key, start, end)
+        if len(pos) and pos[-1] - pos[0] + 1 == len(pos) and (len(pos) == 1 or (np.diff(pos) == 1).all()):
+            return self.source.iloc[pos[0]:pos[-1] + 1]
+        return self.source.iloc[pos]
+
+
+def time_index(name: str, df: pd.DataFrame, time_col: str, key_col: str = None) -> TimeIndex:
+    """TimeIndex for a report frame, shared per frame; built from the session's previous index when it can."""
+    indexes = st.session_state.setdefault("_time_indexes", {})
+    prev = indexes.get(name)
+    if prev is not None and (prev.time_col, prev.key_col) != (time_col, key_col):
+        prev = None
+    if prev is not None and prev.source is df:
+        return prev
+
+    def build():
+        return prev.copy().sync(df) if prev is not None else TimeIndex(df, time_col, key_col)
+
+    idx = indexes[name] = get_snapshot_store().derived(("time_index", time_col, key_col), df, build)
+    return idx
+
+
+def bucket_for(start, end):
+    """(pandas frequency, label) for charts: day, week or month depending on the window length."""
+    days = (pd.Timestamp(end) - pd.Timestamp(start)).days
+    for max_days, freq, label in BUCKETS:
+        if days <= max_days:
+            return freq, label
+    return DEFAULT_BUCKET
+
+
+def date_window(label: str, bounds, key: str, container=st):
+    """
+    Date-range picker limited to ``bounds`` (defaults to the full range).
+    Returns (start, end) timestamps with ``end`` exclusive (day after the last selected day).
+
+    A range left at the full bounds follows them when they change (e.g. feed
+    rows of a new day); a narrowed one is kept while it fits in them.
+    """
+    if bounds is None:
+        today = dt.date.today()
+        bounds = (pd.Timestamp(today), pd.Timestamp(today))
+    lo, hi = bounds[0].date(), bounds[1].date()
+    bounds_key = f"{key}_bounds"
+    seen = st.session_state.get(bounds_key)
+    if key in st.session_state and seen != (lo, hi):
+        current = st.session_state[key]
+        current = tuple(current) if isinstance(current, (tuple, list)) else (current,)
+        if current == seen or not all(d is not None and lo <= d <= hi for d in current):
+            del st.session_state[key]       # recreated below on the new full range
+    st.session_state[bounds_key] = (lo, hi)
+    picked = container.date_input(label, value=(lo, hi), min_value=lo, max_value=hi, key=key)
+    if not isinstance(picked, (tuple, list)):
+        picked = (picked,)
+    start = picked[0] if len(picked) > 0 else lo
+    end = picked[1] if len(picked) > 1 else start   # mid-selection: a single day
+    return pd.Timestamp(start), pd.Timestamp(end) + pd.Timedelta(days=1)
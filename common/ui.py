@@ -0,0 +1,25 @@
+import os
+
+import streamlit as st
+from PIL import Image
+
+
+@st.cache_resource
+def _load_image(path: str, mtime: float) -> Image.Image:
+    with Image.open(path) as img:
+        img.load()
+        return img.copy()
+
+
+def preload_image(path: str) -> bool:
+    """Decode an image into the process cache ahead of the first page view (server warm-up)."""
+    if not os.path.exists(path):
+        return False
+    _load_image(path, os.path.getmtime(path))
+    return True
+
+
+def banner(path: str) -> None:
+    """Page banner; the file is decoded once per process, not on every rerun."""
+    if os.path.exists(path):
+        st.image(_load_image(path, os.path.getmtime(path)))
@@ -0,0 +1,175 @@
+"""
+Tool utilization from the Sheet1 Check Out / Check In log.
+
+Each Check Out is paired with the next Check In of the same tool in one sorted
+``pd.merge_asof`` (by tool, direction forward). A Check In that comes after
+the tool's following Check Out belongs to that later checkout, so the earlier
+one is reported as "missing check-in" instead of getting an inflated duration.
+
+From the sessions:
+- current holders: tools whose last checkout is still open, with time out;
+- overdue: open longer than ``overdue_hours``;
+- utilization %: time checked out inside a window / window length, per tool
+  (tools from master data with no session in the window show as idle, 0 %).
+
+``utilization_engine`` shares the sessions of a frame across report sessions
+and, when the change feed appends events, re-pairs only the tools those
+events touch.
+
+    [utilization]
+    overdue_hours = 24
+"""
+import copy
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from common.sheets import secrets_section
+from common.snapshots import get_snapshot_store
+
+CHECK_OUT = "Check Out"
+CHECK_IN = "Check In"
+
+RETURNED = "returned"
+OUT = "out"
+MISSING_CHECK_IN = "missing check-in"
+
+OVERDUE_HOURS = float(secrets_section("utilization").get("overdue_hours", 24))
+
+SESSION_COLUMNS = ["tool", "user", "out_at", "in_at", "returned_by", "status", "hours"]
+
+
+def _empty_sessions() -> pd.DataFrame:
+    """No sessions, with the column types the reports compute with."""
+    return pd.DataFrame({
+        "tool": pd.Series([], dtype=object), "user": pd.Series([], dtype=object),
+        "out_at": pd.Series([], dtype="datetime64[ns]"), "in_at": pd.Series([], dtype="datetime64[ns]"),
+        "returned_by": pd.Series([], dtype=object), "status": pd.Series([], dtype=object),
+        "hours": pd.Series([], dtype=float),
+    })
+
+
+def _time_column(df: pd.DataFrame):
+    return "DateTime" if "DateTime" in df.columns else ("Date" if "Date" in df.columns else None)
+
+
+def events(df: pd.DataFrame) -> pd.DataFrame:
+    """Normalized transaction events (tool, user, txn, ts) with a valid timestamp."""
+    col = _time_column(df)
+    if col is None or "Equipment_Selected" not in df.columns or "Transaction" not in df.columns:
+        return pd.DataFrame({"tool": [], "user": [], "txn": [], "ts": pd.Series([], dtype="datetime64[ns]")})
+    ev = pd.DataFrame({
+        "tool": df["Equipment_Selected"].astype(str).str.strip(),
+        "user": df["User"].astype(str).str.strip() if "User" in df.columns else "",
+        "txn": df["Transaction"].astype(str).str.strip(),
+        "ts": pd.to_datetime(df[col], errors="coerce"),
+    })
+    return ev.loc[ev["ts"].notna() & (ev["tool"] != "") & ev["txn"].isin([CHECK_OUT, CHECK_IN])]
+
+
+def pair_sessions(ev: pd.DataFrame) -> pd.DataFrame:
+    """One row per Check Out with its matching Check In (if any)."""
+    outs = ev.loc[ev["txn"] == CHECK_OUT, ["tool", "user", "ts"]].sort_values("ts", kind="stable")
+    ins = ev.loc[ev["txn"] == CHECK_IN, ["tool", "user", "ts"]].sort_values("ts", kind="stable")
+    if outs.empty:
+        return _empty_sessions()
+    outs = outs.rename(columns={"ts": "out_at"})
+    outs["next_out"] = outs.groupby("tool")["out_at"].shift(-1)
+    ins = ins.rename(columns={"ts": "in_at", "user": "returned_by"})
+
+    s = pd.merge_asof(outs, ins, left_on="out_at", right_on="in_at", by="tool", direction="forward")
+    # The check-in belongs to a later checkout: this one was never checked in.
+    stolen = s["in_at"].notna() & s["next_out"].notna() & (s["in_at"] > s["next_out"])
+    s.loc[stolen, "in_at"] = pd.NaT
+    s.loc[stolen, "returned_by"] = None
+
+    returned = s["in_at"].notna()
+    s["status"] = np.select([returned, s["next_out"].isna()], [RETURNED, OUT], MISSING_CHECK_IN)
+    s["hours"] = (s["in_at"] - s["out_at"]).dt.total_seconds() / 3600
+    return s[SESSION_COLUMNS].reset_index(drop=True)
+
+
+class UtilizationEngine:
+    """Sessions for one Sheet1 frame, updated incrementally as rows are appended."""
+
+    def __init__(self):
+        self.source = None
+        self.n = 0
+        self._events = events(pd.DataFrame())
+        self.sessions = _empty_sessions()
+
+    def _is_extension(self, df: pd.DataFrame) -> bool:
+        if self.source is None or len(df) < self.n:
+            return False
+        if self.n == 0:
+            return True
+        old, new = self.source, df
+        return all(
+            old.iloc[i].equals(new.iloc[i]) for i in (0, self.n - 1)
+        ) and list(old.columns) == list(new.columns)
+
+    def sync(self, df: pd.DataFrame) -> "UtilizationEngine":
+        if df is self.source:
+            return self
+        if not self._is_extension(df):
+            self._events = events(df)
+            self.sessions = pair_sessions(self._events)
+        else:
+            new = events(df.iloc[self.n:])
+            if not new.empty:
+                self._events = pd.concat([self._events, new], ignore_index=True)
+                touched = self._events["tool"].isin(set(new["tool"]))
+                self.sessions = pd.concat(
+                    [self.sessions.loc[~self.sessions["tool"].isin(set(new["tool"]))],
+                     pair_sessions(self._events.loc[touched])],
+                    ignore_index=True,
+                )
+        self.source = df
+        self.n = len(df)
+        return self
+
+    def holders(self, now=None) -> pd.DataFrame:
+        """Tools currently checked out: tool, user, out_at, hours_out, overdue."""
+        now = pd.Timestamp.now() if now is None else pd.Timestamp(now)
+        out = self.sessions.loc[self.sessions["status"] == OUT, ["tool", "user", "out_at"]].copy()
+        out["hours_out"] = (now - out["out_at"]).dt.total_seconds() / 3600
+        out["overdue"] = out["hours_out"] > OVERDUE_HOURS
+        return out.sort_values("hours_out", ascending=False).reset_index(drop=True)
+
+    def utilization(self, start, end, tools=(), now=None) -> pd.DataFrame:
+        """Per tool: hours checked out within [start, end), utilization %, checkouts, median duration."""
+        now = pd.Timestamp.now() if now is None else pd.Timestamp(now)
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        s = self.sessions
+        # Open sessions run until now; sessions with no check-in have no known end.
+        until = s["in_at"].where(s["status"] != OUT, now)
+        overlap = (until.clip(upper=end) - s["out_at"].clip(lower=start)).dt.total_seconds().clip(lower=0) / 3600
+        in_window = (s["out_at"] < end) & (until.fillna(s["out_at"]) >= start)
+        per_tool = (
+            pd.DataFrame({"tool": s["tool"], "hours_out": overlap.fillna(0), "hours": s["hours"]})
+            .loc[in_window]
+            .groupby("tool")
+            .agg(hours_out=("hours_out", "sum"), checkouts=("hours_out", "size"), median_hours=("hours", "median"))
+        )
+        all_tools = sorted(set(tools) | set(per_tool.index))
+        per_tool = per_tool.reindex(all_tools).fillna({"hours_out": 0.0, "checkouts": 0})
+        window_hours = max((min(end, now) - start).total_seconds() / 3600, 1e-9)
+        per_tool["utilization_pct"] = (100 * per_tool["hours_out"] / window_hours).clip(upper=100).round(1)
+        per_tool["checkouts"] = per_tool["checkouts"].astype(int)
+        return per_tool.sort_values("utilization_pct", ascending=False).rename_axis("tool").reset_index()
+
+
+def utilization_engine(name: str, df: pd.DataFrame) -> UtilizationEngine:
+    """Engine for a Sheet1 frame, shared per frame; synced from the session's previous engine when it can."""
+    engines = st.session_state.setdefault("_utilization", {})
+    prev = engines.get(name)
+    if prev is not None and prev.source is df:
+        return prev
+
+    def build():
+        # sync() replaces its frames rather than modifying them, so a shallow copy is independent.
+        return copy.copy(prev).sync(df) if prev is not None else UtilizationEngine().sync(df)
+
+    engine = engines[name] = get_snapshot_store().derived(("utilization",), df, build)
+    return engine
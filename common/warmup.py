@@ -0,0 +1,156 @@
+"""
+Server warm-up: fill the process-wide caches before the first session.
+
+Run once per server process (``scripts/serve.py`` does it before Streamlit
+starts listening): imports the heavy libraries, authorizes the Sheets client,
+downloads every worksheet view the pages read into the shared cache (decoded
+in this process), resolves the headers used by projected reads and builds the
+derived structures (master-data index, checklists, operation-hours index,
+banner images). A step that fails is recorded and the rest still run; pages
+then load that piece on demand as before.
+
+Progress and the result are written to a JSON health file after every step:
+
+    [warmup]
+    health_file = "/tmp/equipment_inspection/health.json"
+
+``status`` is "warming", then "ready" (all steps ok) or "degraded".
+"""
+import importlib
+import json
+import os
+import time
+
+import gspread
+
+from common.alerts import get_alert_aggregator
+from common.change_feed import get_change_feed
+from common.checklists import get_checklist
+from common.hours_index import get_hours_index
+from common.master_data import KINDS, get_master_data
+from common.reports import dashboard_columns
+from common.shards import open_shard, read_shards
+from common.shared_cache import worksheet_values
+from common.sheet_reads import header
+from common.sheets import open_workbook, secrets_section
+from common.ui import preload_image
+
+HEALTH_FILE = secrets_section("warmup").get("health_file", "/tmp/equipment_inspection/health.json")
+
+# Imported by the pages; the first import of each costs hundreds of ms.
+MODULES = [
+    "numpy", "pandas", "pyarrow", "PIL.Image", "plotly.graph_objs", "plotly.express",
+    "streamlit_drawable_canvas", "gspread_dataframe",
+]
+BANNERS = ["Critical-Control-Management-CCM-1200x565.png", "forklift.jpg", "Tools.png"]
+# Worksheets whose header row projected reads resolve columns against.
+PROJECTED_SOURCES = ["Sheet1", "Dashboard"]
+
+
+def page_views() -> list:
+    """(worksheet, columns) read through the shared cache by the pages (None = all columns)."""
+    return [("Forklift", None), ("Sheet1", None), ("Dashboard", dashboard_columns())]
+
+
+# =========================
+# Steps
+# =========================
+def _imports() -> str:
+    missing = []
+    for name in MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            missing.append(name)
+    return f"{len(MODULES) - len(missing)} modules" + (f" (not installed: {', '.join(missing)})" if missing else "")
+
+
+def _auth() -> str:
+    return f"workbook {open_workbook().title!r}"
+
+
+def _worksheets() -> str:
+    rows = {}
+    for worksheet, columns in page_views():
+        values = worksheet_values(worksheet, columns)
+        rows[worksheet if not columns else f"{worksheet}[{len(columns)} cols]"] = max(len(values) - 1, 0)
+    return ", ".join(f"{k}: {n:,} rows" for k, n in rows.items())
+
+
+def _headers() -> str:
+    shards = read_shards()
+    columns = {}
+    for book in map(open_shard, shards):
+        for ws in PROJECTED_SOURCES:
+            try:
+                columns[ws] = len(header(book.worksheet(ws)))
+            except gspread.WorksheetNotFound:
+                if len(shards) == 1:
+                    raise
+    spreadsheets = f" ({len(shards)} spreadsheets)" if len(shards) > 1 else ""
+    return ", ".join(f"{ws}: {n} columns" for ws, n in columns.items()) + spreadsheets
+
+
+def _indexes() -> str:
+    md = get_master_data()
+    get_checklist("default")
+    return (f"master data: {sum(len(md.ids(k)) for k in KINDS)} assets, "
+            f"hours index: {len(get_hours_index())} forklifts")
+
+
+def _services() -> str:
+    get_change_feed()
+    get_alert_aggregator()
+    return f"{sum(preload_image(p) for p in BANNERS)} banner images"
+
+
+STEPS = [
+    ("imports", _imports),
+    ("auth", _auth),
+    ("worksheets", _worksheets),
+    ("headers", _headers),
+    ("indexes", _indexes),
+    ("services", _services),
+]
+
+
+# =========================
+# Runner & health file
+# =========================
+def _write_health(path: str, report: dict) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    os.replace(tmp, path)           # readers never see a half-written file
+
+
+def warm_up(health_file: str = None) -> dict:
+    """Run every step once, writing progress to the health file; returns the final report."""
+    path = health_file or HEALTH_FILE
+    t0 = time.time()
+    report = {"status": "warming", "pid": os.getpid(), "started_at": t0, "finished_at": None, "steps": []}
+    _write_health(path, report)
+    for name, step in STEPS:
+        s0 = time.perf_counter()
+        try:
+            entry = {"name": name, "ok": True, "detail": step()}
+        except Exception as e:
+            entry = {"name": name, "ok": False, "error": f"{type(e).__name__}: {e}"}
+        entry["ms"] = round((time.perf_counter() - s0) * 1000, 1)
+        report["steps"].append(entry)
+        _write_health(path, report)
+    report["status"] = "ready" if all(s["ok"] for s in report["steps"]) else "degraded"
+    report["finished_at"] = time.time()
+    report["total_ms"] = round((report["finished_at"] - t0) * 1000, 1)
+    _write_health(path, report)
+    return report
+
+
+def read_health(health_file: str = None) -> dict:
+    """Contents of the health file ({"status": "unknown"} if there is none)."""
+    try:
+        with open(health_file or HEALTH_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"status": "unknown"}
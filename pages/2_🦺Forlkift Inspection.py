@@ -1,19 +1,22 @@
-import os
 import datetime
 import pandas as pd
 import streamlit as st
 from PIL import Image
 from streamlit_drawable_canvas import st_canvas
 
-# Google Sheets
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
+from common.alerts import FAILED, SUPPRESSED, Alert, get_alert_aggregator
+from common.change_feed import publish_rows
+from common.checklists import get_checklist, render_checklist
+from common.hours_index import get_hours_index
+from common.mailer import alert_recipient
+from common.master_data import asset_selectbox, get_master_data
+from common.profiler import profile_page
+from common.shards import shard_for, shard_worksheet, site_of
+from common.sheets import append_aligned
+from common.submissions import already_submitted, mark_submitted, new_submission, submission_key
+from common.ui import banner
 
-# Email
-import smtplib
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from email.mime.image import MIMEImage
+profile_page(__file__)
 
 
 # =========================
@@ -23,8 +26,7 @@ st.set_page_config(page_title="Forklift Daily Inspection", layout="centered")
 st.title("🦺 Forklift Daily Inspection")
 
 # Optional banner image
-if os.path.exists("forklift.jpg"):
-    st.image(Image.open("forklift.jpg"))
+banner("forklift.jpg")
 
 # --- YouTube video ---
 if st.button("Forklift Inspection Video"):
@@ -55,59 +57,11 @@ for k, v in DEFAULTS.items():
         st.session_state[k] = v
 
 
-# =========================
-# Secrets-based clients
-# =========================
-SCOPE = [
-    "https://spreadsheets.google.com/feeds",
-    "https://www.googleapis.com/auth/drive",
-]
-
-def get_gspread_client():
-    creds = ServiceAccountCredentials.from_json_keyfile_dict(
-        st.secrets["gcp_service_account"], scopes=SCOPE
-    )
-    return gspread.authorize(creds)
-
-
-def send_email(to, subject, message, image_file=None, image_file_2=None):
-    """Send Gmail alert with attachments using App Passwords."""
-    cfg = st.secrets["email"]
-    from_address = cfg["user"]
-    password = cfg["app_password"]
-    host = cfg.get("smtp_host", "smtp.gmail.com")
-    port_tls = int(cfg.get("smtp_port", 587))
-
-    msg = MIMEMultipart()
-    msg["From"] = from_address
-    msg["To"] = to if isinstance(to, str) else ", ".join(to)
-    msg["Subject"] = subject
-    msg.attach(MIMEText(message, "html"))
-
-    for path, fname in [(image_file, "Forklift_Damage.jpg"), (image_file_2, "signature.png")]:
-        if path and os.path.exists(path):
-            with open(path, "rb") as f:
-                img = MIMEImage(f.read())
-                img.add_header("Content-Disposition", "attachment", filename=fname)
-                msg.attach(img)
-
-    # Try STARTTLS (587), fallback SSL (465)
-    try:
-        server = smtplib.SMTP(host, port_tls, timeout=20)
-        server.starttls()
-        server.login(from_address, password)
-        server.sendmail(from_address, [to], msg.as_string())
-        server.quit()
-    except Exception:
-        server = smtplib.SMTP_SSL(host, 465, timeout=20)
-        server.login(from_address, password)
-        server.sendmail(from_address, [to], msg.as_string())
-        server.quit()
-
-
 # =========================
 # UI helpers
+# Sections are fragments: interacting inside one reruns only that section.
 # =========================
+@st.fragment
 def take_picture():
     if st.button("📸 Enable Camera"):
         st.session_state.enable_camera = True
@@ -143,71 +97,79 @@ def signature():
         st.session_state.signature_path = sig_path
 
 
+@st.fragment
+def signature_section():
+    if st.checkbox("Signature", key="sign"):
+        signature()
+
+
 def reset_form():
     # reset fixed defaults
     for k, v in DEFAULTS.items():
         st.session_state[k] = v
-    # clear dynamic inspection fields
-    for i in range(50):
-        st.session_state[f"checked_{i}"] = False
-        st.session_state[f"broken_{i}"] = False
-        st.session_state[f"comment_{i}"] = ""
+    # clear the checklist answers
+    checklist.reset(st.session_state)
     # reset widget-bound keys
     st.session_state["name1"] = "Please Select"
     st.session_state["name2"] = "Please Select"
+    new_submission("forklift")
     st.rerun()
 
 
+def confirm_hours(forklift_id, hours):
+    # Operator confirmed a flagged reading: submit again with it.
+    st.session_state.hours_confirmed = (forklift_id, hours)
+    st.session_state.resubmit = True
+
+
 
 # =========================
 # Form fields
 # =========================
 date = st.date_input("Date", datetime.date.today())
-employee_name = st.selectbox(
-    "Employee Name",
-    ["Please Select", "Simeon Papadopoulos", "Konstantinos Papadopoulos"],
-    key="name1"
-)
-forklift_id = st.selectbox(
-    "Number of Forklifts",
-    ["Please Select", "ME 123456", "ME 234567"],
-    key="name2"
-)
+employee_name = asset_selectbox("Employee Name", "employee", key="name1")
+forklift_id = asset_selectbox("Number of Forklifts", "forklift", key="name2")
 hours = st.number_input("Operation Hours (float)", format="%.1f", step=0.1)
+hours_index = get_hours_index()
+last_reading = hours_index.last(forklift_id) if forklift_id != "Please Select" else None
+if last_reading:
+    st.caption(f"Last reading for {forklift_id}: {last_reading.hours:,.1f} h "
+               f"({datetime.datetime.fromtimestamp(last_reading.at):%Y-%m-%d %H:%M})")
 
-# Inspection items
-inspection_fields = [
-    {"name": "Brake Inspection"},
-    {"name": "Engine"},
-    {"name": "Lights"},
-    {"name": "Tires"},
-]
-
-for i, field in enumerate(inspection_fields):
-    st.subheader(field["name"])
-    st.checkbox("Checked", key=f"checked_{i}")
-    st.checkbox("Broken Down", key=f"broken_{i}")
-    st.text_area("Comments", max_chars=120, height=60, key=f"comment_{i}")
-    if st.session_state.get(f"broken_{i}", False) and not st.session_state.get(f"comment_{i}", "").strip():
-        st.warning(f"Please provide comments for {field['name']} breakdown.")
+# Inspection items (per forklift type, see checklists.csv)
+forklift = get_master_data().get("forklift", forklift_id)
+checklist = get_checklist(forklift.type if forklift and forklift.type else "forklift")
+render_checklist(checklist)
 
 take_picture()
-if st.checkbox("Signature", key="sign"):
-    signature()
+signature_section()
 
 
 # =========================
 # Submit
 # =========================
-if st.button("Submit_Form"):
+submit_key = submission_key("forklift", date, employee_name, forklift_id, hours, checklist.row(st.session_state))
+if st.button("Submit_Form") or st.session_state.pop("resubmit", False):
+    # A repeated tap (or replayed click) of a form already submitted: nothing is read, written or sent
+    if already_submitted(submit_key):
+        st.info("This form was already submitted; the repeated submit was ignored.")
+        st.button("Submit Another Form", on_click=reset_form)
+        st.stop()
+
     # Validation
-    valid = all(
-        st.session_state.get(f"checked_{i}", False) or
-        (st.session_state.get(f"broken_{i}", False) and st.session_state.get(f"comment_{i}", "").strip())
-        for i in range(len(inspection_fields))
-    )
-    if not valid or employee_name == "Please Select" or forklift_id == "Please Select":
+    result = checklist.evaluate(st.session_state)
+    if not result.ok or employee_name == "Please Select" or forklift_id == "Please Select":
         st.warning("Please complete all required fields.")
+        if result.missing_comment.any():
+            st.caption(f"Comments needed for: {', '.join(result.names(result.missing_comment))}")
+        st.stop()
+
+    # Operation hours vs the forklift's last reading (in-memory index, no sheet read)
+    hours_issue = hours_index.check(forklift_id, hours)
+    if hours_issue and st.session_state.get("hours_confirmed") != (forklift_id, hours):
+        st.warning(f"Please check Operation Hours: {hours_issue.message}")
+        st.button("✅ The reading is correct, submit anyway", on_click=confirm_hours, args=(forklift_id, hours))
+        st.caption("Otherwise correct Operation Hours above and press Submit_Form again.")
         st.stop()
 
     # Build row
@@ -217,32 +179,27 @@ if st.button("Submit_Form"):
         "Employee Name": employee_name,
         "Forklift": forklift_id,
         "Operation": hours,
+        "Hours Check": f"confirmed ({hours_issue.kind})" if hours_issue else "",
     }
-    for i, field in enumerate(inspection_fields):
-        mark = f"{'X' if st.session_state.get(f'checked_{i}', False) else ''} {'B' if st.session_state.get(f'broken_{i}', False) else ''}".strip()
-        data[field["name"]] = mark
-        data[f"{field['name']} Comments"] = st.session_state.get(f"comment_{i}", "")
+    data.update(checklist.row(st.session_state, result))
 
     df = pd.DataFrame([data])
     st.write(df)
 
-    # Write to Google Sheet
-    client = get_gspread_client()
-    sheet = client.open("Web_App")
-    ws = sheet.worksheet("Forklift")
-    if not ws.row_values(1):
-        ws.append_rows([df.columns.tolist()] + df.values.tolist())
-    else:
-        ws.append_rows(df.values.tolist())
-
-    # Alert email if critical broken
-    critical_broken = any(
-        st.session_state.get(f"broken_{i}", False) and inspection_fields[i]["name"] in ["Brake Inspection", "Engine"]
-        for i in range(len(inspection_fields))
-    )
-    if critical_broken:
-        st.error("STOP! Immediately stop the forklift and inform your Supervisor.")
-        to_addr = st.secrets["email"].get("to_alert", st.secrets["email"]["user"])
+    # Write to the site/year spreadsheet (in the sheet's column order)
+    shard = shard_for(site_of("forklift", forklift_id), date)
+    ws = shard_worksheet(shard, "Forklift")
+    columns = append_aligned(ws, df)
+    mark_submitted(submit_key)
+    df = df.reindex(columns=columns).fillna("")
+    publish_rows("Forklift", columns, df.values.tolist(), shard=shard)
+    hours_index.record(forklift_id, hours)
+    st.session_state.pop("hours_confirmed", None)
+
+    # Alert email if a critical item is broken. Handed off before anything is
+    # rendered: a repeated tap interrupts the run at the next element, and its
+    # rerun is then dropped as a replay.
+    if result.critical_broken.any():
         subject = "Forklift Broken Down"
         message = f"""
         <html>
@@ -253,13 +210,23 @@ if st.button("Submit_Form"):
         </body>
         </html>
         """
-        send_email(
-            to=to_addr,
+        alert_status = get_alert_aggregator().submit(Alert(
+            asset=forklift_id,
             subject=subject,
-            message=message,
-            image_file=st.session_state.get("picture_path"),
-            image_file_2=st.session_state.get("signature_path"),
-        )
+            body=message,
+            recipient=alert_recipient(),
+            critical=True,
+            subtype="html",
+            attachments=[
+                (st.session_state.get("picture_path"), "Forklift_Damage.jpg"),
+                (st.session_state.get("signature_path"), "signature.png"),
+            ],
+        ))
+        st.error("STOP! Immediately stop the forklift and inform your Supervisor.")
+        if alert_status == SUPPRESSED:
+            st.info(f"An alert for {forklift_id} was already sent recently; this report was logged.")
+        elif alert_status == FAILED:
+            st.warning("Alert email failed; it will be retried with the next digest.")
 
     st.success("Form submitted successfully!")
 
@@ -1,4 +1,3 @@
-import os
 import io
 import datetime
 import pandas as pd
@@ -22,16 +21,19 @@ try:
 except Exception:
     HAS_PYZBAR = False
 
-# Google Sheets
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-import gspread_dataframe as gsdf
+from common.alerts import FAILED, QUEUED, SUPPRESSED, Alert, get_alert_aggregator
+from common.change_feed import publish_rows
+from common.checklists import get_checklist, render_checklist
+from common.mailer import alert_recipient
+from common.master_data import asset_selectbox, get_master_data
+from common.profiler import profile_page
+from common.shards import fan_out, history_shards, open_shard, shard_for, shard_worksheet, site_of
+from common.sheet_reads import header, read_caption, read_columns
+from common.sheets import append_aligned
+from common.submissions import already_submitted, mark_submitted, new_submission, submission_key
+from common.ui import banner
 
-# Email
-import smtplib
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from email.mime.image import MIMEImage
+profile_page(__file__)
 
 
 # =========================
@@ -68,57 +70,6 @@ for k, v in DEFAULTS.items():
     if k not in st.session_state:
         st.session_state[k] = v
 
-# =========================
-# Config & Secrets
-# =========================
-SCOPE = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-
-def get_gspread_client():
-    creds = ServiceAccountCredentials.from_json_keyfile_dict(
-        st.secrets["gcp_service_account"], scopes=SCOPE
-    )
-    return gspread.authorize(creds)
-
-def send_email(to, subject, message, image_file=None, image_file_2=None):
-    cfg = st.secrets["email"]
-    from_address = cfg["user"]
-    password = cfg["app_password"]
-    host = cfg.get("smtp_host", "smtp.gmail.com")
-    port_tls = int(cfg.get("smtp_port", 587))
-
-    msg = MIMEMultipart()
-    msg["From"] = from_address
-    msg["To"] = to if isinstance(to, str) else ", ".join(to)
-    msg["Subject"] = subject
-    msg.attach(MIMEText(message, "plain"))
-
-    for path, fname in [(image_file, "picture.jpg"), (image_file_2, "signature.png")]:
-        if path and os.path.exists(path):
-            with open(path, "rb") as f:
-                img = MIMEImage(f.read())
-                img.add_header("Content-Disposition", "attachment", filename=fname)
-                msg.attach(img)
-
-    try:
-        server = smtplib.SMTP(host, port_tls)
-        server.ehlo(); server.starttls(); server.ehlo()
-        server.login(from_address, password)
-        server.sendmail(from_address, [to] if isinstance(to, str) else to, msg.as_string())
-        server.quit()
-        st.toast("Email sent (TLS 587).")
-        return
-    except Exception:
-        pass
-
-    try:
-        server = smtplib.SMTP_SSL(host, 465)
-        server.login(from_address, password)
-        server.sendmail(from_address, [to] if isinstance(to, str) else to, msg.as_string())
-        server.quit()
-        st.toast("Email sent (SSL 465).")
-    except Exception as e:
-        st.warning(f"Email send failed: {e}")
-
 # =========================
 # QR helpers (snapshot/upload)
 # =========================
@@ -139,32 +90,48 @@ def decode_image_bytes(image_bytes: bytes) -> str | None:
 # =========================
 st.title("⚙️ Tools Inspection")
 
-if os.path.exists("Tools.png"):
-    st.image(Image.open("Tools.png"))
+banner("Tools.png")
 
 now = datetime.datetime.now()
 date_string = now.strftime("%Y-%m-%d %H:%M:%S")
 
-equipments = [
-    "", "Welding_Inverter", "Angle_Grinder_F180", "Angle_Grinder_F125", "POINT_4-KILL",
-    "Hammer_Drills", "Rotary_Hammer_Drill", "Makita_Drill", "BLOWER", "Water_Pump",
-    "Jigsaw", "Roter_Trypio", "MPALANTEZA", "WORLD_HEATING_AIR_DW_IT_2000W",
-    "Circular_Saw", "Power_Strip"
-]
-employee_names = ["Please Select", "Giannis Papadopoulos", "Konstantinos Papadopoulos", "Papadopoulos Symeon"]
+master = get_master_data()
+
+def set_equipment_from_code(code: str) -> None:
+    """Resolve a scanned payload to a registered asset; keep the raw code if unknown.
+
+    Called from the scanner fragment, so it triggers one full rerun to refresh the
+    equipment fields outside it (skipped when the value is already applied).
+    """
+    asset = master.resolve_code(code, kind="equipment")
+    value = asset.id if asset is not None else code
+    if value == st.session_state.equipment_input:
+        return
+    st.session_state.equipment_input = value
+    # Widget state can only be set before the widget exists: applied on the rerun.
+    st.session_state["_pending_equipment"] = asset.id if asset is not None else ""
+    if asset is not None:
+        st.toast(f"QR: {asset.id}")
+    else:
+        st.toast(f"QR: {code} (not found in master data)")
+    st.rerun()
 
 # --- Form fields
 date = st.date_input("Date", datetime.date.today())
-user = st.selectbox("User", employee_names, key="unique_key_1")
+user = asset_selectbox("User", "employee", key="unique_key_1")
 
 col1, col2 = st.columns([1, 2])
-equipment = col1.selectbox("Equipment", equipments, key="unique_key_2")
+if "_pending_equipment" in st.session_state:
+    st.session_state.unique_key_2 = st.session_state.pop("_pending_equipment")
+equipment = asset_selectbox("Equipment", "equipment", key="unique_key_2", placeholder="", container=col1)
 
 # Keep text field in sync
 if equipment:
     st.session_state.equipment_input = equipment
 
-with col2:
+@st.fragment
+def qr_scanner():
+    """Mode switches, scanner frames and uploads rerun only this section."""
     st.subheader("🔎 QR Scanner")
     qr_mode = st.selectbox(
         "Mode",
@@ -180,14 +147,14 @@ with col2:
             if not st.session_state.scanning:
                 if st.button("📷 Start Scanning", use_container_width=True):
                     st.session_state.scanning = True
-            else:
+            if st.session_state.scanning:
                 code = qrcode_scanner(key="qr_tools")
-                if code:
-                    st.session_state.equipment_input = code
-                    st.success(f"QR: {code}")
-                    st.session_state.scanning = False
                 if st.button("❌ Stop Scanning", use_container_width=True):
                     st.session_state.scanning = False
+                    st.rerun(scope="fragment")
+                if code:
+                    st.session_state.scanning = False
+                    set_equipment_from_code(code)
     else:
         st.caption("Take a photo or upload an image with a QR code; static decoding is often more accurate.")
         upl = st.file_uploader("Upload image", type=["png", "jpg", "jpeg"], accept_multiple_files=False, key="qr_upload")
@@ -198,11 +165,13 @@ with col2:
         elif snap is not None:
             decoded_val = decode_image_bytes(snap.getvalue()) if HAS_PYZBAR else None
         if decoded_val:
-            st.session_state.equipment_input = decoded_val
-            st.success(f"QR: {decoded_val}")
+            set_equipment_from_code(decoded_val)
         elif (upl or snap) and not decoded_val:
             st.warning("Could not detect a QR code. Try closer, steady, good lighting, and higher contrast.")
 
+with col2:
+    qr_scanner()
+
 # Free-text the user can tweak
 st.text_input("Equipment_Selected:", value=st.session_state.equipment_input)
 
@@ -223,9 +192,17 @@ if status == "Broken Down":
     else:
         st.session_state["warning_displayed"] = False
 
+# Item checklist for the selected equipment's type (see checklists.csv)
+selected_asset = master.get("equipment", st.session_state.equipment_input)
+checklist = get_checklist(selected_asset.type if selected_asset and selected_asset.type else "")
+if len(checklist):
+    with st.expander(f"🧾 Item checklist ({len(checklist)} items)", expanded=True):
+        render_checklist(checklist)
+
 # =========================
-# Media capture & Signature
+# Media capture & Signature (fragments: interacting reruns only the section)
 # =========================
+@st.fragment
 def take_picture():
     if st.button("📸 Enable Camera"):
         st.session_state.enable_camera = True
@@ -257,43 +234,48 @@ def signature():
         img.save(sig_path)
         st.session_state.signature_path = sig_path
 
+@st.fragment
+def signature_section():
+    if st.checkbox("Signature", key="sign"):
+        signature()
+
 take_picture()
-if st.checkbox("Signature", key="sign"):
-    signature()
+signature_section()
 
 # =========================
 # Safety Valve helpers (Sheet1 schema)
 # =========================
-SHEET_COLUMNS = ["DateTime","Date","User","Equipment","Equipment_Selected","Transaction","Status","Comments"]
-
-def load_df_sheet1(ws) -> pd.DataFrame:
-    """Load as DataFrame with Sheet1 schema, robust parsing & stripping."""
-    try:
-        values = ws.get_all_values()
-    except Exception:
-        return pd.DataFrame(columns=SHEET_COLUMNS)
+# Only these columns are read (not the comments of every checklist item)
+SHEET_COLUMNS = ["Equipment_Selected","DateTime","User","Transaction","Status","Comments"]
+SAFETY_VALVE_READ = "Sheet1 safety valve"
+
+def safety_valve_label(shard) -> str:
+    return SAFETY_VALVE_READ if shard is None else f"{SAFETY_VALVE_READ} ({shard})"
+
+def load_df_sheet1(ws, shards) -> pd.DataFrame:
+    """Load the safety-valve columns of Sheet1 (``ws`` plus the other shards, in parallel), stripped, DateTime parsed."""
+    def read(shard):
+        try:
+            sheet = ws if shard is None else open_shard(shard).worksheet("Sheet1")
+            df = read_columns(sheet, SHEET_COLUMNS, types={"DateTime": "datetime"}, label=safety_valve_label(shard))
+            return df, header(sheet)
+        except Exception:
+            return None, []
+
+    frames = []
+    for df, hdr in fan_out(read, [None] + list(shards)):
+        if not hdr:
+            continue
+        # Ensure all expected columns exist
+        missing = [c for c in SHEET_COLUMNS if c not in hdr]
+        if missing:
+            st.error(f"Sheet1 is missing columns: {missing}")
+            st.stop()
+        frames.append(df)
 
-    if not values:
+    if not frames:
         return pd.DataFrame(columns=SHEET_COLUMNS)
-
-    df = pd.DataFrame(values[1:], columns=values[0])
-
-    # Ensure all expected columns exist
-    missing = [c for c in SHEET_COLUMNS if c not in df.columns]
-    if missing:
-        st.error(f"Sheet1 is missing columns: {missing}")
-        st.stop()
-
-    # Normalize
-    for c in ["User","Equipment","Equipment_Selected","Transaction","Status","Comments"]:
-        df[c] = df[c].astype(str).str.strip()
-
-    # Parse DateTime for ordering
-    df["DateTime"] = pd.to_datetime(df["DateTime"], errors="coerce", infer_datetime_format=True)
-    # Parse Date (date-only)
-    df["Date"] = pd.to_datetime(df["Date"], errors="coerce").dt.date
-
-    return df
+    return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
 
 def latest_row_for_equipment(df: pd.DataFrame, equip_selected: str):
     if not equip_selected:
@@ -313,8 +295,20 @@ def latest_row_for_equipment(df: pd.DataFrame, equip_selected: str):
 def reset_form():
     for k, v in DEFAULTS.items():
         st.session_state[k] = v
+    checklist.reset(st.session_state)
+    new_submission("tools")
 
+submit_key = submission_key(
+    "tools", date, user, st.session_state.equipment_input, transaction, status, comments,
+    checklist.row(st.session_state),
+)
 if st.button("Submit"):
+    # A repeated tap (or replayed click) of a form already submitted: nothing is read, written or sent
+    if already_submitted(submit_key):
+        st.info("This form was already submitted; the repeated submit was ignored.")
+        st.button("Submit Another Form", on_click=reset_form)
+        st.stop()
+
     # Validate basic fields
     if (
         user == "Please Select"
@@ -326,13 +320,27 @@ if st.button("Submit"):
         st.warning("Please complete all required fields (and add comments if Broken Down).")
         st.stop()
 
-    # Sheets client & worksheet
-    client = get_gspread_client()
-    sheet = client.open("Web_App")
-    ws = sheet.worksheet("Sheet1")  # <-- your Sheet1
+    check = checklist.evaluate(st.session_state)
+    if not check.ok:
+        st.warning("Please complete the item checklist (and add comments for broken items).")
+        if check.missing_comment.any():
+            st.caption(f"Comments needed for: {', '.join(check.names(check.missing_comment))}")
+        st.stop()
+    if check.broken.any() and status != "Broken Down":
+        st.warning(f"Items reported Broken Down ({', '.join(check.names(check.broken))}): set Status = Broken Down.")
+        st.stop()
+
+    # Sheet1 of the equipment's site/year spreadsheet (process-wide authorized handles)
+    site = site_of("equipment", st.session_state.equipment_input)
+    shard = shard_for(site, date)
+    ws = shard_worksheet(shard, "Sheet1")  # <-- your Sheet1
 
     # -------- SAFETY VALVE: block Check Out if last status is Broken Down --------
-    df_sheet = load_df_sheet1(ws)
+    # The last status may be in an older spreadsheet (last year's, or Web_App from before sharding)
+    older = [s for s in history_shards(site, date) if s != shard]
+    df_sheet = load_df_sheet1(ws, older)
+    for read in filter(None, (read_caption(safety_valve_label(s)) for s in [None] + older)):
+        st.caption(read)
     last = latest_row_for_equipment(df_sheet, st.session_state.equipment_input)
     if last is not None:
         last_status = str(last["Status"]).strip().lower()
@@ -346,42 +354,52 @@ if st.button("Submit"):
             )
             st.stop()
 
-    # New record (Sheet1 schema)
-    new_record = pd.DataFrame(
-        {
-            "DateTime": [date_string],             # timestamp
-            "Date": [date.isoformat()],            # date-only
-            "User": [user],
-            "Equipment": [equipment],
-            "Equipment_Selected": [st.session_state.equipment_input],
-            "Transaction": [transaction],
-            "Status": [status],
-            "Comments": [comments],
-        }
-    )
-
-    # Append headers if empty; else append rows
-    try:
-        has_header = bool(ws.row_values(1))
-    except Exception:
-        has_header = False
-
-    if not has_header:
-        ws.append_rows([new_record.columns.tolist()] + new_record.values.tolist())
-    else:
-        ws.append_rows(new_record.values.tolist())
+    # New record (Sheet1 schema, then the checklist columns)
+    record = {
+        "DateTime": date_string,             # timestamp
+        "Date": date.isoformat(),            # date-only
+        "User": user,
+        "Equipment": equipment,
+        "Equipment_Selected": st.session_state.equipment_input,
+        "Transaction": transaction,
+        "Status": status,
+        "Comments": comments,
+    }
+    record.update(checklist.row(st.session_state, check))
+    new_record = pd.DataFrame([record])
+
+    # Appended in the sheet's column order; new checklist columns go at the end
+    columns = append_aligned(ws, new_record)
+    mark_submitted(submit_key)
+    new_record = new_record.reindex(columns=columns).fillna("")
+    publish_rows("Sheet1", columns, new_record.values.tolist(), shard=shard)
 
     # Email alert if Broken Down
     if new_record.iloc[0]["Status"] == "Broken Down":
-        to_addr = st.secrets["email"].get("to_alert", st.secrets["email"]["user"])
         subject = f"Equipment Broken Down: {st.session_state.equipment_input}"
         msg = f"Equipment {st.session_state.equipment_input} reported Broken Down by {user}.\n\n{new_record.to_string(index=False)}"
         pic = st.session_state.get("picture_path")
         sig = st.session_state.get("signature_path")
-        send_email(to=to_addr, subject=subject, message=msg, image_file=pic, image_file_2=sig)
-
-    # Show last transactions table (sanity view)
-    df_all = load_df_sheet1(ws)
+        result = get_alert_aggregator().submit(Alert(
+            asset=st.session_state.equipment_input,
+            subject=subject,
+            body=msg,
+            recipient=alert_recipient(),
+            critical=bool(check.critical_broken.any()),
+            attachments=[(pic, "picture.jpg"), (sig, "signature.png")],
+        ))
+        if result == QUEUED:
+            st.toast("Breakdown added to the alert digest.")
+        elif result == SUPPRESSED:
+            st.toast("Breakdown already reported recently; alert not repeated.")
+        elif result == FAILED:
+            st.warning("Email send failed; the alert will be retried with the next digest.")
+
+    # Show last transactions table (sanity view): the rows read above + this one
+    df_all = pd.concat(
+        [df_sheet, new_record[SHEET_COLUMNS].assign(DateTime=pd.to_datetime(new_record["DateTime"]))],
+        ignore_index=True,
+    )
     if not df_all.empty:
         last_per_equipment = (
             df_all.sort_values("DateTime")
@@ -391,7 +409,7 @@ if st.button("Submit"):
         )
         st.subheader("Last transaction per Equipment_Selected")
         st.dataframe(
-            last_per_equipment[["Equipment_Selected","DateTime","User","Transaction","Status","Comments"]],
+            last_per_equipment[SHEET_COLUMNS],
             use_container_width=True
         )
 
@@ -6,68 +6,68 @@ import plotly.graph_objs as go
 import plotly.express as px
 import streamlit as st
 
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
+from common.change_feed import auto_refresh, live_frame, reset_live_frames
+from common.checklists import get_checklist
+from common.profiler import profile_page
+from common.reports import dashboard_columns
+from common.shared_cache import cache_caption, worksheet_values
+from common.sheet_reads import read_caption
+from common.time_index import bucket_for, date_window, time_index
 
-# =========================
-# Google Sheets via Secrets
-# =========================
-SCOPE = [
-    "https://spreadsheets.google.com/feeds",
-    "https://www.googleapis.com/auth/drive",
-]
-
-def get_gspread_client():
-    creds = ServiceAccountCredentials.from_json_keyfile_dict(
-        st.secrets["gcp_service_account"], scopes=SCOPE
-    )
-    return gspread.authorize(creds)
+profile_page(__file__)
+
+COMPONENTS = list(get_checklist("forklift").items)
 
 # =========================
-# App
+# Data preparation (row-wise, so it also applies to feed deltas)
 # =========================
-st.set_page_config(page_title="Dashboard", layout="centered")
-st.title("📊 Dashboard")
+def prepare_dashboard(df: pd.DataFrame) -> pd.DataFrame:
+    # Clean empties (copy-on-write: no defensive copies needed)
+    df = df.dropna(how="all")
 
-# Connect
-client = get_gspread_client()
-sheet = client.open("Web_App")
+    # -------- Type conversions (robust) --------
+    # Dates
+    for col in ["Date"]:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors="coerce")
 
-# Worksheets
-ws_dash = sheet.worksheet("Dashboard")  # metrics (Forklift, Operation, Date, hours, User, …)
-ws_raw  = sheet.worksheet("Sheet1")     # optional auxiliary data
+    # Numerics
+    for col in ["Operation", "hours"]:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce")
 
-# Pull data
-values_dash = ws_dash.get_all_values()
-values_raw  = ws_raw.get_all_values()
+    # Strings (trim)
+    for col in ["Forklift", "User"]:
+        if col in df.columns:
+            df[col] = df[col].astype(str).str.strip()
 
-# To DataFrames
-df = pd.DataFrame(values_dash[1:], columns=values_dash[0])
-df2 = pd.DataFrame(values_raw[1:], columns=values_raw[0])
+    # Remove rows missing key fields
+    required = ["Forklift", "Operation"]
+    return df.dropna(subset=[c for c in required if c in df.columns])
 
-# Clean empties
-df = df.dropna(how="all").copy()
-df2 = df2.dropna(how="all").copy()
 
-# -------- Type conversions (robust) --------
-# Dates
-for col in ["Date"]:
-    if col in df.columns:
-        df[col] = pd.to_datetime(df[col], errors="coerce")
+def fetch_values(worksheet: str, columns=None):
+    return lambda: worksheet_values(worksheet, columns)
 
-# Numerics
-for col in ["Operation", "hours"]:
-    if col in df.columns:
-        df[col] = pd.to_numeric(df[col], errors="coerce")
+# =========================
+# App
+# =========================
+st.set_page_config(page_title="Dashboard", layout="centered")
+st.title("📊 Dashboard")
 
-# Strings (trim)
-for col in ["Forklift", "User"]:
-    if col in df.columns:
-        df[col] = df[col].astype(str).str.strip()
+if st.sidebar.button("🔄 Reload from Sheets"):
+    reset_live_frames()
 
-# Remove rows missing key fields
-required = ["Forklift", "Operation"]
-df = df.dropna(subset=[c for c in required if c in df.columns]).copy()
+# Worksheet: one projected download per session, refetched when the Forklift feed has new rows
+# "Dashboard": metrics (Forklift, Operation, Date, hours, User, components), computed by sheet formulas
+df = live_frame(
+    "dashboard", "Forklift", fetch_values("Dashboard", dashboard_columns()), prepare_dashboard, refetch=True,
+)
+auto_refresh()
+st.sidebar.caption(cache_caption())
+if read_caption("Dashboard"):
+    # Last projected read of the worksheet in this process (none while the shared cache serves it)
+    st.sidebar.caption(read_caption("Dashboard"))
 
 # ---------------- Sidebar selection ----------------
 if "Forklift" not in df.columns:
@@ -81,13 +81,30 @@ if not forklift_options:
 
 selected_forklift = st.sidebar.radio("Select a forklift", forklift_options)
 
+# ---------------- Date window ----------------
+# Date-sorted index per forklift: a window is a binary search, not a scan + sort.
+if "Date" in df.columns:
+    idx = time_index("dashboard", df, "Date", key_col="Forklift")
+    start, end = date_window("Date range", idx.bounds(), key="dash_window", container=st.sidebar)
+    df_w = idx.window(start=start, end=end)                        # all forklifts
+    df_f = idx.window(selected_forklift, start, end)               # selected forklift, sorted by Date
+    if idx.covers(start, end):
+        # Full range: rows without a usable Date count too (after the dated ones)
+        df_w = df
+        df_f = pd.concat([df_f, df.loc[(df["Forklift"] == selected_forklift) & df["Date"].isna()]])
+    bucket_freq, bucket_label = bucket_for(start, end - pd.Timedelta(days=1))
+else:
+    df_w = df
+    df_f = df.loc[df["Forklift"] == selected_forklift]
+    bucket_freq, bucket_label = "M", "Month"
+
 # ---------------- KPIs ----------------
-# Max operation for selected forklift
+# Max operation for selected forklift (within the window)
 if "Operation" not in df.columns:
     st.error("The 'Dashboard' worksheet must include an 'Operation' column.")
     st.stop()
 
-max_operation = df.loc[df["Forklift"] == selected_forklift, "Operation"].max()
+max_operation = df_f["Operation"].max()
 if pd.isna(max_operation):
     max_operation = 0
 
@@ -115,7 +132,7 @@ st.caption(f"Estimated next service date: **{next_service_date.date()}**")
 st.markdown("""---""")
 
 # ---------------- Gauge ----------------
-overall_max = df["Operation"].max() if "Operation" in df.columns else next_service
+overall_max = df_w["Operation"].max()
 if pd.isna(overall_max) or overall_max <= 0:
     overall_max = next_service
 
@@ -137,35 +154,30 @@ fig_gauge = go.Figure(go.Indicator(
 st.plotly_chart(fig_gauge, use_container_width=True)
 
 # ---------------- Time-series views ----------------
-df_f = df.loc[df["Forklift"] == selected_forklift].copy()
-
 if "Date" in df_f.columns and "hours" in df_f.columns:
-    # Ensure sorted by date
-    df_f = df_f.sort_values("Date")
-    # Line chart (daily)
+    # df_f comes out of the index already sorted by date (undated rows last)
     fig_line = go.Figure(data=go.Scatter(
         x=df_f["Date"], y=df_f["hours"], mode="lines", name="Daily Hours"
     ))
     fig_line.update_layout(title="Forklift Hours over Time", xaxis_title="Date", yaxis_title="Hours")
 
-    # Year-Month aggregation
-    df_f["Year-Month"] = df_f["Date"].dt.strftime("%Y-%m")
-    df_sum = df_f.groupby("Year-Month", as_index=False)["hours"].sum()
-    df_mean = df_f.groupby("Year-Month", as_index=False)["hours"].mean()
+    # Bucketed aggregation (day / week / month from the window length)
+    buckets = df_f["Date"].dt.to_period(bucket_freq).dt.start_time
+    df_agg = df_f.groupby(buckets)["hours"].agg(["sum", "mean"])
 
-    fig_y_m = go.Figure()
-    fig_y_m.add_trace(go.Bar(x=df_sum["Year-Month"], y=df_sum["hours"], name="Sum of Hours"))
-    fig_y_m.add_trace(go.Scatter(x=df_mean["Year-Month"], y=df_mean["hours"], mode="lines", name="Avg Daily Hours"))
-    fig_y_m.update_layout(title="Hours by Year-Month", xaxis_title="Year-Month", yaxis_title="Hours")
+    fig_bucket = go.Figure()
+    fig_bucket.add_trace(go.Bar(x=df_agg.index, y=df_agg["sum"], name="Sum of Hours"))
+    fig_bucket.add_trace(go.Scatter(x=df_agg.index, y=df_agg["mean"], mode="lines", name="Avg Daily Hours"))
+    fig_bucket.update_layout(title=f"Hours by {bucket_label}", xaxis_title=bucket_label, yaxis_title="Hours")
 
-    view_type = st.radio("Select a view", ("Year-Month", "Daily Hours"), horizontal=True)
-    st.plotly_chart(fig_y_m if view_type == "Year-Month" else fig_line, use_container_width=True)
+    view_type = st.radio("Select a view", (f"By {bucket_label}", "Daily Hours"), horizontal=True)
+    st.plotly_chart(fig_line if view_type == "Daily Hours" else fig_bucket, use_container_width=True)
 else:
     st.info("Time-series not shown (need 'Date' and 'hours' columns).")
 
 # ---------------- User distribution pie ----------------
-if "User" in df.columns:
-    user_count = df["User"].value_counts(dropna=True)
+if "User" in df_w.columns:
+    user_count = df_w["User"].value_counts(dropna=True)
     if len(user_count) > 0:
         fig_pie = px.pie(names=user_count.index, values=user_count.values, title="User Distribution")
         fig_pie.update_traces(textinfo="percent+label")
@@ -176,13 +188,13 @@ else:
     st.info("Column 'User' not found for distribution chart.")
 
 # ---------------- Component inspections (stacked) ----------------
-components = [c for c in ["Brake Inspection", "Engine", "Lights", "Tires"] if c in df.columns]
-if components and "User" in df.columns:
+components = [c for c in COMPONENTS if c in df_w.columns]
+if components and "User" in df_w.columns:
     fig_stack = go.Figure()
     for comp in components:
         # coerce to numeric; missing → 0
-        yvals = pd.to_numeric(df[comp], errors="coerce").fillna(0)
-        fig_stack.add_trace(go.Bar(name=comp, x=df["User"], y=yvals))
+        yvals = pd.to_numeric(df_w[comp], errors="coerce").fillna(0)
+        fig_stack.add_trace(go.Bar(name=comp, x=df_w["User"], y=yvals))
     fig_stack.update_layout(
         title="Inspections by Component and User",
         xaxis_title="User",
@@ -193,5 +205,3 @@ if components and "User" in df.columns:
 else:
     st.info("Component columns not found (need any of: Brake Inspection, Engine, Lights, Tires).")
 
-# Optional: preview auxiliary sheet
-# st.write(df2.head())
@@ -2,21 +2,16 @@ import pandas as pd
 import plotly.graph_objs as go
 import streamlit as st
 
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
+from common.change_feed import auto_refresh, live_frame, reset_live_frames
+from common.export import FORMATS, available_formats, export_file
+from common.master_data import get_master_data
+from common.profiler import profile_page
+from common.reports import filter_breakdowns, tools_status_column, tools_view
+from common.shared_cache import cache_caption, worksheet_values
+from common.time_index import date_window, time_index
+from common.utilization import OVERDUE_HOURS, utilization_engine
 
-# =========================
-# Google Sheets via Secrets
-# =========================
-SCOPE = [
-    "https://spreadsheets.google.com/feeds",
-    "https://www.googleapis.com/auth/drive",
-]
-def get_gspread_client():
-    creds = ServiceAccountCredentials.from_json_keyfile_dict(
-        st.secrets["gcp_service_account"], scopes=SCOPE
-    )
-    return gspread.authorize(creds)
+profile_page(__file__)
 
 # =========================
 # Helpers
@@ -34,15 +29,27 @@ def dedupe_columns(df: pd.DataFrame) -> pd.DataFrame:
     for c in base:
         seen[c] = seen.get(c, 0) + 1
         new_cols.append(c if seen[c] == 1 else f"{c}_{seen[c]}")
-    out = df.copy()
-    out.columns = new_cols
-    out = out.dropna(axis=1, how="all").dropna(axis=0, how="all")
-    return out
+    out = df.set_axis(new_cols, axis=1)    # copy-on-write: shares the data
+    return out.dropna(axis=1, how="all").dropna(axis=0, how="all")
 
 def to_datetime_if_exists(df: pd.DataFrame, col: str) -> None:
     if col in df.columns:
         df[col] = pd.to_datetime(df[col], errors="coerce")
 
+def download_controls(df: pd.DataFrame, name: str, key: str) -> None:
+    """Format picker + download button; the file is streamed only when clicked."""
+    col_fmt, col_btn = st.columns([1, 3])
+    fmt = col_fmt.selectbox("Export format", available_formats(), key=f"{key}_fmt", label_visibility="collapsed")
+    ext, mime = FORMATS[fmt]
+    col_btn.download_button(
+        f"⬇️ Export {len(df):,} rows ({fmt})",
+        data=lambda: export_file(df, fmt),
+        file_name=f"{name}.{ext}",
+        mime=mime,
+        key=f"{key}_dl",
+        disabled=df.empty,
+    )
+
 def table_values(df: pd.DataFrame):
     """
     For Plotly Table: list-of-lists (columns), pretty-print datetimes.
@@ -61,31 +68,44 @@ def table_values(df: pd.DataFrame):
 st.set_page_config(page_title="Tables Report", layout="wide")
 st.title("📚 Tables Report")
 
-client = get_gspread_client()
-sheet = client.open("Web_App")
-
-ws_dashboard = sheet.worksheet("Forklift")   # Forklift log (contains 'B' markers)
-ws_tools     = sheet.worksheet("Sheet1")      # Tools transactions (your columns)
-ws_forklift  = sheet.worksheet("Forklift")    # Not used below, but kept if you need later
-
-# Pull values
-values_dash   = ws_dashboard.get_all_values()
-values_tools  = ws_tools.get_all_values()
-values_fork   = ws_forklift.get_all_values()
-
-# Build DataFrames + dedupe
-df_dash  = pd.DataFrame(values_dash[1:],  columns=[c.strip() for c in values_dash[0]])
-df_tools = pd.DataFrame(values_tools[1:], columns=[c.strip() for c in values_tools[0]])
-df_fork  = pd.DataFrame(values_fork[1:],  columns=[c.strip() for c in values_fork[0]])
-
-df_dash  = dedupe_columns(df_dash)
-df_tools = dedupe_columns(df_tools)
-df_fork  = dedupe_columns(df_fork)
-
-# Convert Date columns where present
-to_datetime_if_exists(df_dash,  "Date")
-to_datetime_if_exists(df_tools, "Date")
-to_datetime_if_exists(df_fork,  "Date")
+if st.sidebar.button("🔄 Reload from Sheets"):
+    reset_live_frames()
+
+def fetch_values(worksheet: str):
+    return lambda: worksheet_values(worksheet)
+
+def prepare(df: pd.DataFrame) -> pd.DataFrame:
+    """Dedupe headers and convert Date (row-wise, so it also applies to feed deltas)."""
+    df = dedupe_columns(df)
+    to_datetime_if_exists(df, "Date")
+    return df
+
+# Full download once per session, then only new rows from the change feed
+df_dash  = live_frame("tables_forklift", "Forklift", fetch_values("Forklift"), prepare)  # Forklift log (contains 'B' markers)
+df_tools = live_frame("tables_tools", "Sheet1", fetch_values("Sheet1"), prepare)        # Tools transactions (your columns)
+auto_refresh()
+st.sidebar.caption(cache_caption())
+
+def time_column(df: pd.DataFrame):
+    for col in ("DateTime", "Date", "FormDate"):
+        if col in df.columns:
+            return col
+    return None
+
+def windowed(df: pd.DataFrame, name: str, label: str):
+    """Rows inside a sidebar date range, sliced from a date-sorted index; returns (rows, start, end)."""
+    col = time_column(df)
+    if col is None:
+        return df, None, None
+    idx = time_index(name, df, col)
+    start, end = date_window(label, idx.bounds(), key=f"{name}_window", container=st.sidebar)
+    if idx.covers(start, end):
+        return df, start, end       # full range: rows without a usable date are shown too
+    return idx.window(start=start, end=end), start, end
+
+df_tools_all = df_tools
+df_tools, tools_start, tools_end = windowed(df_tools_all, "tables_tools", "Date range (Tools)")
+df_dash, _, _ = windowed(df_dash, "tables_forklift", "Date range (Forklift)")
 
 # =========================================================
 # ⚒️ Tools Inspection — Last Transactions (from Sheet1)
@@ -95,9 +115,8 @@ to_datetime_if_exists(df_fork,  "Date")
 # =========================================================
 st.subheader("⚒️ Tools Inspection — Last Transactions")
 
-status_col = "Status_2" if "Status_2" in df_tools.columns else ("Status" if "Status" in df_tools.columns else None)
+status_col = tools_status_column(df_tools)
 txn_col    = "Transaction" if "Transaction" in df_tools.columns else None
-date_col   = "Date" if "Date" in df_tools.columns else None
 
 # Sidebar filters
 status_opts = ["All"]
@@ -112,17 +131,8 @@ status_filter = st.sidebar.selectbox("Filter by Status", status_opts, index=0, k
 transaction_filter = st.sidebar.selectbox("Filter by Transaction", txn_opts, index=0, key="flt_txn")
 sort_order_tools = st.sidebar.selectbox("Sort order (Tools)", ["Ascending", "Descending"], index=1)
 
-tools_df = df_tools.copy()
-
-# Apply filters if columns exist
-if status_col and status_filter != "All":
-    tools_df = tools_df[tools_df[status_col] == status_filter]
-if txn_col and transaction_filter != "All":
-    tools_df = tools_df[tools_df[txn_col] == transaction_filter]
-
-# Sort by Date if present
-if date_col:
-    tools_df = tools_df.sort_values(by=date_col, ascending=(sort_order_tools == "Ascending"))
+# Apply filters if columns exist, sort by Date if present
+tools_df = tools_view(df_tools, status_filter, transaction_filter, sort_order_tools)
 
 # Color rows red when "Broken Down" in status_col (if present)
 if status_col and status_col in tools_df.columns:
@@ -149,6 +159,58 @@ table_tools = go.Table(
 fig_tools = go.Figure(data=[table_tools])
 fig_tools.update_layout(height=420, title="⚒️ Tools — Last Transactions (Sheet1)")
 st.plotly_chart(fig_tools, use_container_width=True)
+download_controls(tools_df, "tools_last_transactions", key="exp_tools")
+
+st.markdown("---")
+
+# =========================================================
+# 🧰 Tool Utilization — Check Out paired with the next Check In
+# Sessions come from the full history (holders are current);
+# utilization % is over the Tools date range.
+# =========================================================
+st.subheader("🧰 Tool Utilization")
+
+engine = utilization_engine("tables_tools", df_tools_all)
+holders = engine.holders()
+now = pd.Timestamp.now()
+util_start = tools_start if tools_start is not None else engine.sessions["out_at"].min()
+util_end = tools_end if tools_end is not None else now
+if pd.isna(util_start):
+    util_start = now
+util = engine.utilization(util_start, util_end, tools=get_master_data().ids("equipment"), now=now)
+
+m1, m2, m3, m4 = st.columns(4)
+m1.metric("Checked out now", len(holders))
+m2.metric(f"Overdue (> {OVERDUE_HOURS:g} h)", int(holders["overdue"].sum()))
+m3.metric("Idle in range", int((util["checkouts"] == 0).sum()))
+median_hours = util["median_hours"].median()
+m4.metric("Median checkout", "–" if pd.isna(median_hours) else f"{median_hours:.1f} h")
+
+col_holders, col_util = st.columns(2)
+with col_holders:
+    st.markdown("**Current holders**")
+    st.dataframe(
+        holders.style.apply(
+            lambda r: ["background-color: #ffcccc" if r["overdue"] else ""] * len(r), axis=1
+        ),
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "out_at": st.column_config.DatetimeColumn("Out since", format="YYYY-MM-DD HH:mm"),
+            "hours_out": st.column_config.NumberColumn("Hours out", format="%.1f"),
+        },
+    )
+with col_util:
+    top = util.head(20)
+    fig_util = go.Figure(go.Bar(x=top["utilization_pct"], y=top["tool"], orientation="h"))
+    fig_util.update_layout(
+        title="Utilization % (top 20)", xaxis_title="% of time checked out",
+        yaxis=dict(autorange="reversed"), height=420,
+    )
+    st.plotly_chart(fig_util, use_container_width=True)
+
+st.dataframe(util, use_container_width=True, hide_index=True)
+download_controls(util, "tool_utilization", key="exp_util")
 
 st.markdown("---")
 
@@ -158,15 +220,6 @@ st.markdown("---")
 # =========================================================
 st.subheader("🏎️ Forklift Breakdown Report")
 
-def filter_breakdowns(dfx: pd.DataFrame, sort_col=None, sort_order="asc"):
-    if dfx.empty:
-        return dfx
-    mask = dfx.apply(lambda row: any("B" in str(v) for v in row.values), axis=1)
-    out = dfx.loc[mask].copy()
-    if sort_col and sort_col in out.columns:
-        out = out.sort_values(by=sort_col, ascending=(sort_order == "asc"))
-    return out
-
 sort_col_forklift = st.sidebar.selectbox("Sort by (Forklift)", ["", "Date Time"], index=1)
 sort_order_forklift = st.sidebar.selectbox("Sort order (Forklift)", ["asc", "desc"], index=1)
 
@@ -192,5 +245,6 @@ else:
     fig_f = go.Figure(data=[table_f])
     fig_f.update_layout(height=420, title="🏎️ Forklift Breakdown Report (Dashboard)")
     st.plotly_chart(fig_f, use_container_width=True)
+    download_controls(forklift_df, "forklift_breakdowns", key="exp_forklift")
 
 
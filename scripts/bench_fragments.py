@@ -0,0 +1,158 @@
+"""
+Per-interaction server time of the Forklift inspection checklist: full-page rerun vs fragment rerun.
+
+Drives the real ``pages/2_*Forlkift Inspection.py`` headlessly with Streamlit's
+AppTest, on the fake Sheets and SMTP of ``scripts/loadtest.py``, with a
+generated ``checklists.csv`` of ``--items`` forklift items (set through
+``[checklists] path``). Each interaction ticks one random item checkbox and is
+timed end to end on the server side, once as a rerun of the whole script (what
+every click cost before the item sections were fragments) and once as a rerun
+of the item's fragment, requested with the fragment id the browser would send.
+
+    python scripts/bench_fragments.py --items 120 --interactions 50
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+
+from streamlit.runtime.scriptrunner import RerunData  # noqa: E402
+from streamlit.runtime.scriptrunner_utils.script_requests import ScriptRequests  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+from streamlit.testing.v1 import local_script_runner  # noqa: E402
+
+import loadtest  # noqa: E402
+
+
+def write_checklist(path: str, items: int) -> None:
+    """A forklift checklist of ``items`` items (every tenth critical)."""
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["type", "item", "critical", "comment_required"])
+        for i in range(items):
+            w.writerow(["forklift", f"Item {i:03d}", "yes" if i % 10 == 0 else "no", "broken"])
+
+
+_runner = {"last": None, "fragment_id": None}
+
+
+class _RecordingRunner(local_script_runner.LocalScriptRunner):
+    """Remembers itself (for fragment ids) and scopes the next run to a fragment when asked."""
+
+    def request_rerun(self, rerun_data):
+        _runner["last"] = self
+        fid = _runner.pop("fragment_id", None)
+        _runner["fragment_id"] = None
+        if fid:
+            # AppTest queues a full rerun when it creates the runner, which would
+            # absorb a fragment request; start from an empty queue instead.
+            self._requests = ScriptRequests()
+            rerun_data = RerunData(
+                widget_states=rerun_data.widget_states,
+                query_string=rerun_data.query_string,
+                page_script_hash=rerun_data.page_script_hash,
+                fragment_id_queue=[fid],
+            )
+        return super().request_rerun(rerun_data)
+
+
+def fragment_ids() -> dict:
+    """widget key -> id of the fragment that rendered it, from the last run's deltas."""
+    out = {}
+    for msg in _runner["last"].forward_msgs():
+        if not msg.HasField("delta") or not msg.delta.fragment_id:
+            continue
+        el = msg.delta.new_element
+        kind = el.WhichOneof("type")
+        wid = getattr(getattr(el, kind, None), "id", "") if kind else ""
+        if wid:
+            out[wid.rsplit("-", 1)[-1]] = msg.delta.fragment_id
+    return out
+
+
+def measure(items: int, interactions: int, fragment: bool, seed: int) -> list:
+    rng = random.Random(seed)
+    at = AppTest.from_file(loadtest.FORKLIFT_PAGE, default_timeout=120)
+    at.secrets.update(loadtest.SECRETS)
+    at.run()
+    ids = fragment_ids() if fragment else {}
+    # A fragment run only redraws its own section (the browser keeps the rest),
+    # so widget states are sent from the first full tree, like the frontend does.
+    page = at._tree
+    samples = []
+    for _ in range(interactions):
+        key = f"forklift.checked_{rng.randrange(items)}"
+        value = not at.session_state[key]
+        if fragment:
+            page.checkbox(key=key).set_value(value)
+            _runner["fragment_id"] = ids[key]
+            t0 = time.perf_counter()
+            at._run(page.get_widget_states())
+        else:
+            at.checkbox(key=key).set_value(value)
+            t0 = time.perf_counter()
+            at.run()
+        samples.append((time.perf_counter() - t0) * 1000)
+        if at.exception:
+            raise RuntimeError(at.exception[0].message)
+        if at.session_state[key] != value:
+            raise RuntimeError(f"{key} was not updated by the rerun")
+    return samples
+
+
+def summarize(samples: list) -> dict:
+    ordered = sorted(samples)
+    return {
+        "n": len(samples),
+        "p50_ms": round(statistics.median(ordered), 2),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], 2),
+        "mean_ms": round(statistics.fmean(ordered), 2),
+    }
+
+
+def run(args) -> dict:
+    report = {"items": args.items, "interactions": args.interactions}
+    with tempfile.TemporaryDirectory(prefix="bench_fragments_") as tmp:
+        path = os.path.join(tmp, "checklists.csv")
+        write_checklist(path, args.items)
+        loadtest.SECRETS["checklists"] = {"path": path}
+        # Fake Sheets/SMTP and per-run stores, as in the load test; also warms both pages
+        loadtest._init_worker(argparse.Namespace(
+            api_latency_ms=0, api_jitter_ms=0, api_error_rate=0, smtp_latency_ms=0, smtp_error_rate=0,
+            seed=args.seed, timeout=120, work_dir=tmp,
+        ))
+        with mock.patch.object(local_script_runner, "LocalScriptRunner", _RecordingRunner), \
+                mock.patch("streamlit.testing.v1.app_test.LocalScriptRunner", _RecordingRunner):
+            for name, fragment in (("full_rerun", False), ("fragment_rerun", True)):
+                report[name] = summarize(measure(args.items, args.interactions, fragment, args.seed))
+    report["speedup_p50"] = round(report["full_rerun"]["p50_ms"] / max(report["fragment_rerun"]["p50_ms"], 1e-6), 1)
+    return report
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--items", type=int, default=120, help="checklist items on the page")
+    ap.add_argument("--interactions", type=int, default=50, help="checkbox clicks timed per variant")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--json", help="also write the report to this file")
+    args = ap.parse_args(argv)
+
+    report = run(args)
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Retained memory per report session: shared snapshots vs per-session frames.
+
+Seeds the load test's in-memory Sheets fake with synthetic Forklift, Sheet1
+and Dashboard worksheets (``bench_reads.build``), then opens ``--sessions``
+sessions of the Dashboard and the Tables Report one after the other with
+Streamlit's AppTest and keeps them all alive, as concurrent users would.
+After each one it records the memory still held by the process: Python and
+NumPy allocations (tracemalloc) plus Arrow buffers (pyarrow's pool).
+
+``--no-share`` makes the snapshot store build a private frame for every
+session, which is how every session used to hold its own copy.
+
+    python scripts/bench_memory.py --rows 20000 --sessions 10
+"""
+import argparse
+import gc
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+
+import gspread  # noqa: E402
+from oauth2client.service_account import ServiceAccountCredentials  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+from bench_reads import build  # noqa: E402
+from common.snapshots import SnapshotStore, get_snapshot_store  # noqa: E402
+from loadtest import SECRETS  # noqa: E402
+
+PAGES = [
+    os.path.join(ROOT, "pages", "5_📊Dashboard.py"),
+    os.path.join(ROOT, "pages", "7_📚Tables Report.py"),
+]
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+
+def retained_bytes() -> int:
+    gc.collect()
+    arrow = pa.total_allocated_bytes() if pa is not None else 0
+    return tracemalloc.get_traced_memory()[0] + arrow
+
+
+def open_session(secrets: dict, timeout: float) -> list:
+    apps = []
+    for page in PAGES:
+        at = AppTest.from_file(page, default_timeout=timeout)
+        at.secrets.update(secrets)
+        at.run()
+        if at.exception:
+            raise RuntimeError(f"{os.path.basename(page)}: {at.exception[0].message}")
+        apps.append(at)
+    return apps
+
+
+def run(args) -> dict:
+    sheet1, dashboard, _ = build(args.rows, args.seed)
+    client = sheet1.book.client
+    client.seed("Web_App", "Forklift", [list(r) for r in dashboard.rows])
+    secrets = dict(SECRETS, shared_cache={"path": os.path.join(tempfile.mkdtemp(prefix="bench_mem_"), "cache.db")})
+
+    patches = [
+        mock.patch.object(gspread, "authorize", lambda creds: client),
+        mock.patch.object(ServiceAccountCredentials, "from_json_keyfile_dict", lambda *a, **k: None),
+    ]
+    if args.no_share:
+        patches.append(mock.patch.object(SnapshotStore, "_get_or_build", lambda self, ident, build: build()))
+    for p in patches:
+        p.start()
+    try:
+        open_session(secrets, args.timeout)          # unmeasured: imports, caches, Sheets download
+        tracemalloc.start()
+        sessions, held, render_s = [], [retained_bytes()], []
+        for _ in range(args.sessions):
+            t0 = time.perf_counter()
+            sessions.append(open_session(secrets, args.timeout))
+            render_s.append(time.perf_counter() - t0)
+            held.append(retained_bytes())
+        tracemalloc.stop()
+    finally:
+        for p in patches:
+            p.stop()
+
+    per_session = [b - a for a, b in zip(held, held[1:])]
+    return {
+        "rows": args.rows,
+        "sessions": args.sessions,
+        "shared_snapshots": not args.no_share,
+        # The first session also fills process-wide caches (e.g. identical page messages are stored once).
+        "retained_mb_first_session": round(per_session[0] / 2**20, 2),
+        "retained_mb_per_session_p50": round(statistics.median(per_session[1:] or per_session) / 2**20, 2),
+        "retained_mb_total": round((held[-1] - held[0]) / 2**20, 2),
+        "render_ms_p50": round(statistics.median(render_s) * 1000, 1),
+        "store": get_snapshot_store().stats(),
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--rows", type=int, default=20000, help="data rows per worksheet")
+    ap.add_argument("--sessions", type=int, default=10, help="sessions kept open at the same time")
+    ap.add_argument("--no-share", action="store_true", help="build a private frame per session (old behaviour)")
+    ap.add_argument("--timeout", type=float, default=120)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--json", help="also write the report to this file")
+    args = ap.parse_args(argv)
+
+    report = run(args)
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
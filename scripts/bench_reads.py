@@ -0,0 +1,149 @@
+"""
+Full-sheet vs column-projected reads: payload size and parse time.
+
+Builds synthetic "Sheet1" (tool transactions with checklist columns and long
+comments) and "Dashboard" worksheets on the load test's in-memory fake, whose
+``batch_get`` honours A1 ranges and column-major results like the API, then
+compares, per read:
+
+- full: ``get_all_values()`` + DataFrame + the same typing the page does;
+- projected: ``read_columns`` with the columns the page actually uses;
+- recent (Dashboard only): projected and limited to the last ``--days`` days.
+
+Bytes are the JSON size of the returned values (what the API would send);
+fetch time against the real API follows them, so only parse time is timed here
+(the in-memory fake has no network cost).
+
+    python scripts/bench_reads.py --rows 20000 --repeat 5
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+
+import pandas as pd  # noqa: E402
+
+from common import sheet_reads  # noqa: E402
+from common.checklists import ChecklistRegistry  # noqa: E402
+from loadtest import SHEET1_HEADER, Faults, FakeClient  # noqa: E402
+
+SAFETY_COLUMNS = ["Equipment_Selected", "DateTime", "User", "Transaction", "Status", "Comments"]
+
+
+def _comment(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(["brake", "worn", "leak", "ok", "replaced", "checked", "loose", "noise"])
+                    for _ in range(rng.randint(0, words)))
+
+
+def build(rows: int, seed: int):
+    rng = random.Random(seed)
+    registry = ChecklistRegistry()
+    tool, forklift = registry.get("tool"), registry.get("forklift")
+    start = pd.Timestamp("2024-01-01")
+
+    sheet1 = [SHEET1_HEADER + list(tool.columns)]
+    dash_header = ["Forklift", "Operation", "Date", "hours", "User", "Notes"] + list(forklift.columns)
+    dashboard = [dash_header]
+    for i in range(rows):
+        ts = start + pd.Timedelta(minutes=37 * i)
+        sheet1.append(
+            [ts.strftime("%Y-%m-%d %H:%M:%S"), ts.date().isoformat(), f"user{rng.randint(1, 40)}", "Drill",
+             f"T{rng.randint(1, 300):03d}", rng.choice(["Check Out", "Check In"]),
+             rng.choice(["Checked", "Checked", "Broken Down"]), _comment(rng, 20)]
+            + [c for _ in tool.items for c in (rng.choice(["X", "X", "B"]), _comment(rng, 12))]
+        )
+        dashboard.append(
+            [f"F{rng.randint(1, 25):02d}", str(1000 + i), ts.date().isoformat(), str(rng.randint(1, 9)),
+             f"user{rng.randint(1, 40)}", _comment(rng, 30)]
+            + [c for _ in forklift.items for c in (rng.choice(["X", "X", "X B"]), _comment(rng, 12))]
+        )
+    client = FakeClient(Faults())
+    client.seed("Web_App", "Sheet1", sheet1)
+    client.seed("Web_App", "Dashboard", dashboard)
+    book = client.open("Web_App")
+    return book.worksheet("Sheet1"), book.worksheet("Dashboard"), forklift
+
+
+def full_read(ws, types: dict):
+    values = ws.get_all_values()
+    t1 = time.perf_counter()
+    df = pd.DataFrame(values[1:], columns=values[0])
+    for col in df.columns:
+        kind = types.get(col)
+        df[col] = pd.to_datetime(df[col], errors="coerce") if kind == "datetime" else df[col].str.strip()
+    t2 = time.perf_counter()
+    return {"cells": sum(len(r) for r in values[1:]), "bytes": len(json.dumps(values, separators=(",", ":"))),
+            "ranges": 1, "parse_ms": (t2 - t1) * 1000}
+
+
+def projected_read(ws, columns: list, types: dict, since=None):
+    sheet_reads.forget_header(ws)
+    sheet_reads.header(ws)                       # header is cached on a warm server
+    df = sheet_reads.read_columns(ws, columns, since=since, types=types)
+    s = df.attrs["read_stats"]
+    return {"cells": s.cells, "bytes": s.bytes, "ranges": len(s.ranges), "parse_ms": s.parse_ms}
+
+
+def measure(fn, repeat: int) -> dict:
+    # GC off while timing: the synthetic sheets keep millions of strings alive.
+    gc.collect()
+    gc.disable()
+    try:
+        runs = [fn() for _ in range(repeat)]
+    finally:
+        gc.enable()
+    out = {k: runs[0][k] for k in ("cells", "bytes", "ranges")}
+    out["parse_ms_p50"] = round(statistics.median(r["parse_ms"] for r in runs), 1)
+    return out
+
+
+def run(args) -> dict:
+    sheet1, dashboard, forklift = build(args.rows, args.seed)
+    dash_columns = ["Forklift", "Operation", "Date", "hours", "User"] + list(forklift.items)
+    since = ("Date", pd.Timestamp("2024-01-01") + pd.Timedelta(minutes=37 * args.rows) - pd.Timedelta(days=args.days))
+    report = {
+        "rows": args.rows,
+        "Sheet1 safety valve": {
+            "full": measure(lambda: full_read(sheet1, {"DateTime": "datetime"}), args.repeat),
+            "projected": measure(lambda: projected_read(sheet1, SAFETY_COLUMNS, {"DateTime": "datetime"}), args.repeat),
+        },
+        "Dashboard": {
+            "full": measure(lambda: full_read(dashboard, {"Date": "datetime"}), args.repeat),
+            "projected": measure(lambda: projected_read(dashboard, dash_columns, {"Date": "datetime"}), args.repeat),
+            f"last {args.days} days": measure(
+                lambda: projected_read(dashboard, dash_columns, {"Date": "datetime"}, since=since), args.repeat
+            ),
+        },
+    }
+    for name in ("Sheet1 safety valve", "Dashboard"):
+        full, proj = report[name]["full"], report[name]["projected"]
+        report[name]["bytes_saved_pct"] = round(100 * (1 - proj["bytes"] / full["bytes"]), 1)
+    return report
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--rows", type=int, default=20000, help="data rows per worksheet")
+    ap.add_argument("--days", type=int, default=90, help="date bound of the 'recent' Dashboard read")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--json", help="also write the report to this file")
+    args = ap.parse_args(argv)
+
+    report = run(args)
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Read latency of a sharded worksheet vs the number of shards.
+
+Seeds the load test's in-memory Sheets fake with ``--rows`` Forklift rows
+split over N per-site shards ("Web_App Site<i> <year>"), every API call
+delayed by ``--api-latency-ms``. For each N it times a report read,
+``worksheet_values("Forklift")``, after the cache entries were invalidated (as
+after a submit): every shard is refetched, then merged. The catalog and
+spreadsheet handles are warm, as on a running server.
+
+Runs once on the bounded pool (``--max-workers``) and once serially
+(``max_workers = 1``) for comparison:
+
+    python scripts/bench_shards.py --shards 1 2 4 8 16 --api-latency-ms 150
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+from datetime import date
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+
+import gspread  # noqa: E402
+from oauth2client.service_account import ServiceAccountCredentials  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+from common import shards as shard_mod  # noqa: E402
+from common import sheets  # noqa: E402
+from common.shared_cache import get_shared_cache  # noqa: E402
+from loadtest import SECRETS, FakeClient, Faults  # noqa: E402
+
+HEADER = ["DateTime", "FormDate", "Employee Name", "Forklift", "Operation", "Brake Inspection", "Engine"]
+SHARD_NAME = "Web_App Site{site} {year}"
+
+
+def _probe():
+    import time
+
+    import streamlit as st
+
+    from common.shared_cache import worksheet_values
+
+    t0 = time.perf_counter()
+    values = worksheet_values("Forklift")
+    st.session_state["probe"] = {"seconds": time.perf_counter() - t0, "rows": len(values) - 1}
+
+
+def seed(client: FakeClient, n_shards: int, rows: int) -> None:
+    year = date.today().year
+    per_shard = max(rows // n_shards, 1)
+    for s in range(n_shards):
+        client.seed(SHARD_NAME.format(site=s, year=year), "Forklift", [HEADER] + [
+            [f"{year}-01-01 08:00:00", f"{year}-01-01", f"user{i % 40}", f"FL-{s}-{i % 12}", str(1000 + i), "X", "X"]
+            for i in range(per_shard)
+        ])
+
+
+def probe(secrets: dict, timeout: float) -> dict:
+    at = AppTest.from_function(_probe, default_timeout=timeout)
+    at.secrets.update(secrets)
+    at.run()
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    return at.session_state["probe"]
+
+
+def run_case(n_shards: int, max_workers: int, args) -> dict:
+    client = FakeClient(Faults(args.api_latency_ms, 0.0, 0.0, seed=args.seed))
+    seed(client, n_shards, args.rows)
+    secrets = dict(
+        SECRETS,
+        shards={"name": SHARD_NAME, "include_workbook": False, "max_workers": max_workers},
+        shared_cache={"path": os.path.join(tempfile.mkdtemp(prefix="bench_shards_"), "cache.db"),
+                      "refresh_seconds": 3600},
+    )
+    patches = [
+        mock.patch.object(gspread, "authorize", lambda creds: client),
+        mock.patch.object(ServiceAccountCredentials, "from_json_keyfile_dict", lambda *a, **k: None),
+    ]
+    for p in patches:
+        p.start()
+    try:
+        # Fresh process-wide state for this case: client, pool, cache, catalog and handles
+        for resource in (sheets.shared_client, sheets._workbook, shard_mod._pool, get_shared_cache):
+            resource.clear()
+        shard_mod.forget_catalog()
+        shard_mod._books.clear()
+
+        first = probe(secrets, args.timeout)         # unmeasured: catalog, handles, headers
+        names = [SHARD_NAME.format(site=s, year=date.today().year) for s in range(n_shards)]
+        timings = []
+        for _ in range(args.repeat):
+            get_shared_cache().invalidate(*(f"{n}!Forklift" for n in names))
+            timings.append(probe(secrets, args.timeout)["seconds"])
+    finally:
+        for p in patches:
+            p.stop()
+    return {
+        "shards": n_shards,
+        "max_workers": max_workers,
+        "rows": first["rows"],
+        "read_ms_p50": round(statistics.median(timings) * 1000, 1),
+        "read_ms_max": round(max(timings) * 1000, 1),
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    ap.add_argument("--rows", type=int, default=20000, help="Forklift rows in total, split over the shards")
+    ap.add_argument("--max-workers", type=int, default=8)
+    ap.add_argument("--api-latency-ms", type=float, default=150)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--timeout", type=float, default=120)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--json", help="also write the report to this file")
+    args = ap.parse_args(argv)
+
+    report = [run_case(n, w, args) for n in args.shards for w in (args.max_workers, 1)]
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Check that every export format survives Streamlit's download-button path.
+
+The Tables Report passes ``lambda: export_file(df, fmt)`` as the deferred
+``data`` of ``st.download_button``. On click, Streamlit converts the
+callable's result with ``convert_data_to_bytes_and_infer_mime``, which only
+accepts str, bytes and a few file types. For each available format, this
+builds a report frame (datetimes, numbers, blanks), runs the export through
+that same function and reads the bytes back:
+
+    python scripts/check_exports.py --rows 20000
+
+Exits non-zero on the first format that fails.
+"""
+import argparse
+import io
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pandas as pd  # noqa: E402
+from streamlit.runtime.download_data_util import convert_data_to_bytes_and_infer_mime  # noqa: E402
+
+from common.export import available_formats, export_file  # noqa: E402
+
+
+def frame(rows: int) -> pd.DataFrame:
+    return pd.DataFrame({
+        "DateTime": pd.date_range("2025-01-01", periods=rows, freq="h"),
+        "Equipment_Selected": [f"EQ-{i % 50}" for i in range(rows)],
+        "Operation": [float(i) for i in range(rows)],
+        "Comments": ["" if i % 3 else "ok, \"quoted\"" for i in range(rows)],
+    })
+
+
+def read_back(fmt: str, data: bytes) -> pd.DataFrame:
+    if fmt == "CSV":
+        return pd.read_csv(io.BytesIO(data), encoding="utf-8-sig")
+    if fmt == "XLSX":
+        return pd.read_excel(io.BytesIO(data))
+    return pd.read_parquet(io.BytesIO(data))
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--rows", type=int, default=20000)
+    args = ap.parse_args(argv)
+
+    df = frame(args.rows)
+    failed = False
+    for fmt in available_formats():
+        try:
+            data, _ = convert_data_to_bytes_and_infer_mime(
+                export_file(df, fmt), RuntimeError("Callable returned unsupported type")
+            )
+            back = read_back(fmt, data)
+            if len(back) != len(df) or [str(c) for c in back.columns] != list(df.columns):
+                raise RuntimeError(f"read back {len(back)} rows, columns {list(back.columns)}")
+            print(f"{fmt}: ok, {len(data):,} bytes, {len(back):,} rows")
+        except Exception as e:
+            failed = True
+            print(f"{fmt}: FAILED: {e}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Check that the shared worksheet cache keeps serving one list per data version.
+
+Report snapshots (``common/snapshots.py``) are keyed on the identity of the
+values list the cache serves. A refresh that finds the same content must
+therefore return the list already served, or every new session would build and
+pin a frame of its own. Runs against a temporary cache file and a fake fetch:
+
+    python scripts/check_shared_cache.py
+
+Exits non-zero on the first failed check.
+"""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from common.shared_cache import SharedSheetCache  # noqa: E402
+
+
+def main():
+    sheet = {"values": [["Forklift", "Operation"], ["FL-1", "100"]]}
+    # A fresh list per fetch, as gspread returns
+    cache = SharedSheetCache(
+        os.path.join(tempfile.mkdtemp(prefix="check_shared_cache_"), "cache.db"),
+        fetch=lambda worksheet: [list(row) for row in sheet["values"]],
+    )
+    checks = []
+
+    first = cache.refresh("Forklift")
+    second = cache.refresh("Forklift")
+    checks.append(("unchanged refresh returns the same list", second is first))
+    checks.append(("a read after it serves that list", cache.get_values("Forklift") is first))
+
+    sheet["values"] = sheet["values"] + [["FL-2", "200"]]
+    changed = cache.refresh("Forklift")
+    checks.append(("changed content returns a new list", changed is not first and len(changed) == 3))
+    checks.append(("an unchanged refresh after that keeps it", cache.refresh("Forklift") is changed))
+
+    for name, ok in checks:
+        print(f"{'ok' if ok else 'FAILED'}: {name}")
+    sys.exit(0 if all(ok for _, ok in checks) else 1)
+
+
+if __name__ == "__main__":
+    main()
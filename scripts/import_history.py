@@ -0,0 +1,64 @@
+"""
+Import historical inspection records from a CSV or XLSX file.
+
+``tools`` rows go to Sheet1, ``forklift`` rows to the Forklift worksheet (of
+their site/year spreadsheet when shards are configured). See
+``common/history_import.py`` for the normalization, validation, dedupe and
+checkpoint rules. Uses the app's ``.streamlit/secrets.toml``.
+
+    python scripts/import_history.py tools old_tools.xlsx --sheet 2019 --dayfirst --dry-run
+    python scripts/import_history.py forklift forklift_logs.csv --requests-per-minute 40
+
+An interrupted import resumes from its checkpoint when run again with the same
+arguments; ``--restart`` starts over (already imported rows are skipped as
+duplicates).
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("kind", choices=["tools", "forklift"])
+    ap.add_argument("path", help="CSV (, ; or tab separated) or XLSX file")
+    ap.add_argument("--sheet", help="XLSX worksheet (default: the first)")
+    ap.add_argument("--dayfirst", action="store_true", help="read 03/04/2020 as 3 April (ISO dates are unaffected)")
+    ap.add_argument("--chunk-rows", type=int, default=2000, help="source rows per block / append")
+    ap.add_argument("--requests-per-minute", type=float, default=50, help="Sheets API write quota is 60/min/user")
+    ap.add_argument("--checkpoint", help="checkpoint file (default: /tmp/equipment_inspection/imports/...)")
+    ap.add_argument("--restart", action="store_true", help="ignore the checkpoint and start from the first row")
+    ap.add_argument("--rejects", help="CSV of rejected rows with the reason (default: <path>.<kind>.rejects.csv)")
+    ap.add_argument("--allow-unknown-assets", action="store_true", help="import assets missing from master data")
+    ap.add_argument("--dry-run", action="store_true", help="validate and dedupe only, write nothing to Sheets")
+    ap.add_argument("--json", help="also write the report to this file")
+    args = ap.parse_args(argv)
+
+    path = os.path.abspath(args.path)
+    os.chdir(ROOT)                  # secrets and checklists.csv are relative to the app root
+    sys.path.insert(0, ROOT)
+    from common.history_import import HistoryImporter
+    # Cached loads outside a session log "missing ScriptRunContext".
+    logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").setLevel(logging.ERROR)
+
+    importer = HistoryImporter(
+        args.kind, path, sheet=args.sheet, chunk_rows=args.chunk_rows,
+        requests_per_minute=args.requests_per_minute, dayfirst=args.dayfirst, checkpoint=args.checkpoint,
+        restart=args.restart, dry_run=args.dry_run, rejects=args.rejects,
+        allow_unknown_assets=args.allow_unknown_assets, log=lambda msg: print(msg, file=sys.stderr),
+    )
+    report = importer.run()
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if report["rejected"]:
+        print(f"{report['rejected']:,} rows rejected, see {importer.rejects}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,455 @@
+"""
+Concurrent-session load test for the Forklift and Tools inspection submits.
+
+Drives the real page scripts headlessly with Streamlit's AppTest, one AppTest
+per simulated session, on a pool of worker processes. gspread and SMTP are replaced
+by in-memory stand-ins with injectable latency and error rates, so runs are
+repeatable and never touch Google or a mail server.
+
+    python scripts/loadtest.py --sessions 50 --concurrency 50 --page both \
+        --api-latency-ms 120 --api-error-rate 0.01 --smtp-latency-ms 400
+
+Reports page-load and submit p50/p95/p99 latency, submit throughput, Sheets
+API calls per submit (by method), SMTP sessions/messages and error rates.
+``--double-submit-rate`` makes a share of sessions press Submit a second time
+(a double tap): the replay must not add API calls, rows or emails.
+"""
+import argparse
+import glob
+import importlib
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import smtplib
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import gspread  # noqa: E402
+from gspread.utils import a1_range_to_grid_range  # noqa: E402
+from oauth2client.service_account import ServiceAccountCredentials  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+FORKLIFT_PAGE = glob.glob(os.path.join(ROOT, "pages", "2_*Forlkift Inspection.py"))[0]
+TOOLS_PAGE = glob.glob(os.path.join(ROOT, "pages", "3_*Tools Inspection.py"))[0]
+
+SHEET1_HEADER = ["DateTime", "Date", "User", "Equipment", "Equipment_Selected", "Transaction", "Status", "Comments"]
+
+SECRETS = {
+    "gcp_service_account": {"type": "service_account", "client_email": "loadtest@example.com"},
+    "email": {"user": "loadtest@example.com", "app_password": "x", "to_alert": "alerts@example.com"},
+}
+
+
+# =========================
+# Stand-ins
+# =========================
+class FakeAPIError(Exception):
+    pass
+
+
+class Faults:
+    """Latency/error injection shared by the fakes."""
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def apply(self, what: str) -> None:
+        with self._lock:
+            delay = max(0.0, self.latency_ms + self._rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+            fail = self._rng.random() < self.error_rate
+        time.sleep(delay)
+        if fail:
+            raise FakeAPIError(f"injected failure in {what}")
+
+
+class FakeWorksheet:
+    def __init__(self, book, title, rows=None):
+        self.book = book
+        self.title = title
+        self.spreadsheet_id = book.id
+        self.rows = [list(r) for r in (rows or [])]
+
+    def _call(self, method):
+        self.book.client.count(method)
+        self.book.client.faults.apply(method)
+
+    def get_all_values(self):
+        self._call("get_all_values")
+        with self.book.lock:
+            return [list(r) for r in self.rows]
+
+    def row_values(self, n):
+        self._call("row_values")
+        with self.book.lock:
+            return list(self.rows[n - 1]) if len(self.rows) >= n else []
+
+    def batch_get(self, ranges, major_dimension=None, **kwargs):
+        self._call("batch_get")
+        with self.book.lock:
+            return [self._range(a1, major_dimension == "COLUMNS") for a1 in ranges]
+
+    def _range(self, a1, by_columns):
+        # Like the API: open-ended ranges ("C2:D"), trailing empty cells/rows trimmed.
+        g = a1_range_to_grid_range(a1)
+        rows = self.rows[g.get("startRowIndex", 0):g.get("endRowIndex")]
+        c0, c1 = g.get("startColumnIndex", 0), g.get("endColumnIndex")
+        c1 = c1 if c1 is not None else max((len(r) for r in rows), default=0)
+        block = [r[c0:c1] + [""] * (c1 - max(len(r), c0)) if len(r) < c1 else r[c0:c1] for r in rows]
+        if by_columns:
+            block = [list(col) for col in zip(*block)]
+        trimmed = []
+        for line in block:
+            while line and line[-1] == "":
+                line = line[:-1]
+            trimmed.append(line)
+        while trimmed and not trimmed[-1]:
+            trimmed.pop()
+        return trimmed
+
+    def append_rows(self, values, **kwargs):
+        self._call("append_rows")
+        with self.book.lock:
+            self.rows.extend([str(v) for v in row] for row in values)
+
+    def update(self, values, range_name=None, **kwargs):
+        # Only header rewrites ("A1") are issued by the pages.
+        self._call("update")
+        with self.book.lock:
+            self.rows[0:1] = [[str(v) for v in values[0]]]
+
+
+class FakeSpreadsheet:
+    def __init__(self, client, title):
+        self.client = client
+        self.title = title
+        self.id = f"fake-{title}"
+        self.lock = threading.Lock()
+        self.sheets = {}
+
+    def worksheet(self, title):
+        self.client.count("worksheet")
+        self.client.faults.apply("worksheet")
+        with self.lock:
+            if title not in self.sheets:
+                self.sheets[title] = FakeWorksheet(self, title)
+            return self.sheets[title]
+
+    def add_worksheet(self, title, rows=1000, cols=26, **kwargs):
+        self.client.count("add_worksheet")
+        self.client.faults.apply("add_worksheet")
+        with self.lock:
+            return self.sheets.setdefault(title, FakeWorksheet(self, title))
+
+    def share(self, *args, **kwargs):
+        self.client.count("share")
+
+
+class FakeClient:
+    def __init__(self, faults: Faults):
+        self.faults = faults
+        self.calls = Counter()
+        self._lock = threading.Lock()
+        self.books = {}
+
+    def count(self, method):
+        with self._lock:
+            self.calls[method] += 1
+
+    def open(self, title):
+        self.count("open")
+        self.faults.apply("open")
+        with self._lock:
+            if title not in self.books:
+                raise gspread.SpreadsheetNotFound(title)
+            return self.books[title]
+
+    def create(self, title, folder_id=None):
+        self.count("create")
+        self.faults.apply("create")
+        with self._lock:
+            return self.books.setdefault(title, FakeSpreadsheet(self, title))
+
+    def copy(self, file_id, title=None, **kwargs):
+        self.count("copy")
+        self.faults.apply("copy")
+        with self._lock:
+            source = next(b for b in self.books.values() if b.id == file_id)
+            book = self.books.setdefault(title, FakeSpreadsheet(self, title))
+            for name, ws in source.sheets.items():
+                book.sheets[name] = FakeWorksheet(book, name, ws.rows[:1])
+            return book
+
+    def list_spreadsheet_files(self, title=None, folder_id=None):
+        self.count("list_spreadsheet_files")
+        self.faults.apply("list_spreadsheet_files")
+        with self._lock:
+            return [{"id": b.id, "name": b.title} for b in self.books.values() if title in (None, b.title)]
+
+    def seed(self, title, worksheet, rows):
+        book = self.books.setdefault(title, FakeSpreadsheet(self, title))
+        book.sheets[worksheet] = FakeWorksheet(book, worksheet, rows)
+
+
+class FakeSMTP:
+    """Counts sessions/messages; latency per session, errors on login."""
+    faults = Faults()
+    stats = Counter()
+    lock = threading.Lock()
+
+    def __init__(self, *args, **kwargs):
+        with FakeSMTP.lock:
+            FakeSMTP.stats["sessions"] += 1
+        FakeSMTP.faults.apply("smtp_connect")
+
+    def ehlo(self, *a, **k):
+        pass
+
+    def starttls(self, *a, **k):
+        pass
+
+    def login(self, *a, **k):
+        pass
+
+    def sendmail(self, from_addr, to_addrs, msg):
+        with FakeSMTP.lock:
+            FakeSMTP.stats["messages"] += 1
+            FakeSMTP.stats["bytes"] += len(msg)
+
+    def quit(self):
+        pass
+
+
+# =========================
+# Session scripts
+# =========================
+def _button(at, label):
+    for b in at.button:
+        if b.label == label:
+            return b
+    detail = at.exception[0].message if at.exception else "not rendered"
+    raise RuntimeError(f"button {label!r} missing: {detail}")
+
+
+def check_all_items(at):
+    for cb in at.checkbox:
+        if cb.key and ".checked_" in cb.key:
+            cb.check()
+
+
+def forklift_session(rng: random.Random, timeout: float, broken_rate: float, double_rate: float = 0.0):
+    at = AppTest.from_file(FORKLIFT_PAGE, default_timeout=timeout)
+    at.secrets.update(SECRETS)
+    t0 = time.perf_counter()
+    at.run()
+    load = time.perf_counter() - t0
+
+    employees = [o for o in at.selectbox(key="name1").options if o != "Please Select"]
+    forklifts = [o for o in at.selectbox(key="name2").options if o != "Please Select"]
+    at.selectbox(key="name1").set_value(rng.choice(employees))
+    at.selectbox(key="name2").set_value(rng.choice(forklifts))
+    at.number_input[0].set_value(round(rng.uniform(100, 5000), 1))
+    check_all_items(at)
+    if rng.random() < broken_rate:
+        at.checkbox(key="forklift.broken_0").check()
+        at.text_area(key="forklift.comment_0").input("load test breakdown")
+    t0 = time.perf_counter()
+    _button(at, "Submit_Form").click().run()
+    # Random readings often trip the operation-hours check: the operator confirms.
+    confirm = [b for b in at.button if b.label.startswith("✅ The reading is correct")]
+    if confirm:
+        confirm[0].click().run()
+    submit = time.perf_counter() - t0
+    if rng.random() < double_rate:
+        _button(at, "Submit_Form").click().run()
+    return load, submit, at
+
+
+def tools_session(rng: random.Random, timeout: float, broken_rate: float, double_rate: float = 0.0):
+    at = AppTest.from_file(TOOLS_PAGE, default_timeout=timeout)
+    at.secrets.update(SECRETS)
+    t0 = time.perf_counter()
+    at.run()
+    load = time.perf_counter() - t0
+
+    users = [o for o in at.selectbox(key="unique_key_1").options if o != "Please Select"]
+    equipment = [o for o in at.selectbox(key="unique_key_2").options if o]
+    at.selectbox(key="unique_key_1").set_value(rng.choice(users))
+    at.selectbox(key="unique_key_2").set_value(rng.choice(equipment))
+    broken = rng.random() < broken_rate
+    at.selectbox(key="unique_key_3").set_value(rng.choice(["Check In", "Check Out"]))
+    at.selectbox(key="unique_key_4").set_value("Broken Down" if broken else "Checked")
+    if broken:
+        at.text_area(key="unique_key_6").input("load test breakdown")
+    at.run()
+    check_all_items(at)
+    t0 = time.perf_counter()
+    _button(at, "Submit").click().run()
+    submit = time.perf_counter() - t0
+    if rng.random() < double_rate:
+        _button(at, "Submit").click().run()
+    return load, submit, at
+
+
+PAGES = {"forklift": forklift_session, "tools": tools_session}
+
+
+# =========================
+# Runner
+# =========================
+def percentile(values, p):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    k = (len(values) - 1) * p / 100
+    lo, hi = int(k), min(int(k) + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def summarize(samples):
+    return {
+        "n": len(samples),
+        "p50_ms": round(percentile(samples, 50) * 1000, 1),
+        "p95_ms": round(percentile(samples, 95) * 1000, 1),
+        "p99_ms": round(percentile(samples, 99) * 1000, 1),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 1) if samples else float("nan"),
+    }
+
+
+_client = None
+
+
+def _init_worker(args) -> None:
+    """Per-process setup: fakes + patches for the lifetime of the worker."""
+    global _client
+    os.chdir(ROOT)
+    seed = args.seed + os.getpid()
+    _client = FakeClient(Faults(args.api_latency_ms, args.api_jitter_ms, args.api_error_rate, seed=seed))
+    _client.seed("Web_App", "Sheet1", [SHEET1_HEADER])
+    FakeSMTP.faults = Faults(args.smtp_latency_ms, 0.0, args.smtp_error_rate, seed=seed)
+    # Every file-backed store in a directory of this worker's own: each worker has its own fake
+    # sheets, and nothing may reach the app's real files under /tmp/equipment_inspection.
+    work_dir = tempfile.mkdtemp(prefix=f"worker{os.getpid()}_", dir=getattr(args, "work_dir", None))
+    SECRETS["hours_check"] = {"path": os.path.join(work_dir, "hours_index.db")}
+    SECRETS["shared_cache"] = {"path": os.path.join(work_dir, "sheets_cache.db")}
+    SECRETS["change_feed"] = {"path": os.path.join(work_dir, "change_feed.db")}
+    for p in (
+        mock.patch.object(gspread, "authorize", lambda creds: _client),
+        mock.patch.object(ServiceAccountCredentials, "from_json_keyfile_dict", lambda *a, **k: None),
+        mock.patch.object(smtplib, "SMTP", FakeSMTP),
+        mock.patch.object(smtplib, "SMTP_SSL", FakeSMTP),
+    ):
+        p.start()
+    # Unmeasured first render per page: imports and process-wide caches are warm
+    # before timing starts, as on a long-running server.
+    for path in (FORKLIFT_PAGE, TOOLS_PAGE):
+        at = AppTest.from_file(path, default_timeout=args.timeout)
+        at.secrets.update(SECRETS)
+        at.run()
+
+
+def _run_session(job):
+    """One simulated session; API/SMTP counts are exact because a worker runs one session at a time."""
+    page, seed, timeout, broken_rate, double_rate = job
+    calls_before, smtp_before = Counter(_client.calls), Counter(FakeSMTP.stats)
+    load = submit = error = None
+    try:
+        load, submit, at = PAGES[page](random.Random(seed), timeout, broken_rate, double_rate)
+        if at.exception:
+            error = at.exception[0].message
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    return page, load, submit, error, _client.calls - calls_before, FakeSMTP.stats - smtp_before
+
+
+def run(args) -> dict:
+    # AppTest swaps process-global state (runtime, secrets) during a run, so
+    # concurrent sessions run in worker processes, one session at a time each.
+    pages = ["forklift", "tools"] if args.page == "both" else [args.page]
+    jobs = [(pages[i % len(pages)], args.seed + i, args.timeout, args.broken_rate, args.double_submit_rate) for i in range(args.sessions)]
+    results = {p: {"load": [], "submit": [], "errors": 0, "sessions": 0} for p in pages}
+    calls, smtp, error_samples = Counter(), Counter(), Counter()
+
+    t0 = time.perf_counter()
+    # Workers resolve these by module name: Streamlit's script runner replaces __main__.
+    worker = importlib.import_module("loadtest")
+    ctx = multiprocessing.get_context("spawn")
+    args.work_dir = tempfile.mkdtemp(prefix="loadtest_")     # per-run files (caches, feed, hours index)
+    try:
+        with ProcessPoolExecutor(args.concurrency, mp_context=ctx, initializer=worker._init_worker, initargs=(args,)) as pool:
+            for page, load, submit, error, call_delta, smtp_delta in pool.map(worker._run_session, jobs):
+                r = results[page]
+                r["sessions"] += 1
+                if load is not None:
+                    r["load"].append(load)
+                    r["submit"].append(submit)
+                if error:
+                    r["errors"] += 1
+                    error_samples[f"{page}: {error[:200]}"] += 1
+                calls.update(call_delta)
+                smtp.update(smtp_delta)
+    finally:
+        shutil.rmtree(args.work_dir, ignore_errors=True)
+    wall = time.perf_counter() - t0
+
+    submits = sum(len(r["submit"]) for r in results.values())
+    return {
+        "sessions": args.sessions,
+        "concurrency": args.concurrency,
+        "wall_s": round(wall, 2),
+        "throughput_submits_per_s": round(submits / wall, 2) if wall else 0.0,
+        "pages": {
+            page: {
+                "page_load": summarize(r["load"]),
+                "submit": summarize(r["submit"]),
+                "error_rate": round(r["errors"] / max(1, r["sessions"]), 4),
+            }
+            for page, r in results.items()
+        },
+        "api_calls_per_submit": {k: round(v / max(1, submits), 2) for k, v in sorted(calls.items())},
+        "api_calls_total": sum(calls.values()),
+        "smtp": dict(smtp),
+        "errors": dict(error_samples.most_common(5)),
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--sessions", type=int, default=50)
+    ap.add_argument("--concurrency", type=int, default=50)
+    ap.add_argument("--page", choices=["forklift", "tools", "both"], default="both")
+    ap.add_argument("--api-latency-ms", type=float, default=100.0)
+    ap.add_argument("--api-jitter-ms", type=float, default=50.0)
+    ap.add_argument("--api-error-rate", type=float, default=0.0)
+    ap.add_argument("--smtp-latency-ms", type=float, default=300.0)
+    ap.add_argument("--smtp-error-rate", type=float, default=0.0)
+    ap.add_argument("--broken-rate", type=float, default=0.1, help="share of submits reporting a breakdown")
+    ap.add_argument("--double-submit-rate", type=float, default=0.0, help="share of sessions pressing Submit twice")
+    ap.add_argument("--timeout", type=float, default=120.0, help="per-run AppTest timeout (s)")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--json", help="also write the report to this file")
+    args = ap.parse_args(argv)
+
+    report = run(args)
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
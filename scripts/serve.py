@@ -0,0 +1,73 @@
+"""
+Start the app with its caches already warm.
+
+Runs ``common.warmup.warm_up()`` in this process and then starts Streamlit in
+the same process, so the first session finds the Sheets client authorized,
+the worksheets downloaded and decoded, and the indexes built. By default the
+server only starts listening once warm-up has finished; ``--background``
+starts it right away and warms up alongside (early sessions then wait on the
+same cached loads instead of repeating them).
+
+    python scripts/serve.py -- --server.port 8501 --server.headless true
+    python scripts/serve.py --status     # health-check: exit 0 when ready
+
+Everything after ``--`` is passed to ``streamlit run``.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN_SCRIPT = "1_🏠Homepage.py"
+
+
+def _alive(pid) -> bool:
+    try:
+        os.kill(int(pid), 0)
+    except (OSError, TypeError, ValueError):
+        return False
+    return True
+
+
+def status(health_file: str = None) -> int:
+    """Print the health file; 0 if the server that wrote it is ready (or degraded) and alive."""
+    from common.warmup import read_health
+    report = read_health(health_file)
+    if report.get("pid") is not None and not _alive(report["pid"]):
+        report["status"] = "stale"
+    print(json.dumps(report, indent=2))
+    return 0 if report.get("status") in ("ready", "degraded") else 1
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--status", action="store_true", help="print the health file and exit (0 = ready)")
+    ap.add_argument("--background", action="store_true", help="start serving immediately, warm up alongside")
+    ap.add_argument("--health-file", help="override [warmup] health_file")
+    ap.add_argument("streamlit_args", nargs="*", help="arguments for `streamlit run` (after --)")
+    args = ap.parse_args(argv)
+
+    os.chdir(ROOT)                  # secrets, images and checklists.csv are relative to the app root
+    sys.path.insert(0, ROOT)
+    if args.status:
+        sys.exit(status(args.health_file))
+
+    from common.warmup import warm_up
+    # Cached loads outside a session log "missing ScriptRunContext"; Streamlit resets its log levels on start.
+    logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").setLevel(logging.ERROR)
+    if args.background:
+        threading.Thread(target=warm_up, args=(args.health_file,), daemon=True).start()
+    else:
+        report = warm_up(args.health_file)
+        print(f"warm-up {report['status']} in {report['total_ms']:,.0f} ms", file=sys.stderr)
+
+    from streamlit.web import cli
+    sys.argv = ["streamlit", "run", MAIN_SCRIPT, *args.streamlit_args]
+    sys.exit(cli.main())
+
+
+if __name__ == "__main__":
+    main()